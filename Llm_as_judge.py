@@ -1,10 +1,33 @@
 import json
 import sys
 import ollama
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Tuple, Optional
 import re
 import time
-from dataclasses import dataclass
+from dataclasses import dataclass, field, asdict
+from llm_cache import LLMResponseCache
+from cascade import CascadeStats, output_gate, difficulty_gate
+from routing import Route, RoutingTable
+from structured_output import (CODE_ANALYSIS_SCHEMA, FAILURE_ANALYSIS_SCHEMA, EDGE_CASE_SCHEMA,
+                               FEEDBACK_SCHEMA, FAST_JUDGE_SCHEMA, parse_and_validate,
+                               build_repair_messages, JsonObjectScanner)
+
+def _json_template(prompt: str) -> str:
+    """The JSON format block embedded in a stage system prompt"""
+    return prompt[prompt.index('{'):prompt.rindex('}') + 1]
+
+def normalize_complexity(text: str) -> Optional[str]:
+    """Map a complexity string such as 'O(n²)' or 'O(N * log N)' to a class name the evaluator reports"""
+    if not text:
+        return None
+    t = text.lower().replace(' ', '').replace('n*n', 'n^2').replace('*', '')
+    t = t.replace('²', '^2').replace('³', '^3').replace('log(n)', 'logn').replace('log2n', 'logn')
+    for pattern, name in (('2^n', 'O(2^n)'), ('n^3', 'O(n^3)'), ('n^2', 'O(n^2)'), ('nlogn', 'O(n log n)'),
+                          ('logn', 'O(log n)'), ('o(n)', 'O(n)'), ('o(1)', 'O(1)')):
+        if pattern in t:
+            return name
+    return None
+
 
 @dataclass
 class CodeMetrics:
@@ -21,11 +44,32 @@ class CodeMetrics:
     potential_edge_cases: List[str]
     program_type: str
     difficulty_level: str
+    resource_summary: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    empirical_complexity: Dict[str, Any] = field(default_factory=dict)
 
 class AdvancedCodeAnalyzer:
-    def __init__(self, model_name="codellama:13b-instruct"):
+    def __init__(self, model_name="codellama:13b-instruct", cache: LLMResponseCache = None,
+                 fast_mode: bool = False, stream: bool = False, keep_alive=None,
+                 cascade_model: Optional[str] = None, routing: Optional[RoutingTable] = None):
         self.model_name = model_name
+        # Per-submission model, budget and stages; supersedes model_name, llm_options and fast_mode
+        self.routing = routing
+        # Cheap model tried first for every stage; model_name only answers what fails the quality gate
+        self.cascade_model = cascade_model
+        self.cascade_stats = CascadeStats()
+        self.fast_mode = fast_mode
+        self.stream = stream  # Stream responses and stop generation once the JSON object closes
+        self.keep_alive = keep_alive  # e.g. -1 keeps the model loaded; None uses the server default
         self.analysis_conversations = []
+        self.last_call_stats: Dict[str, Any] = {}
+        self.structured_output_stats = {"repairs_attempted": 0, "repairs_succeeded": 0}
+        self.cache = cache if cache is not None else LLMResponseCache()
+        self.llm_options = {
+            "temperature": 0.1,  # Very low temperature for consistent analysis
+            "top_p": 0.8,
+            "num_predict": 4096,  # Allow very long responses
+            "repeat_penalty": 1.1
+        }
         
         # Multi-stage analysis system prompts
         self.code_understanding_prompt = """You are an expert C code analyzer with deep understanding of algorithms, data structures, and software engineering principles.
@@ -162,7 +206,7 @@ Provide comprehensive edge case analysis in JSON:
         self.comprehensive_feedback_prompt = """You are a senior software engineering mentor providing comprehensive feedback to help a programmer improve.
 
 Synthesize all previous analysis into actionable, educational feedback that:
-1. **Prioritizes Issues**: What should be fixed first and why?
+1. **Prioritizes Issues**: What should be fixed first and why? (priority is an integer, 1=highest to 5)
 2. **Explains Concepts**: Teach the underlying principles, don't just point out problems
 3. **Provides Learning Path**: What should the student study to improve?
 4. **Gives Specific Examples**: Show exactly how to improve with code examples
@@ -178,7 +222,7 @@ Create a comprehensive learning-focused report in JSON:
   },
   "prioritized_improvements": [
     {
-      "priority": "1-5 (1=highest)",
+      "priority": 1,
       "improvement_area": "specific area to improve",
       "why_important": "explanation of why this matters",
       "learning_concepts": ["underlying CS concepts to study"],
@@ -206,6 +250,26 @@ Create a comprehensive learning-focused report in JSON:
   }
 }"""
 
+        # Fast mode: all four stage schemas answered in a single prefill of the source
+        self.fast_judge_prompt = f"""You are an expert C code analyzer, debugging expert, security reviewer and senior software engineering mentor.
+
+In ONE response, perform all four analyses below and return a single JSON object with exactly these top-level keys:
+"code_analysis", "failure_analysis", "edge_case_analysis", "comprehensive_feedback".
+
+1. "code_analysis" - deep algorithm, structure and logic-flow analysis, including subtle hidden bugs:
+{_json_template(self.code_understanding_prompt)}
+
+2. "failure_analysis" - root causes and patterns behind the failed tests:
+{_json_template(self.failure_analysis_prompt)}
+
+3. "edge_case_analysis" - missing edge cases, security vulnerabilities and production risks:
+{_json_template(self.edge_case_discovery_prompt)}
+
+4. "comprehensive_feedback" - prioritized, educational feedback synthesizing analyses 1-3:
+{_json_template(self.comprehensive_feedback_prompt)}
+
+Work through the analyses in order; later sections should build on the earlier ones. Return ONLY the JSON object."""
+
     def extract_metrics(self, eval_results: Dict[str, Any]) -> CodeMetrics:
         """Extract and structure metrics from evaluation results"""
         return CodeMetrics(
@@ -220,9 +284,22 @@ Create a comprehensive learning-focused report in JSON:
             failed_tests=eval_results.get('failed_test_details', []),
             potential_edge_cases=eval_results.get('potential_edge_cases', []),
             program_type=eval_results.get('program_type', 'unknown'),
-            difficulty_level=eval_results.get('difficulty_level', 'unknown')
+            difficulty_level=eval_results.get('difficulty_level', 'unknown'),
+            resource_summary=eval_results.get('resource_summary', {}),
+            empirical_complexity=eval_results.get('empirical_complexity', {})
         )
 
+    @staticmethod
+    def format_resource_usage(metrics: CodeMetrics) -> str:
+        """Per-test CPU and memory lines for the prompts; empty for results without them"""
+        summary = metrics.resource_summary
+        if not summary:
+            return ""
+        cpu = {key: summary['user_cpu_ms'][key] + summary['sys_cpu_ms'][key] for key in ('median', 'max')}
+        rss = summary['max_rss_kb']
+        return (f"\n- Per-Test CPU Time: {cpu['median']:.1f}ms median, {cpu['max']:.1f}ms max"
+                f"\n- Per-Test Peak Memory: {rss['median']:.0f}KB median, {rss['max']:.0f}KB max RSS")
+
     def analyze_code_structure(self, code: str) -> Dict[str, Any]:
         """Deep structural analysis of the code"""
         analysis = {}
@@ -253,60 +330,280 @@ Create a comprehensive learning-focused report in JSON:
         
         return analysis
 
-    def call_llm_with_retry(self, messages: List[Dict], max_retries: int = 3) -> str:
-        """Call LLM with retry logic and error handling"""
+    def call_llm_with_retry(self, messages: List[Dict], max_retries: int = 3, schema: Dict[str, Any] = None,
+                            model: Optional[str] = None, options: Optional[Dict[str, Any]] = None) -> str:
+        """Call LLM with retry logic and error handling; `schema` constrains the output format"""
+        model = model or self.model_name
+        options = options or self.llm_options
+        cache_key = self.cache.make_key(model, messages, options, schema)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            self.last_call_stats = {"cached": True, "wall_s": 0.0}
+            return cached
+
         for attempt in range(max_retries):
             try:
-                response = ollama.chat(
-                    model=self.model_name,
-                    messages=messages,
-                    options={
-                        "temperature": 0.1,  # Very low temperature for consistent analysis
-                        "top_p": 0.8,
-                        "num_predict": 4096,  # Allow very long responses
-                        "repeat_penalty": 1.1
-                    }
-                )
-                return response['message']['content'].strip()
+                if self.stream:
+                    response_text, self.last_call_stats = self.stream_llm_response(messages, schema, model, options)
+                else:
+                    start = time.perf_counter()
+                    response = ollama.chat(
+                        model=model,
+                        messages=messages,
+                        options=options,
+                        **self.chat_kwargs(schema)
+                    )
+                    self.last_call_stats = self.response_stats(response, time.perf_counter() - start)
+                    response_text = response['message']['content'].strip()
+                self.cache.put(cache_key, response_text, model)
+                return response_text
             except Exception as e:
                 print(f"Attempt {attempt + 1} failed: {e}")
                 if attempt == max_retries - 1:
                     raise
                 time.sleep(2 ** attempt)  # Exponential backoff
 
-    def extract_json_from_response(self, response_text: str) -> Dict[str, Any]:
-        """Extract and parse JSON from LLM response with error handling"""
-        # Try to find JSON in the response
-        json_patterns = [
-            r'\{.*\}',  # Basic JSON pattern
-            r'```json\s*(\{.*?\})\s*```',  # JSON in code blocks
-            r'```\s*(\{.*?\})\s*```'  # JSON in generic code blocks
-        ]
-        
-        for pattern in json_patterns:
-            matches = re.findall(pattern, response_text, re.DOTALL)
-            if matches:
-                json_text = matches[0] if isinstance(matches[0], str) else matches[0]
-                try:
-                    return json.loads(json_text)
-                except json.JSONDecodeError:
-                    continue
-        
-        # If no JSON found, try the whole response
+    def stream_llm_response(self, messages: List[Dict], schema: Dict[str, Any] = None,
+                            model: Optional[str] = None,
+                            options: Optional[Dict[str, Any]] = None) -> Tuple[str, Dict[str, Any]]:
+        """Stream a completion, cancelling generation as soon as the top-level JSON object closes"""
+        start = time.perf_counter()
+        scanner = JsonObjectScanner()
+        parts = []
+        stats = self.new_stream_stats()
+
+        stream = ollama.chat(
+            model=model or self.model_name,
+            messages=messages,
+            options=options or self.llm_options,
+            stream=True,
+            **self.chat_kwargs(schema)
+        )
         try:
-            return json.loads(response_text)
-        except json.JSONDecodeError as e:
-            print(f"Warning: Could not parse JSON from response: {e}")
+            for chunk in stream:
+                if self.consume_stream_chunk(chunk, parts, scanner, stats, start):
+                    break
+        finally:
+            # Closing the stream drops the HTTP connection, which stops generation server-side
+            stream.close()
+
+        return self.finish_stream(parts, scanner, stats, start)
+
+    @staticmethod
+    def new_stream_stats() -> Dict[str, Any]:
+        return {"cached": False, "streamed": True, "ttft_s": None, "time_to_json_s": None,
+                "early_stop": False, "chunks": 0}
+
+    def consume_stream_chunk(self, chunk, parts: List[str], scanner: JsonObjectScanner,
+                             stats: Dict[str, Any], start: float) -> bool:
+        """Record one streamed chunk; returns True when the stream should be cancelled"""
+        content = chunk['message']['content']
+        if content:
+            if stats["ttft_s"] is None:
+                stats["ttft_s"] = round(time.perf_counter() - start, 3)
+            parts.append(content)
+            stats["chunks"] += 1
+        if chunk.get('done'):
+            stats.update({k: v for k, v in self.response_stats(chunk, 0).items() if k not in ("cached", "wall_s")})
+        if content and scanner.feed(content):
+            stats["time_to_json_s"] = round(time.perf_counter() - start, 3)
+            stats["early_stop"] = not chunk.get('done', False)
+            return True
+        return False
+
+    @staticmethod
+    def finish_stream(parts: List[str], scanner: JsonObjectScanner, stats: Dict[str, Any],
+                      start: float) -> Tuple[str, Dict[str, Any]]:
+        stats["wall_s"] = round(time.perf_counter() - start, 3)
+        text = ''.join(parts)
+        if scanner.complete:
+            text = text[:scanner.end]  # Drop anything generated after the object closed
+        return text.strip(), stats
+
+    @staticmethod
+    def format_kwargs(schema: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Structured-output argument for ollama.chat, omitted when unconstrained"""
+        return {"format": schema} if schema is not None else {}
+
+    def chat_kwargs(self, schema: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Optional ollama.chat arguments: the output schema and the model keep-alive"""
+        kwargs = self.format_kwargs(schema)
+        if self.keep_alive is not None:
+            kwargs["keep_alive"] = self.keep_alive
+        return kwargs
+
+    @staticmethod
+    def response_stats(response, wall_s: float) -> Dict[str, Any]:
+        """Token counts and timings Ollama reports for a completed call (durations in ns)"""
+        def seconds(key):
+            value = response.get(key)
+            return round(value / 1e9, 3) if value else None
+
+        return {
+            "cached": False,
+            "wall_s": round(wall_s, 3),
+            "prompt_tokens": response.get('prompt_eval_count'),
+            "prompt_eval_s": seconds('prompt_eval_duration'),
+            "completion_tokens": response.get('eval_count'),
+            "eval_s": seconds('eval_duration'),
+            "load_s": seconds('load_duration')
+        }
+
+    def extract_json_from_response(self, response_text: str, schema: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Extract and parse JSON from LLM response, repairing it against the schema if needed"""
+        data, errors = parse_and_validate(response_text, schema)
+        if errors and schema is not None:
+            print(f"⚠️  Response failed validation ({errors[0]}); requesting targeted repair...")
+            self.structured_output_stats["repairs_attempted"] += 1
+            repaired_text = self.call_llm_with_retry(build_repair_messages(response_text, errors, schema),
+                                                     schema=schema)
+            data, errors = self.accept_repair(data, errors, repaired_text, schema)
+        return self.finalize_json(response_text, data, errors)
+
+    def accept_repair(self, data: Dict[str, Any], errors: List[str], repaired_text: str,
+                      schema: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+        """Keep the repaired answer if it validates, or if the original did not even parse"""
+        repaired, repaired_errors = parse_and_validate(repaired_text, schema)
+        if repaired is not None and not repaired_errors:
+            self.structured_output_stats["repairs_succeeded"] += 1
+            return repaired, repaired_errors
+        if repaired is not None and data is None:
+            return repaired, repaired_errors
+        return data, errors
+
+    def finalize_json(self, response_text: str, data: Dict[str, Any], errors: List[str]) -> Dict[str, Any]:
+        """Return parsed data, or the error dict the report writer understands"""
+        if data is None:
+            print(f"Warning: Could not parse JSON from response: {errors[0] if errors else 'unknown error'}")
             print(f"Response text: {response_text[:500]}...")
             return {"error": "Failed to parse LLM response", "raw_response": response_text}
+        if errors:
+            print(f"Warning: Response has {len(errors)} schema issue(s), e.g. {errors[0]}")
+        return data
+
+    def run_llm_stage(self, stage: str, messages: List[Dict], schema: Dict[str, Any], metrics: CodeMetrics,
+                      route: Optional[Route] = None) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
+        """Call the LLM for one stage and parse its JSON; returns (response_text, call_stats, data).
+
+        With a cascade model, the stage is tried on it first and escalated to the full model
+        (model_name, or the route's model) only when the answer fails cascade_gate or the
+        submission is advanced.
+        """
+        model, options = self.route_settings(route)
+        start = time.perf_counter()
+        reasons = []
+        if self.cascade_model and self.cascade_model != model:
+            reasons = difficulty_gate(metrics.difficulty_level)
+            if not reasons:
+                try:
+                    # One attempt: a failing cheap model is escalated rather than retried
+                    response_text = self.call_llm_with_retry(messages, max_retries=1, schema=schema,
+                                                             model=self.cascade_model, options=options)
+                    call_stats = dict(self.last_call_stats, model=self.cascade_model, escalation_reasons=[])
+                    data, errors = parse_and_validate(response_text, schema)
+                    reasons = self.cascade_gate(stage, data, errors, metrics)
+                except Exception as e:
+                    print(f"⚠️  {stage} failed on {self.cascade_model}: {e}")
+                    reasons = ["cascade_model_error"]
+                if not reasons:
+                    self.cascade_stats.record(stage, reasons, time.perf_counter() - start)
+                    return response_text, call_stats, data
+            print(f"⤴️  {stage}: escalating to {model} ({', '.join(reasons)})")
+        first_tier_s = time.perf_counter() - start
+
+        response_text = self.call_llm_with_retry(messages, schema=schema, model=model, options=options)
+        call_stats = dict(self.last_call_stats, model=model)
+        data = self.extract_json_from_response(response_text, schema)
+        if self.cascade_model and self.cascade_model != model:
+            call_stats["escalation_reasons"] = reasons
+            self.cascade_stats.record(stage, reasons, first_tier_s, time.perf_counter() - start - first_tier_s)
+        return response_text, call_stats, data
+
+    def route_settings(self, route: Optional[Route]) -> Tuple[str, Dict[str, Any]]:
+        """Model and Ollama options for a stage call"""
+        if route is None:
+            return self.model_name, self.llm_options
+        return route.model, route.options(self.llm_options)
+
+    def select_route(self, source_file: str, metrics: CodeMetrics,
+                     structure_analysis: Dict[str, Any]) -> Tuple[Optional[Route], Optional[Dict[str, Any]]]:
+        """Route a submission through the routing table; (None, None) when routing is off"""
+        if self.routing is None:
+            return None, None
+        features = {
+            "difficulty_level": metrics.difficulty_level,
+            "program_type": metrics.program_type,
+            "line_count": structure_analysis["line_count"],
+            "function_count": structure_analysis["function_count"]
+        }
+        return self.routing.select(features, source_file)
+
+    @staticmethod
+    def skipped_stage(route: Route) -> Dict[str, Any]:
+        """Stage result for a stage the route does not run"""
+        return {"skipped": f"not run for route '{route.name}'"}
 
-    def stage_1_code_understanding(self, source_code: str, metrics: CodeMetrics) -> Dict[str, Any]:
+    @staticmethod
+    def add_routing_meta(analysis: Dict[str, Any], decision: Optional[Dict[str, Any]]):
+        if decision is None:
+            return
+        meta = analysis["meta_information"]
+        meta["routing"] = decision
+        meta["model_used"] = decision["model"]
+        meta["analysis_stages_completed"] = 4 if decision["stages"] == ["combined"] else len(decision["stages"])
+
+    def cascade_gate(self, stage: str, data: Optional[Dict[str, Any]], errors: List[str],
+                     metrics: CodeMetrics) -> List[str]:
+        """Reasons to escalate a cheap-model answer: bad structure, or claims the measured metrics contradict"""
+        return output_gate(data, errors) or self.metric_disagreements(stage, data, metrics)
+
+    def metric_disagreements(self, stage: str, data: Dict[str, Any], metrics: CodeMetrics) -> List[str]:
+        """Checks of a stage answer against what the evaluator actually measured"""
+        if stage == "combined":
+            reasons = []
+            for section_stage, key in (("stage_1", "code_analysis"), ("stage_2", "failure_analysis"),
+                                       ("stage_3", "edge_case_analysis"), ("stage_4", "comprehensive_feedback")):
+                for reason in self.metric_disagreements(section_stage, data.get(key) or {}, metrics):
+                    if reason not in reasons:
+                        reasons.append(reason)
+            return reasons
+
+        if stage == "stage_1" and self.check_complexity_claim(metrics, data)["agrees"] is False:
+            return ["complexity_disagrees"]
+        if stage == "stage_2" and metrics.failed_tests and not data.get("detailed_failure_analysis"):
+            return ["failures_unexplained"]
+        if stage == "stage_3" and metrics.robustness_score < 100 and not data.get("critical_missing_edge_cases"):
+            return ["edge_cases_missed"]
+        if (stage == "stage_4" and (metrics.failed_tests or metrics.memory_score < 100)
+                and not data.get("executive_summary", {}).get("critical_issues")):
+            return ["issues_missed"]
+        return []
+
+    def stage_1_code_understanding(self, source_code: str, metrics: CodeMetrics,
+                                   route: Optional[Route] = None) -> Dict[str, Any]:
         """Stage 1: Deep code understanding and algorithm analysis"""
+        if route is not None and not route.runs("stage_1"):
+            return self.skipped_stage(route)
         print("🔍 Stage 1: Deep Code Understanding & Algorithm Analysis...")
         
         # Add structural analysis context
         structure_analysis = self.analyze_code_structure(source_code)
+        messages = self.build_stage_1_messages(source_code, metrics, structure_analysis)
+        
+        response_text, call_stats, analysis = self.run_llm_stage("stage_1", messages, CODE_ANALYSIS_SCHEMA, metrics, route)
+        
+        # Store conversation for context
+        self.analysis_conversations.append({
+            "stage": "code_understanding",
+            "response": response_text,
+            "call_stats": call_stats
+        })
         
+        return analysis
+
+    def build_stage_1_messages(self, source_code: str, metrics: CodeMetrics,
+                               structure_analysis: Dict[str, Any]) -> List[Dict]:
+        """Build the stage 1 prompt from the source and its structural analysis"""
         context = f"""
 CODE STRUCTURAL ANALYSIS:
 - Function count: {structure_analysis['function_count']}
@@ -326,7 +623,7 @@ EVALUATION CONTEXT:
 - Difficulty Level: {metrics.difficulty_level}
 - Pass Rate: {metrics.passrate}% ({metrics.tests_passed}/{metrics.total_tests})
 - Memory Score: {metrics.memory_score}
-- Execution Time: {metrics.execution_time_ms}ms
+- Execution Time: {metrics.execution_time_ms}ms{self.format_resource_usage(metrics)}
 
 C SOURCE CODE TO ANALYZE:
 ```c
@@ -336,40 +633,51 @@ C SOURCE CODE TO ANALYZE:
 Perform deep algorithmic and structural analysis following the JSON format specified.
 """
 
-        messages = [
+        return [
             {"role": "system", "content": self.code_understanding_prompt},
             {"role": "user", "content": context}
         ]
+
+    def stage_2_failure_analysis(self, source_code: str, metrics: CodeMetrics, code_analysis: Dict[str, Any],
+                                 route: Optional[Route] = None) -> Dict[str, Any]:
+        """Stage 2: Deep analysis of test failures"""
+        print("🔍 Stage 2: Test Failure Analysis...")
+        
+        if not metrics.failed_tests:
+            return self.no_failure_analysis()
+        if route is not None and not route.runs("stage_2"):
+            return self.skipped_stage(route)
         
-        response_text = self.call_llm_with_retry(messages)
-        analysis = self.extract_json_from_response(response_text)
+        messages = self.build_stage_2_messages(source_code, metrics, code_analysis)
+        
+        response_text, call_stats, analysis = self.run_llm_stage("stage_2", messages, FAILURE_ANALYSIS_SCHEMA, metrics, route)
         
-        # Store conversation for context
         self.analysis_conversations.append({
-            "stage": "code_understanding",
-            "response": response_text
+            "stage": "failure_analysis", 
+            "response": response_text,
+            "call_stats": call_stats
         })
         
         return analysis
 
-    def stage_2_failure_analysis(self, source_code: str, metrics: CodeMetrics, code_analysis: Dict[str, Any]) -> Dict[str, Any]:
-        """Stage 2: Deep analysis of test failures"""
-        print("🔍 Stage 2: Test Failure Analysis...")
-        
-        if not metrics.failed_tests:
-            return {
-                "failure_pattern_analysis": {
-                    "common_root_causes": [],
-                    "severity_assessment": "No test failures - excellent!",
-                    "fix_priority": []
-                },
-                "detailed_failure_analysis": [],
-                "cascading_effects": {
-                    "issues_that_could_cause_multiple_failures": [],
-                    "hidden_dependencies": []
-                }
+    def no_failure_analysis(self) -> Dict[str, Any]:
+        """Stage 2 result when every test passed; no LLM call is needed"""
+        return {
+            "failure_pattern_analysis": {
+                "common_root_causes": [],
+                "severity_assessment": "No test failures - excellent!",
+                "fix_priority": []
+            },
+            "detailed_failure_analysis": [],
+            "cascading_effects": {
+                "issues_that_could_cause_multiple_failures": [],
+                "hidden_dependencies": []
             }
-        
+        }
+
+    def build_stage_2_messages(self, source_code: str, metrics: CodeMetrics,
+                               code_analysis: Dict[str, Any]) -> List[Dict]:
+        """Build the stage 2 prompt from the failed tests and stage 1 insights"""
         context = f"""
 PREVIOUS CODE ANALYSIS INSIGHTS:
 {json.dumps(code_analysis, indent=2)}
@@ -380,7 +688,7 @@ FAILED TEST DETAILS:
 PERFORMANCE METRICS:
 - Memory Score: {metrics.memory_score} (100 = no leaks, 0 = has leaks)
 - Robustness Score: {metrics.robustness_score} (how well handles edge cases)
-- Execution Time: {metrics.execution_time_ms}ms
+- Execution Time: {metrics.execution_time_ms}ms{self.format_resource_usage(metrics)}
 
 C SOURCE CODE:
 ```c
@@ -390,26 +698,34 @@ C SOURCE CODE:
 Analyze these test failures in depth to understand root causes and patterns.
 """
 
-        messages = [
+        return [
             {"role": "system", "content": self.failure_analysis_prompt},
             {"role": "user", "content": context}
         ]
+
+    def stage_3_edge_case_discovery(self, source_code: str, metrics: CodeMetrics, 
+                                    code_analysis: Dict[str, Any], failure_analysis: Dict[str, Any],
+                                    route: Optional[Route] = None) -> Dict[str, Any]:
+        """Stage 3: Advanced edge case and vulnerability discovery"""
+        if route is not None and not route.runs("stage_3"):
+            return self.skipped_stage(route)
+        print("🔍 Stage 3: Edge Case & Vulnerability Discovery...")
+        
+        messages = self.build_stage_3_messages(source_code, metrics, code_analysis, failure_analysis)
         
-        response_text = self.call_llm_with_retry(messages)
-        analysis = self.extract_json_from_response(response_text)
+        response_text, call_stats, analysis = self.run_llm_stage("stage_3", messages, EDGE_CASE_SCHEMA, metrics, route)
         
         self.analysis_conversations.append({
-            "stage": "failure_analysis", 
-            "response": response_text
+            "stage": "edge_case_discovery",
+            "response": response_text,
+            "call_stats": call_stats
         })
         
         return analysis
 
-    def stage_3_edge_case_discovery(self, source_code: str, metrics: CodeMetrics, 
-                                    code_analysis: Dict[str, Any], failure_analysis: Dict[str, Any]) -> Dict[str, Any]:
-        """Stage 3: Advanced edge case and vulnerability discovery"""
-        print("🔍 Stage 3: Edge Case & Vulnerability Discovery...")
-        
+    def build_stage_3_messages(self, source_code: str, metrics: CodeMetrics,
+                               code_analysis: Dict[str, Any], failure_analysis: Dict[str, Any]) -> List[Dict]:
+        """Build the stage 3 prompt from the stage 1-2 insights"""
         context = f"""
 COMPREHENSIVE ANALYSIS CONTEXT:
 
@@ -437,27 +753,35 @@ C SOURCE CODE:
 Based on this comprehensive analysis, identify critical missing edge cases, security vulnerabilities, and production risks that haven't been covered yet.
 """
 
-        messages = [
+        return [
             {"role": "system", "content": self.edge_case_discovery_prompt},
             {"role": "user", "content": context}
         ]
+
+    def stage_4_comprehensive_feedback(self, source_code: str, metrics: CodeMetrics,
+                                       code_analysis: Dict[str, Any], failure_analysis: Dict[str, Any],
+                                       edge_case_analysis: Dict[str, Any],
+                                       route: Optional[Route] = None) -> Dict[str, Any]:
+        """Stage 4: Synthesize everything into comprehensive educational feedback"""
+        print("🔍 Stage 4: Comprehensive Educational Feedback Synthesis...")
         
-        response_text = self.call_llm_with_retry(messages)
-        analysis = self.extract_json_from_response(response_text)
+        messages = self.build_stage_4_messages(source_code, metrics, code_analysis,
+                                               failure_analysis, edge_case_analysis)
+        
+        response_text, call_stats, analysis = self.run_llm_stage("stage_4", messages, FEEDBACK_SCHEMA, metrics, route)
         
         self.analysis_conversations.append({
-            "stage": "edge_case_discovery",
-            "response": response_text
+            "stage": "comprehensive_feedback",
+            "response": response_text,
+            "call_stats": call_stats
         })
         
         return analysis
 
-    def stage_4_comprehensive_feedback(self, source_code: str, metrics: CodeMetrics,
-                                       code_analysis: Dict[str, Any], failure_analysis: Dict[str, Any],
-                                       edge_case_analysis: Dict[str, Any]) -> Dict[str, Any]:
-        """Stage 4: Synthesize everything into comprehensive educational feedback"""
-        print("🔍 Stage 4: Comprehensive Educational Feedback Synthesis...")
-        
+    def build_stage_4_messages(self, source_code: str, metrics: CodeMetrics,
+                               code_analysis: Dict[str, Any], failure_analysis: Dict[str, Any],
+                               edge_case_analysis: Dict[str, Any]) -> List[Dict]:
+        """Build the stage 4 synthesis prompt from all previous stages"""
         context = f"""
 COMPLETE ANALYSIS SYNTHESIS:
 
@@ -475,7 +799,7 @@ QUANTITATIVE METRICS:
 - Weighted Score: {metrics.weighted_score}%
 - Memory Management: {metrics.memory_score}/100
 - Robustness: {metrics.robustness_score}/100
-- Execution Time: {metrics.execution_time_ms}ms
+- Execution Time: {metrics.execution_time_ms}ms{self.format_resource_usage(metrics)}
 - Failed Tests: {len(metrics.failed_tests)}
 
 ORIGINAL SOURCE CODE:
@@ -486,20 +810,10 @@ ORIGINAL SOURCE CODE:
 Synthesize all this analysis into comprehensive, educational feedback that helps the programmer understand not just what's wrong, but WHY it's wrong and HOW to improve. Focus on teaching underlying principles and providing a clear learning path.
 """
 
-        messages = [
+        return [
             {"role": "system", "content": self.comprehensive_feedback_prompt},
             {"role": "user", "content": context}
         ]
-        
-        response_text = self.call_llm_with_retry(messages)
-        analysis = self.extract_json_from_response(response_text)
-        
-        self.analysis_conversations.append({
-            "stage": "comprehensive_feedback",
-            "response": response_text
-        })
-        
-        return analysis
 
     def calculate_final_score(self, metrics: CodeMetrics, comprehensive_analysis: Dict[str, Any]) -> Tuple[str, float]:
         """Calculate final grade and score based on comprehensive analysis"""
@@ -548,46 +862,247 @@ Synthesize all this analysis into comprehensive, educational feedback that helps
             
         return grade, final_score
 
-    def perform_comprehensive_analysis(self, source_file: str, results_file: str) -> Dict[str, Any]:
-        """Main analysis orchestrator - runs all 4 stages"""
-        
-        print("🚀 Starting Comprehensive Multi-Stage Analysis...")
-        print("="*80)
+    def perform_comprehensive_analysis(self, source_file: str, results_file: str,
+                                       eval_results: Optional[Dict[str, Any]] = None,
+                                       checkpoint=None) -> Dict[str, Any]:
+        """Main analysis orchestrator - runs all 4 stages; eval_results skips re-reading results_file.
+
+        ``checkpoint`` (e.g. job_store.StageCheckpoint) lets an interrupted run resume after its last finished stage.
+        """
+        if self.fast_mode and self.routing is None:
+            return self.perform_fast_analysis(source_file, results_file, eval_results)
         
         # Load data
         try:
             with open(source_file, 'r') as f:
                 source_code = f.read()
-            with open(results_file, 'r') as f:
-                eval_results = json.load(f)
+            if eval_results is None:
+                with open(results_file, 'r') as f:
+                    eval_results = json.load(f)
         except Exception as e:
             return {"error": f"Failed to load files: {e}"}
         
         metrics = self.extract_metrics(eval_results)
+        route, decision = self.select_route(source_file, metrics, self.analyze_code_structure(source_code))
+        if route is not None and route.fast:
+            return self.perform_fast_analysis(source_file, results_file, eval_results, route, decision)
+        
+        print("🚀 Starting Comprehensive Multi-Stage Analysis...")
+        print("="*80)
         
         # Stage 1: Deep Code Understanding
-        code_analysis = self.stage_1_code_understanding(source_code, metrics)
+        code_analysis = self.run_checkpointed(
+            checkpoint, "stage_1", lambda: self.stage_1_code_understanding(source_code, metrics, route))
         
         # Stage 2: Test Failure Analysis  
-        failure_analysis = self.stage_2_failure_analysis(source_code, metrics, code_analysis)
+        failure_analysis = self.run_checkpointed(
+            checkpoint, "stage_2", lambda: self.stage_2_failure_analysis(source_code, metrics, code_analysis, route))
         
         # Stage 3: Edge Case Discovery
-        edge_case_analysis = self.stage_3_edge_case_discovery(source_code, metrics, code_analysis, failure_analysis)
+        edge_case_analysis = self.run_checkpointed(
+            checkpoint, "stage_3", lambda: self.stage_3_edge_case_discovery(source_code, metrics, code_analysis,
+                                                                            failure_analysis, route))
         
         # Stage 4: Comprehensive Feedback
-        comprehensive_feedback = self.stage_4_comprehensive_feedback(source_code, metrics, code_analysis, 
-                                                                     failure_analysis, edge_case_analysis)
+        comprehensive_feedback = self.run_checkpointed(
+            checkpoint, "stage_4", lambda: self.stage_4_comprehensive_feedback(source_code, metrics, code_analysis,
+                                                                               failure_analysis, edge_case_analysis,
+                                                                               route))
+        
+        complete_analysis = self.assemble_analysis(source_file, metrics, code_analysis, failure_analysis,
+                                                   edge_case_analysis, comprehensive_feedback,
+                                                   self.analysis_conversations)
+        self.add_routing_meta(complete_analysis, decision)
+        
+        print("="*80)
+        print("🎉 Multi-Stage Analysis Complete!")
+        cache_stats = self.cache.stats()
+        if cache_stats["enabled"]:
+            print(f"💾 LLM cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+        
+        return complete_analysis
+
+    def checkpoint_config(self) -> Dict[str, Any]:
+        """Settings that change the analysis; a checkpoint saved under different ones is not reused"""
+        return {"model": self.model_name, "fast_mode": self.fast_mode, "cascade_model": self.cascade_model,
+                "routing": [asdict(route) for route in self.routing.routes] if self.routing else None}
+
+    @staticmethod
+    def run_checkpointed(checkpoint, stage: str, compute) -> Dict[str, Any]:
+        """Return the stage result saved in checkpoint, or compute and save it (errors are not saved)"""
+        if checkpoint is not None:
+            saved = checkpoint.get(stage)
+            if saved is not None:
+                print(f"⏭️  {stage}: reusing checkpoint")
+                return saved
+        result = compute()
+        if checkpoint is not None:
+            checkpoint.put(stage, result)
+        return result
+
+    def build_fast_messages(self, source_code: str, metrics: CodeMetrics,
+                            structure_analysis: Dict[str, Any]) -> List[Dict]:
+        """Build the single combined prompt used by fast mode"""
+        stage_1_context = self.build_stage_1_messages(source_code, metrics, structure_analysis)[1]["content"]
+        if metrics.failed_tests:
+            failures = chr(10).join(metrics.failed_tests)
+        else:
+            failures = "None - all tests passed. Return \"failure_analysis\" as {} (it will not be used)."
+
+        context = f"""{stage_1_context.split("C SOURCE CODE TO ANALYZE:")[0]}
+- Weighted Score: {metrics.weighted_score}%
+- Robustness Score: {metrics.robustness_score}
+
+FAILED TEST DETAILS:
+{failures}
+
+KNOWN EDGE CASES IDENTIFIED BY STAGE 1:
+{chr(10).join(metrics.potential_edge_cases)}
+
+C SOURCE CODE TO ANALYZE:
+```c
+{source_code}
+```
+
+Perform all four analyses and return the combined JSON object specified.
+"""
+
+        return [
+            {"role": "system", "content": self.fast_judge_prompt},
+            {"role": "user", "content": context}
+        ]
+
+    def estimate_fast_mode_savings(self, fast_messages: List[Dict], staged_messages: List[List[Dict]],
+                                   call_stats: Dict[str, Any]) -> Dict[str, Any]:
+        """Estimate the prompt prefill the staged pipeline would have paid for the same results"""
+        fast_chars = sum(len(m["content"]) for m in fast_messages)
+        staged_chars = sum(len(m["content"]) for messages in staged_messages for m in messages)
+
+        prompt_tokens = call_stats.get("prompt_tokens")
+        chars_per_token = fast_chars / prompt_tokens if prompt_tokens else 4.0
+        staged_tokens = int(staged_chars / chars_per_token)
+
+        report = {
+            "llm_calls": 1,
+            "staged_llm_calls": len(staged_messages),
+            "prompt_tokens": prompt_tokens or int(fast_chars / chars_per_token),
+            "estimated_staged_prompt_tokens": staged_tokens,
+            "latency_s": call_stats.get("wall_s"),
+            "estimated_prefill_saved_s": None
+        }
+
+        prompt_eval_s = call_stats.get("prompt_eval_s")
+        if prompt_tokens and prompt_eval_s:
+            tokens_per_s = prompt_tokens / prompt_eval_s
+            report["estimated_prefill_saved_s"] = round(staged_tokens / tokens_per_s - prompt_eval_s, 3)
+        return report
+
+    def split_fast_response(self, combined: Dict[str, Any], metrics: CodeMetrics) -> Tuple[Dict, Dict, Dict, Dict]:
+        """Map the combined fast-mode JSON onto the four stage results"""
+        if "error" in combined:
+            return combined, combined, combined, combined
+
+        def section(key):
+            value = combined.get(key)
+            return value if isinstance(value, dict) and value else {"error": f"Missing '{key}' in combined response"}
+
+        failure_analysis = section("failure_analysis") if metrics.failed_tests else self.no_failure_analysis()
+        return (section("code_analysis"), failure_analysis,
+                section("edge_case_analysis"), section("comprehensive_feedback"))
+
+    def perform_fast_analysis(self, source_file: str, results_file: str,
+                              eval_results: Optional[Dict[str, Any]] = None, route: Optional[Route] = None,
+                              decision: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Fast mode: answer all four stages with one LLM call over a single prefill"""
+        print("🚀 Starting Fast Single-Pass Analysis...")
+        print("="*80)
+        
+        try:
+            with open(source_file, 'r') as f:
+                source_code = f.read()
+            if eval_results is None:
+                with open(results_file, 'r') as f:
+                    eval_results = json.load(f)
+        except Exception as e:
+            return {"error": f"Failed to load files: {e}"}
+        
+        metrics = self.extract_metrics(eval_results)
+        structure_analysis = self.analyze_code_structure(source_code)
+        
+        print("🔍 Stages 1-4: Combined Analysis & Feedback...")
+        messages = self.build_fast_messages(source_code, metrics, structure_analysis)
+        response_text, call_stats, combined = self.run_llm_stage("combined", messages, FAST_JUDGE_SCHEMA, metrics, route)
+        
+        self.analysis_conversations.append({
+            "stage": "fast_combined",
+            "response": response_text,
+            "call_stats": call_stats
+        })
+        
+        code_analysis, failure_analysis, edge_case_analysis, comprehensive_feedback = \
+            self.split_fast_response(combined, metrics)
+        
+        staged_messages = [self.build_stage_1_messages(source_code, metrics, structure_analysis)]
+        if metrics.failed_tests:
+            staged_messages.append(self.build_stage_2_messages(source_code, metrics, code_analysis))
+        staged_messages.append(self.build_stage_3_messages(source_code, metrics, code_analysis, failure_analysis))
+        staged_messages.append(self.build_stage_4_messages(source_code, metrics, code_analysis,
+                                                           failure_analysis, edge_case_analysis))
+        savings = self.estimate_fast_mode_savings(messages, staged_messages, call_stats)
         
+        complete_analysis = self.assemble_analysis(source_file, metrics, code_analysis, failure_analysis,
+                                                   edge_case_analysis, comprehensive_feedback,
+                                                   self.analysis_conversations)
+        complete_analysis["meta_information"]["analysis_mode"] = "fast"
+        complete_analysis["meta_information"]["fast_mode"] = savings
+        self.add_routing_meta(complete_analysis, decision)
+        
+        print("="*80)
+        print("🎉 Fast Analysis Complete!")
+        if savings["estimated_prefill_saved_s"] is not None:
+            print(f"⚡ Prefill saved vs. staged analysis: ~{savings['estimated_prefill_saved_s']}s "
+                  f"({savings['estimated_staged_prompt_tokens']} -> {savings['prompt_tokens']} prompt tokens)")
+        
+        return complete_analysis
+
+    @staticmethod
+    def check_complexity_claim(metrics: CodeMetrics, code_analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """Compare stage 1's time_complexity claim with the evaluator's measured growth"""
+        claim = code_analysis.get("algorithm_analysis", {}).get("time_complexity", "")
+        measured = metrics.empirical_complexity
+        if not measured.get("enabled"):
+            return {"llm_claim": claim, "measured": None, "agrees": None}
+
+        claimed_class = normalize_complexity(claim)
+        measured_class = measured.get("time_complexity")
+        comparable = claimed_class is not None and measured_class not in (None, "unknown")
+        return {
+            "llm_claim": claim,
+            "llm_class": claimed_class,
+            "measured": measured_class,
+            "measured_space": measured.get("space_complexity"),
+            "time_fit_r2": measured.get("time_fit_r2"),
+            "loglog_slope": measured.get("time_loglog_slope"),
+            "agrees": (claimed_class == measured_class) if comparable else None
+        }
+
+    def assemble_analysis(self, source_file: str, metrics: CodeMetrics, code_analysis: Dict[str, Any],
+                          failure_analysis: Dict[str, Any], edge_case_analysis: Dict[str, Any],
+                          comprehensive_feedback: Dict[str, Any],
+                          conversation_history: List[Dict]) -> Dict[str, Any]:
+        """Grade the submission and combine all stage results into the final analysis"""
         # Calculate final grade
         final_grade, final_score = self.calculate_final_score(metrics, comprehensive_feedback)
         
         # Combine all analyses
-        complete_analysis = {
+        analysis = {
             "meta_information": {
                 "analysis_timestamp": time.time(),
                 "source_file": source_file,
                 "model_used": self.model_name,
-                "analysis_stages_completed": 4
+                "analysis_stages_completed": 4,
+                "llm_cache": self.cache.stats(),
+                "structured_output": dict(self.structured_output_stats)
             },
             "quantitative_metrics": {
                 "passrate": metrics.passrate,
@@ -597,7 +1112,9 @@ Synthesize all this analysis into comprehensive, educational feedback that helps
                 "tests_passed": metrics.tests_passed,
                 "tests_failed": metrics.tests_failed,
                 "total_tests": metrics.total_tests,
-                "execution_time_ms": metrics.execution_time_ms
+                "execution_time_ms": metrics.execution_time_ms,
+                "resource_summary": metrics.resource_summary,
+                "complexity_check": self.check_complexity_claim(metrics, code_analysis)
             },
             "final_assessment": {
                 "grade": final_grade,
@@ -608,13 +1125,16 @@ Synthesize all this analysis into comprehensive, educational feedback that helps
             "stage_2_failure_analysis": failure_analysis, 
             "stage_3_edge_case_analysis": edge_case_analysis,
             "stage_4_comprehensive_feedback": comprehensive_feedback,
-            "conversation_history": self.analysis_conversations
+            "conversation_history": conversation_history
         }
-        
-        print("="*80)
-        print("🎉 Multi-Stage Analysis Complete!")
-        
-        return complete_analysis
+        if self.cascade_model:
+            analysis["meta_information"]["cascade"] = {
+                "first_tier_model": self.cascade_model,
+                "escalated_stages": {entry["stage"]: entry["call_stats"]["escalation_reasons"]
+                                     for entry in conversation_history
+                                     if entry["call_stats"].get("escalation_reasons")}
+            }
+        return analysis
 
     def generate_executive_report(self, analysis: Dict[str, Any], output_file: str):
         """Generate a comprehensive executive report"""
@@ -639,7 +1159,13 @@ Synthesize all this analysis into comprehensive, educational feedback that helps
             f.write(f"    Weighted Test Score: {metrics.get('weighted_score', 0):.1f}%\n")
             f.write(f"    Memory Management: {metrics.get('memory_score', 0)}/100\n")
             f.write(f"    Robustness Score: {metrics.get('robustness_score', 0)}/100\n")
-            f.write(f"    Execution Time: {metrics.get('execution_time_ms', 0)}ms\n\n")
+            f.write(f"    Execution Time: {metrics.get('execution_time_ms', 0)}ms\n")
+            check = metrics.get('complexity_check', {})
+            if check.get('measured'):
+                verdict = {True: "agrees", False: "DISAGREES", None: "not comparable"}[check.get('agrees')]
+                f.write(f"    Time Complexity: measured {check['measured']} (R² {check.get('time_fit_r2', 0):.3f}), "
+                        f"LLM claimed {check.get('llm_claim') or 'nothing'} - {verdict}\n")
+            f.write("\n")
             
             # Write each stage analysis
             self._write_stage_analysis(f, "STAGE 1: ALGORITHM & CODE STRUCTURE ANALYSIS", 
@@ -666,6 +1192,9 @@ Synthesize all this analysis into comprehensive, educational feedback that helps
         if not stage_data or "error" in stage_data:
             file.write("❌ Analysis stage failed or returned incomplete data.\n\n")
             return
+        if "skipped" in stage_data:
+            file.write(f"⏭️  Skipped: {stage_data['skipped']}\n\n")
+            return
             
         # Write stage-specific content based on structure
         if "algorithm_analysis" in stage_data:
@@ -765,14 +1294,16 @@ Synthesize all this analysis into comprehensive, educational feedback that helps
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python3 advanced_code_analyzer.py <source_file.c> <results_file.json>")
+    flags = {arg for arg in sys.argv[1:] if arg.startswith("--")}
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if len(args) != 2 or not flags <= {"--fast", "--stream"}:
+        print("Usage: python3 advanced_code_analyzer.py [--fast] [--stream] <source_file.c> <results_file.json>")
         sys.exit(1)
 
-    source_file = sys.argv[1]
-    results_file = sys.argv[2]
+    source_file = args[0]
+    results_file = args[1]
     
-    analyzer = AdvancedCodeAnalyzer()
+    analyzer = AdvancedCodeAnalyzer(fast_mode="--fast" in flags, stream="--stream" in flags)
     
     # Perform the full multi-stage analysis
     complete_analysis = analyzer.perform_comprehensive_analysis(source_file, results_file)
@@ -0,0 +1,401 @@
+"""
+Asyncio judge engine built on ollama.AsyncClient.
+The four analysis stages are modelled as a dependency graph so that
+independent work overlaps, and many submissions can be analyzed at once
+against a model server that serves parallel requests.
+"""
+
+import asyncio
+import json
+import sys
+import time
+from typing import Dict, Any, List, Tuple, Callable, Awaitable, Optional
+
+import ollama
+
+from Llm_as_judge import AdvancedCodeAnalyzer, CodeMetrics
+from cascade import difficulty_gate
+from routing import Route, RoutingTable
+from llm_cache import LLMResponseCache
+from structured_output import (CODE_ANALYSIS_SCHEMA, FAILURE_ANALYSIS_SCHEMA, EDGE_CASE_SCHEMA,
+                               FEEDBACK_SCHEMA, FAST_JUDGE_SCHEMA, parse_and_validate,
+                               build_repair_messages, JsonObjectScanner)
+
+
+class StageGraph:
+    """Runs named async nodes, each awaiting only the results it actually needs.
+
+    A node is a coroutine function taking the graph; it calls
+    ``await graph.result(name)`` for its dependencies. Edges are therefore
+    resolved lazily, which lets a node (e.g. stage 2) skip a dependency
+    entirely when it can answer without it.
+    """
+
+    def __init__(self):
+        self.nodes: Dict[str, Callable[["StageGraph"], Awaitable[Any]]] = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.timings: Dict[str, Dict[str, float]] = {}
+        self._t0 = 0.0
+
+    def add(self, name: str, fn: Callable[["StageGraph"], Awaitable[Any]]):
+        self.nodes[name] = fn
+
+    async def result(self, name: str) -> Any:
+        return await self.tasks[name]
+
+    async def _run_node(self, name: str) -> Any:
+        value = await self.nodes[name](self)
+        self.timings[name] = {"finished_at_s": round(time.perf_counter() - self._t0, 3)}
+        return value
+
+    async def run(self) -> Dict[str, Any]:
+        self._t0 = time.perf_counter()
+        self.tasks = {name: asyncio.create_task(self._run_node(name)) for name in self.nodes}
+        try:
+            await asyncio.gather(*self.tasks.values())
+        except BaseException:
+            for task in self.tasks.values():
+                task.cancel()
+            raise
+        return {name: task.result() for name, task in self.tasks.items()}
+
+
+def checkpointed(name: str, fn: Callable[[StageGraph], Awaitable[Any]], checkpoint) -> Callable:
+    """Wrap a graph node so a saved result is reused and a new one is saved (unless it is an error)"""
+    async def node(graph: StageGraph) -> Any:
+        saved = checkpoint.get(name)
+        if saved is not None:
+            print(f"⏭️  {name}: reusing checkpoint")
+            return saved
+        value = await fn(graph)
+        checkpoint.put(name, value)
+        return value
+    return node
+
+
+class AsyncCodeAnalyzer(AdvancedCodeAnalyzer):
+    def __init__(self, model_name="codellama:13b-instruct", cache: LLMResponseCache = None,
+                 host: Optional[str] = None, max_parallel_requests: int = 4, fast_mode: bool = False,
+                 stream: bool = False, keep_alive=None, cascade_model: Optional[str] = None,
+                 routing: Optional[RoutingTable] = None):
+        super().__init__(model_name=model_name, cache=cache, fast_mode=fast_mode, stream=stream,
+                         keep_alive=keep_alive, cascade_model=cascade_model, routing=routing)
+        self.client = ollama.AsyncClient(host=host)
+        # Caps in-flight model requests across all submissions sharing this analyzer
+        self.request_slots = asyncio.Semaphore(max_parallel_requests)
+
+    async def call_llm_async(self, messages: List[Dict], max_retries: int = 3,
+                             schema: Dict[str, Any] = None) -> str:
+        """Async counterpart of call_llm_with_retry, sharing the same response cache"""
+        response_text, _ = await self.call_llm_async_with_stats(messages, max_retries, schema)
+        return response_text
+
+    async def call_llm_async_with_stats(self, messages: List[Dict], max_retries: int = 3,
+                                        schema: Dict[str, Any] = None, model: Optional[str] = None,
+                                        options: Optional[Dict[str, Any]] = None) -> Tuple[str, Dict[str, Any]]:
+        """Like call_llm_async, also returning per-call stats (concurrency-safe, unlike last_call_stats)"""
+        model = model or self.model_name
+        options = options or self.llm_options
+        cache_key = self.cache.make_key(model, messages, options, schema)
+        cached = await asyncio.to_thread(self.cache.get, cache_key)  # Disk I/O off the event loop
+        if cached is not None:
+            return cached, {"cached": True, "wall_s": 0.0}
+
+        for attempt in range(max_retries):
+            try:
+                async with self.request_slots:
+                    if self.stream:
+                        response_text, stats = await self.stream_llm_response_async(messages, schema, model,
+                                                                                    options)
+                    else:
+                        start = time.perf_counter()
+                        response = await self.client.chat(
+                            model=model,
+                            messages=messages,
+                            options=options,
+                            **self.chat_kwargs(schema)
+                        )
+                        stats = self.response_stats(response, time.perf_counter() - start)
+                        response_text = response['message']['content'].strip()
+                await asyncio.to_thread(self.cache.put, cache_key, response_text, model)
+                return response_text, stats
+            except Exception as e:
+                print(f"Attempt {attempt + 1} failed: {e}")
+                if attempt == max_retries - 1:
+                    raise
+                await asyncio.sleep(2 ** attempt)  # Exponential backoff
+
+    async def stream_llm_response_async(self, messages: List[Dict], schema: Dict[str, Any] = None,
+                                        model: Optional[str] = None,
+                                        options: Optional[Dict[str, Any]] = None) -> Tuple[str, Dict[str, Any]]:
+        """Async counterpart of stream_llm_response"""
+        start = time.perf_counter()
+        scanner = JsonObjectScanner()
+        parts: List[str] = []
+        stats = self.new_stream_stats()
+
+        stream = await self.client.chat(
+            model=model or self.model_name,
+            messages=messages,
+            options=options or self.llm_options,
+            stream=True,
+            **self.chat_kwargs(schema)
+        )
+        try:
+            async for chunk in stream:
+                if self.consume_stream_chunk(chunk, parts, scanner, stats, start):
+                    break
+        finally:
+            await stream.aclose()
+
+        return self.finish_stream(parts, scanner, stats, start)
+
+    async def extract_json_async(self, response_text: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+        """Async counterpart of extract_json_from_response, including the repair pass"""
+        data, errors = parse_and_validate(response_text, schema)
+        if errors:
+            print(f"⚠️  Response failed validation ({errors[0]}); requesting targeted repair...")
+            self.structured_output_stats["repairs_attempted"] += 1
+            repaired_text = await self.call_llm_async(build_repair_messages(response_text, errors, schema),
+                                                      schema=schema)
+            data, errors = self.accept_repair(data, errors, repaired_text, schema)
+        return self.finalize_json(response_text, data, errors)
+
+    async def run_llm_stage_async(self, stage: str, messages: List[Dict], schema: Dict[str, Any],
+                                  metrics: CodeMetrics,
+                                  route: Optional[Route] = None) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
+        """Async counterpart of run_llm_stage, including the model cascade"""
+        model, options = self.route_settings(route)
+        start = time.perf_counter()
+        reasons = []
+        if self.cascade_model and self.cascade_model != model:
+            reasons = difficulty_gate(metrics.difficulty_level)
+            if not reasons:
+                try:
+                    response_text, stats = await self.call_llm_async_with_stats(
+                        messages, max_retries=1, schema=schema, model=self.cascade_model, options=options)
+                    stats = dict(stats, model=self.cascade_model, escalation_reasons=[])
+                    data, errors = parse_and_validate(response_text, schema)
+                    reasons = self.cascade_gate(stage, data, errors, metrics)
+                except Exception as e:
+                    print(f"⚠️  {stage} failed on {self.cascade_model}: {e}")
+                    reasons = ["cascade_model_error"]
+                if not reasons:
+                    self.cascade_stats.record(stage, reasons, time.perf_counter() - start)
+                    return response_text, stats, data
+            print(f"⤴️  {stage}: escalating to {model} ({', '.join(reasons)})")
+        first_tier_s = time.perf_counter() - start
+
+        response_text, stats = await self.call_llm_async_with_stats(messages, schema=schema, model=model,
+                                                                    options=options)
+        stats = dict(stats, model=model)
+        data = await self.extract_json_async(response_text, schema)
+        if self.cascade_model and self.cascade_model != model:
+            stats["escalation_reasons"] = reasons
+            self.cascade_stats.record(stage, reasons, first_tier_s, time.perf_counter() - start - first_tier_s)
+        return response_text, stats, data
+
+    async def _run_llm_stage(self, stage: str, node: str, messages: List[Dict], conversations: List[Dict],
+                             schema: Dict[str, Any], metrics: CodeMetrics,
+                             route: Optional[Route] = None) -> Dict[str, Any]:
+        response_text, stats, data = await self.run_llm_stage_async(node, messages, schema, metrics, route)
+        conversations.append({"stage": stage, "response": response_text, "call_stats": stats})
+        return data
+
+    def load_routing_inputs(self, source_file: str, results_file: str) -> Tuple[CodeMetrics, Dict[str, Any]]:
+        """Metrics and structure needed to route a submission, read before its graph is built"""
+        with open(source_file, 'r') as f:
+            source_code = f.read()
+        with open(results_file, 'r') as f:
+            metrics = self.extract_metrics(json.load(f))
+        return metrics, self.analyze_code_structure(source_code)
+
+    def build_stage_graph(self, source_file: str, results_file: str, conversations: List[Dict],
+                          route: Optional[Route] = None) -> StageGraph:
+        """Dependency graph for one submission's analysis; stages the route does not run are skipped"""
+        graph = StageGraph()
+
+        async def load_source(g):
+            def read():
+                with open(source_file, 'r') as f:
+                    return f.read()
+            return await asyncio.to_thread(read)
+
+        async def load_metrics(g):
+            def read():
+                with open(results_file, 'r') as f:
+                    return json.load(f)
+            return self.extract_metrics(await asyncio.to_thread(read))
+
+        async def structure(g):
+            return await asyncio.to_thread(self.analyze_code_structure, await g.result("source"))
+
+        async def stage_1(g):
+            if route is not None and not route.runs("stage_1"):
+                return self.skipped_stage(route)
+            source_code, metrics, structure_analysis = await asyncio.gather(
+                g.result("source"), g.result("metrics"), g.result("structure"))
+            print(f"🔍 Stage 1: Deep Code Understanding & Algorithm Analysis... ({source_file})")
+            messages = self.build_stage_1_messages(source_code, metrics, structure_analysis)
+            return await self._run_llm_stage("code_understanding", "stage_1", messages, conversations,
+                                             CODE_ANALYSIS_SCHEMA, metrics, route)
+
+        async def stage_2(g):
+            # Decided as soon as metrics are loaded; only waits on stage 1 if there are failures
+            metrics = await g.result("metrics")
+            if not metrics.failed_tests:
+                return self.no_failure_analysis()
+            if route is not None and not route.runs("stage_2"):
+                return self.skipped_stage(route)
+            source_code, code_analysis = await asyncio.gather(g.result("source"), g.result("stage_1"))
+            print(f"🔍 Stage 2: Test Failure Analysis... ({source_file})")
+            messages = self.build_stage_2_messages(source_code, metrics, code_analysis)
+            return await self._run_llm_stage("failure_analysis", "stage_2", messages, conversations,
+                                             FAILURE_ANALYSIS_SCHEMA, metrics, route)
+
+        async def stage_3(g):
+            if route is not None and not route.runs("stage_3"):
+                return self.skipped_stage(route)
+            source_code, metrics, code_analysis, failure_analysis = await asyncio.gather(
+                g.result("source"), g.result("metrics"), g.result("stage_1"), g.result("stage_2"))
+            print(f"🔍 Stage 3: Edge Case & Vulnerability Discovery... ({source_file})")
+            messages = self.build_stage_3_messages(source_code, metrics, code_analysis, failure_analysis)
+            return await self._run_llm_stage("edge_case_discovery", "stage_3", messages, conversations,
+                                             EDGE_CASE_SCHEMA, metrics, route)
+
+        async def stage_4(g):
+            source_code, metrics, code_analysis, failure_analysis, edge_case_analysis = await asyncio.gather(
+                g.result("source"), g.result("metrics"), g.result("stage_1"),
+                g.result("stage_2"), g.result("stage_3"))
+            print(f"🔍 Stage 4: Comprehensive Educational Feedback Synthesis... ({source_file})")
+            messages = self.build_stage_4_messages(source_code, metrics, code_analysis,
+                                                   failure_analysis, edge_case_analysis)
+            return await self._run_llm_stage("comprehensive_feedback", "stage_4", messages, conversations,
+                                             FEEDBACK_SCHEMA, metrics, route)
+
+        graph.add("source", load_source)
+        graph.add("metrics", load_metrics)
+        graph.add("structure", structure)
+        graph.add("stage_1", stage_1)
+        graph.add("stage_2", stage_2)
+        graph.add("stage_3", stage_3)
+        graph.add("stage_4", stage_4)
+        return graph
+
+    def build_fast_graph(self, source_file: str, results_file: str, conversations: List[Dict],
+                         route: Optional[Route] = None) -> StageGraph:
+        """Fast-mode graph: one combined LLM call, split back into the four stage results"""
+        graph = self.build_stage_graph(source_file, results_file, conversations, route)
+
+        async def combined(g):
+            source_code, metrics, structure_analysis = await asyncio.gather(
+                g.result("source"), g.result("metrics"), g.result("structure"))
+            print(f"🔍 Stages 1-4: Combined Analysis & Feedback... ({source_file})")
+            messages = self.build_fast_messages(source_code, metrics, structure_analysis)
+            response_text, stats, combined_json = await self.run_llm_stage_async(
+                "combined", messages, FAST_JUDGE_SCHEMA, metrics, route)
+            conversations.append({"stage": "fast_combined", "response": response_text, "call_stats": stats})
+            stages = self.split_fast_response(combined_json, metrics)
+
+            staged_messages = [self.build_stage_1_messages(source_code, metrics, structure_analysis)]
+            if metrics.failed_tests:
+                staged_messages.append(self.build_stage_2_messages(source_code, metrics, stages[0]))
+            staged_messages.append(self.build_stage_3_messages(source_code, metrics, stages[0], stages[1]))
+            staged_messages.append(self.build_stage_4_messages(source_code, metrics, *stages[:3]))
+            return stages, self.estimate_fast_mode_savings(messages, staged_messages, stats)
+
+        def stage_from_combined(index):
+            async def node(g):
+                stages, _ = await g.result("combined")
+                return stages[index]
+            return node
+
+        graph.add("combined", combined)
+        for index in range(4):
+            graph.add(f"stage_{index + 1}", stage_from_combined(index))
+        return graph
+
+    async def analyze(self, source_file: str, results_file: str, checkpoint=None) -> Dict[str, Any]:
+        """Async variant of perform_comprehensive_analysis for a single submission.
+
+        ``checkpoint`` (e.g. job_store.StageCheckpoint) supplies LLM stage results
+        saved by an earlier, interrupted run and records each new one as it completes.
+        """
+        conversations: List[Dict] = []
+        route, decision = None, None
+        if self.routing is not None:
+            # The route decides the graph's shape, so it is picked before the graph is built
+            try:
+                metrics, structure_analysis = await asyncio.to_thread(self.load_routing_inputs,
+                                                                      source_file, results_file)
+            except (OSError, json.JSONDecodeError) as e:
+                return {"error": f"Failed to load files: {e}"}
+            route, decision = self.select_route(source_file, metrics, structure_analysis)
+        fast = route.fast if route is not None else self.fast_mode
+        if fast:
+            graph = self.build_fast_graph(source_file, results_file, conversations, route)
+        else:
+            graph = self.build_stage_graph(source_file, results_file, conversations, route)
+        if checkpoint is not None:
+            llm_nodes = ["combined"] if fast else ["stage_1", "stage_2", "stage_3", "stage_4"]
+            for name in llm_nodes:
+                graph.add(name, checkpointed(name, graph.nodes[name], checkpoint))
+
+        start = time.perf_counter()
+        try:
+            results = await graph.run()
+        except (OSError, json.JSONDecodeError) as e:
+            return {"error": f"Failed to load files: {e}"}
+
+        complete_analysis = self.assemble_analysis(
+            source_file, results["metrics"], results["stage_1"], results["stage_2"],
+            results["stage_3"], results["stage_4"], conversations)
+        complete_analysis["meta_information"]["engine"] = "async"
+        self.add_routing_meta(complete_analysis, decision)
+        if fast:
+            complete_analysis["meta_information"]["analysis_mode"] = "fast"
+            complete_analysis["meta_information"]["fast_mode"] = results["combined"][1]
+        complete_analysis["meta_information"]["stage_timings"] = graph.timings
+        complete_analysis["meta_information"]["wall_time_s"] = round(time.perf_counter() - start, 3)
+        return complete_analysis
+
+    async def analyze_many(self, submissions: List[Tuple[str, str]],
+                           max_concurrent_submissions: int = 8) -> List[Dict[str, Any]]:
+        """Analyze (source_file, results_file) pairs concurrently, preserving input order"""
+        submission_slots = asyncio.Semaphore(max_concurrent_submissions)
+
+        async def one(source_file: str, results_file: str) -> Dict[str, Any]:
+            async with submission_slots:
+                try:
+                    return await self.analyze(source_file, results_file)
+                except Exception as e:
+                    return {"error": f"Analysis failed: {e}", "source_file": source_file}
+
+        return await asyncio.gather(*(one(src, res) for src, res in submissions))
+
+
+async def _main(source_file: str, results_file: str):
+    analyzer = AsyncCodeAnalyzer()
+    complete_analysis = await analyzer.analyze(source_file, results_file)
+
+    if "error" in complete_analysis:
+        print(f"An error occurred: {complete_analysis['error']}")
+        sys.exit(1)
+
+    json_output_file = "comprehensive_analysis.json"
+    report_output_file = "feedback_report.txt"
+
+    with open(json_output_file, 'w') as f:
+        json.dump(complete_analysis, f, indent=2)
+    print(f"\n✅ Raw analysis data saved to {json_output_file}")
+
+    analyzer.generate_executive_report(complete_analysis, report_output_file)
+    print(f"✅ Human-readable feedback report saved to {report_output_file}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python3 async_judge.py <source_file.c> <results_file.json>")
+        sys.exit(1)
+
+    asyncio.run(_main(sys.argv[1], sys.argv[2]))
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Batch judge: runs the full 3-stage pipeline (test generation, evaluation,
+multi-stage analysis) over a directory or manifest of C submissions with a
+bounded worker pool and back-pressure against the model server.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, Any, List, Tuple, Callable, Awaitable, Optional
+
+from async_judge import AsyncCodeAnalyzer
+from job_store import JobStore, default_store_path
+from pipeline import CASCADE_MODEL, build_evaluator
+from routing import RoutingTable
+from testcase import TestCaseGenerator
+
+
+def discover_submissions(path: str) -> List[Tuple[str, str]]:
+    """Return (name, source_file) pairs from a directory or a manifest file.
+
+    A directory may hold ``*.c`` files directly (named after the file) or one
+    subdirectory per student holding a single ``.c`` file (named after the
+    subdirectory). A manifest lists one source path per line; blank lines and
+    ``#`` comments are ignored and relative paths resolve against the manifest.
+    """
+    submissions = []
+
+    if os.path.isfile(path):
+        base_dir = os.path.dirname(os.path.abspath(path))
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                source = os.path.normpath(os.path.join(base_dir, line))
+                submissions.append((os.path.splitext(os.path.basename(source))[0], source))
+    else:
+        for entry in sorted(os.listdir(path)):
+            full = os.path.join(path, entry)
+            if os.path.isfile(full) and entry.endswith('.c'):
+                submissions.append((os.path.splitext(entry)[0], full))
+            elif os.path.isdir(full):
+                sources = sorted(name for name in os.listdir(full) if name.endswith('.c'))
+                if len(sources) == 1:
+                    submissions.append((entry, os.path.join(full, sources[0])))
+                elif sources:
+                    print(f"⚠️  Skipping {full}: expected one .c file, found {len(sources)}")
+
+    # Disambiguate duplicate names (e.g. several main.c in a manifest)
+    seen: Dict[str, int] = {}
+    unique = []
+    for name, source in submissions:
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        unique.append((f"{name}_{count}" if count else name, source))
+    return unique
+
+
+class BatchJudge:
+    def __init__(self, output_dir: str, workers: int = 8, model_slots: int = 2, eval_slots: int = None,
+                 generator_model: str = "codellama:7b", analyzer_model: str = "codellama:13b-instruct",
+                 fast_mode: bool = False, stream: bool = False, complexity: bool = False, keep_alive=None,
+                 store: Optional[JobStore] = None, cascade_model: Optional[str] = None,
+                 routing: Optional[RoutingTable] = None):
+        self.output_dir = output_dir
+        self.workers = workers
+        self.model_slots = model_slots
+        self.eval_slots_count = eval_slots or os.cpu_count() or 1
+        # Split the cores between concurrent evaluators rather than oversubscribing
+        self.test_jobs = max(1, (os.cpu_count() or 1) // self.eval_slots_count)
+        # With a cascade the generator's escalation target is the analyzer's larger model
+        self.generator = TestCaseGenerator(model_name=analyzer_model if cascade_model else generator_model,
+                                           keep_alive=keep_alive, cascade_model=cascade_model)
+        # model_slots bounds in-flight requests to the model server across every stage
+        self.analyzer = AsyncCodeAnalyzer(model_name=analyzer_model, max_parallel_requests=model_slots,
+                                          fast_mode=fast_mode, stream=stream, keep_alive=keep_alive,
+                                          cascade_model=cascade_model, routing=routing)
+        self.cascade_model = cascade_model
+        self.eval_slots = asyncio.Semaphore(self.eval_slots_count)
+        self.complexity = complexity
+        self.store = store  # Stage checkpoints; finished work is skipped when a run is restarted
+        self.evaluator_exe = None
+
+    def cascade_report(self) -> Optional[Dict[str, Any]]:
+        """Per-stage escalation rates and latency, or None without a cascade"""
+        if not self.cascade_model:
+            return None
+        return {**self.generator.cascade_stats.report(), **self.analyzer.cascade_stats.report()}
+
+    def checkpoint_config(self) -> Dict[str, Any]:
+        """Run settings that shape a submission's results; changing any of them re-runs it on resume"""
+        return dict(self.analyzer.checkpoint_config(), generator_model=self.generator.model_name,
+                    complexity=self.complexity)
+
+    async def generate_tests(self, source_file: str, tests_file: str) -> Dict[str, Any]:
+        async with self.analyzer.request_slots:
+            test_data = await asyncio.to_thread(self.generator.generate_test_cases, source_file)
+        await asyncio.to_thread(self.generator.save_test_cases, test_data, tests_file)
+        return test_data
+
+    async def evaluate(self, source_file: str, tests_file: str, results_file: str, log_file: str):
+        # A results file left by an earlier run must not pass for this one
+        if os.path.exists(results_file):
+            os.remove(results_file)
+        async with self.eval_slots:
+            options = ["-j", str(self.test_jobs)] + (["-C"] if self.complexity else [])
+            with open(log_file, 'w') as log:
+                proc = await asyncio.create_subprocess_exec(
+                    self.evaluator_exe, *options, source_file, tests_file, results_file,
+                    stdout=log, stderr=subprocess.STDOUT
+                )
+                await proc.wait()
+        if proc.returncode != 0 or not os.path.exists(results_file):
+            raise RuntimeError(f"evaluator exited with status {proc.returncode}, see {log_file}")
+
+    async def judge_one(self, name: str, source_file: str,
+                        progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Run all three stages for one submission, writing outputs under output_dir/name.
+
+        ``progress`` (if given) receives a stage event dict as each stage starts and finishes.
+        """
+        sub_dir = os.path.join(self.output_dir, name)
+        os.makedirs(sub_dir, exist_ok=True)
+        tests_file = os.path.join(sub_dir, "generated_test_cases.json")
+        results_file = os.path.join(sub_dir, "evaluation_metrics.json")
+        analysis_file = os.path.join(sub_dir, "comprehensive_analysis.json")
+        report_file = os.path.join(sub_dir, "feedback_report.txt")
+
+        if self.store:
+            finished = await asyncio.to_thread(self.store.open_job, name, source_file, self.checkpoint_config())
+            if finished is not None:
+                if progress:
+                    progress({"event": "stage", "stage": "all", "status": "resumed"})
+                return dict(finished, resumed=True)
+        checkpoint = self.store.checkpoint(name) if self.store else None
+
+        record = {"name": name, "source_file": source_file, "status": "ok", "timings_s": {}}
+        stage = None
+
+        def begin(next_stage: str) -> float:
+            nonlocal stage
+            stage = next_stage
+            if progress:
+                progress({"event": "stage", "stage": stage, "status": "started"})
+            return time.perf_counter()
+
+        def finish(started: float):
+            record["timings_s"][stage] = round(time.perf_counter() - started, 3)
+            if progress:
+                progress({"event": "stage", "stage": stage, "status": "finished",
+                          "elapsed_s": record["timings_s"][stage]})
+
+        try:
+            t = begin("test_generation")
+            test_data = await self.resume_or_run(checkpoint, stage, tests_file,
+                                                 lambda: self.generate_tests(source_file, tests_file))
+            finish(t)
+            record["generation_method"] = test_data.get("generation_method")
+
+            async def run_evaluation():
+                await self.evaluate(source_file, tests_file, results_file, os.path.join(sub_dir, "evaluator.log"))
+                with open(results_file, 'r') as f:
+                    return json.load(f)
+
+            t = begin("evaluation")
+            await self.resume_or_run(checkpoint, stage, results_file, run_evaluation)
+            finish(t)
+
+            t = begin("analysis")
+            analysis = await self.analyzer.analyze(source_file, results_file, checkpoint=checkpoint)
+            finish(t)
+            if "error" in analysis:
+                raise RuntimeError(analysis["error"])
+
+            with open(analysis_file, 'w') as f:
+                json.dump(analysis, f, indent=2)
+            self.analyzer.generate_executive_report(analysis, report_file)
+
+            metrics = analysis.get("quantitative_metrics", {})
+            final = analysis.get("final_assessment", {})
+            record.update({
+                "grade": final.get("grade"),
+                "score": final.get("score"),
+                "passrate": metrics.get("passrate"),
+                "memory_score": metrics.get("memory_score"),
+                "robustness_score": metrics.get("robustness_score"),
+                "tests_passed": metrics.get("tests_passed"),
+                "total_tests": metrics.get("total_tests")
+            })
+            if "fast_mode" in analysis["meta_information"]:
+                record["fast_mode"] = analysis["meta_information"]["fast_mode"]
+        except Exception as e:
+            record["status"] = "failed"
+            record["failed_stage"] = stage
+            record["error"] = str(e)
+        if record["status"] == "ok" and checkpoint and not checkpoint.complete:
+            # Graded from a fallback or error output: not finished, so a resume runs those stages again
+            record["status"] = "incomplete"
+            record["incomplete_stages"] = checkpoint.unsaved
+
+        if self.store:
+            await asyncio.to_thread(self.store.finish_job, name, record)
+        return record
+
+    @staticmethod
+    async def resume_or_run(checkpoint, stage: str, path: str, run: Callable[[], Awaitable[Any]]) -> Any:
+        """Reuse a stage output saved by an earlier run (rewriting its file), or run the stage and save it
+
+        Fallback and error outputs are not saved (see job_store.checkpointable), so they run again.
+        """
+        saved = checkpoint.get(stage) if checkpoint else None
+        if saved is not None:
+            with open(path, 'w') as f:
+                json.dump(saved, f, indent=2)
+            return saved
+        output = await run()
+        if checkpoint:
+            checkpoint.put(stage, output)
+        return output
+
+    async def run(self, submissions: List[Tuple[str, str]]) -> Dict[str, Any]:
+        os.makedirs(self.output_dir, exist_ok=True)
+        start = time.perf_counter()
+
+        self.evaluator_exe = await asyncio.to_thread(build_evaluator)
+
+        # Bounded queue: producers block once `workers` submissions are waiting
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.workers)
+        records: Dict[int, Dict[str, Any]] = {}
+        total = len(submissions)
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    queue.task_done()
+                    return
+                index, name, source_file = item
+                record = await self.judge_one(name, source_file)
+                records[index] = record
+                status = {"ok": "✅", "incomplete": "⚠️ "}.get(record["status"], "❌")
+                print(f"{status} [{len(records)}/{total}] {name}: "
+                      f"{record.get('grade', record.get('error'))}")
+                queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.workers)]
+        for index, (name, source_file) in enumerate(submissions):
+            await queue.put((index, name, source_file))
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+
+        ordered = [records[i] for i in range(total)]
+        summary = {
+            "generated_at": time.time(),
+            "total_submissions": total,
+            "succeeded": sum(1 for r in ordered if r["status"] == "ok"),
+            "incomplete": sum(1 for r in ordered if r["status"] == "incomplete"),
+            "failed": sum(1 for r in ordered if r["status"] == "failed"),
+            "wall_time_s": round(time.perf_counter() - start, 3),
+            "concurrency": {
+                "workers": self.workers,
+                "model_slots": self.model_slots,
+                "eval_slots": self.eval_slots_count
+            },
+            "llm_cache": self.analyzer.cache.stats(),
+            "cascade": self.cascade_report(),
+            "routes": self.analyzer.routing.counts if self.analyzer.routing else None,
+            "resumed": sum(1 for r in ordered if r.get("resumed")),
+            "submissions": ordered
+        }
+
+        with open(os.path.join(self.output_dir, "batch_summary.json"), 'w') as f:
+            json.dump(summary, f, indent=2)
+        return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the evaluation pipeline over many C submissions")
+    parser.add_argument("submissions", help="directory of submissions or manifest file of source paths")
+    parser.add_argument("output_dir", help="directory for per-submission outputs and batch_summary.json")
+    parser.add_argument("-j", "--workers", type=int, default=8,
+                        help="submissions processed concurrently (default: 8)")
+    parser.add_argument("--model-slots", type=int, default=2,
+                        help="max in-flight requests to the model server (default: 2)")
+    parser.add_argument("--eval-slots", type=int, default=None,
+                        help="max concurrent evaluator processes (default: CPU count)")
+    parser.add_argument("--fast", action="store_true",
+                        help="answer all four analysis stages with a single LLM call")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream LLM responses and stop generation once the JSON object closes")
+    parser.add_argument("--complexity", action="store_true",
+                        help="measure empirical time/space complexity of each submission")
+    parser.add_argument("--cascade", nargs="?", const=CASCADE_MODEL, metavar="MODEL",
+                        help=f"try every LLM stage on MODEL (default: {CASCADE_MODEL}) first and escalate "
+                             "to the 13B model only when its answer fails the quality gate")
+    parser.add_argument("--route", nargs="?", const="default", metavar="TABLE",
+                        help="pick model, token budget and stages per submission from a routing table "
+                             "(JSON file; default: the built-in table); overrides --fast")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="do not keep stage checkpoints in output_dir/job_store.sqlite "
+                             "(by default a restarted batch skips finished work)")
+    args = parser.parse_args()
+
+    submissions = discover_submissions(args.submissions)
+    if not submissions:
+        print(f"❌ No submissions found in {args.submissions}")
+        sys.exit(1)
+
+    try:
+        routing = RoutingTable.load(args.route) if args.route else None
+    except (OSError, ValueError, TypeError) as e:
+        print(f"❌ Invalid routing table: {e}")
+        sys.exit(1)
+
+    print(f"🚀 Judging {len(submissions)} submissions "
+          f"({args.workers} workers, {args.model_slots} model slots)...")
+    store = None
+    if not args.no_resume:
+        os.makedirs(args.output_dir, exist_ok=True)
+        store = JobStore(default_store_path(args.output_dir))
+    judge = BatchJudge(args.output_dir, workers=args.workers, model_slots=args.model_slots,
+                       eval_slots=args.eval_slots, fast_mode=args.fast,
+                       stream=args.stream, complexity=args.complexity, store=store,
+                       cascade_model=args.cascade, routing=routing)
+    try:
+        summary = asyncio.run(judge.run(submissions))
+    finally:
+        if store:
+            store.close()
+
+    print(f"\n🎉 Batch complete in {summary['wall_time_s']}s: "
+          f"{summary['succeeded']} succeeded, {summary['incomplete']} incomplete, {summary['failed']} failed, "
+          f"{summary['resumed']} already done")
+    print(f"📄 Summary written to {os.path.join(args.output_dir, 'batch_summary.json')}")
+    sys.exit(0 if summary["succeeded"] == summary["total_submissions"] else 2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark the evaluator's per-test process overhead with and without the
+fork server (-F). Runs a trivial program over many tiny tests so the cost
+of starting each test dominates, and compares the two modes.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+EVALUATOR_SOURCE = os.path.join(SCRIPT_DIR, "eval.c")
+
+TRIVIAL_PROGRAM = """#include <stdio.h>
+int main(void) {
+    long a, b;
+    if (scanf("%ld %ld", &a, &b) != 2) return 1;
+    printf("%ld\\n", a + b);
+    return 0;
+}
+"""
+
+
+def write_inputs(work_dir: str, num_tests: int):
+    """Write the trivial program and a suite of num_tests tiny tests"""
+    source = os.path.join(work_dir, "sum.c")
+    with open(source, 'w') as f:
+        f.write(TRIVIAL_PROGRAM)
+
+    tests = [{"input": f"{i} {i + 1}", "expected_output": str(2 * i + 1),
+              "description": f"sum {i}", "category": "normal"} for i in range(num_tests)]
+    tests_file = os.path.join(work_dir, "tests.json")
+    with open(tests_file, 'w') as f:
+        json.dump({"program_description": "adds two numbers", "test_cases": tests}, f)
+    return source, tests_file
+
+
+def run_mode(evaluator: str, source: str, tests_file: str, results_file: str,
+             jobs: int, fork_server: bool) -> dict:
+    """Run the evaluator once; memory analysis is limited to one test so it does not skew timings"""
+    command = [evaluator, "-j", str(jobs), "-s", "1"] + (["-F"] if fork_server else [])
+    start = time.perf_counter()
+    subprocess.run(command + [source, tests_file, results_file], check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    total_ms = (time.perf_counter() - start) * 1000
+
+    with open(results_file, 'r') as f:
+        results = json.load(f)
+    return {
+        "total_ms": total_ms,
+        "evaluation_ms": results["execution_time_ms"],
+        "per_test_wall_ms": results["resource_summary"]["wall_time_ms"]["median"],
+        "passed": results["tests_passed"]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-test overhead of fork+exec and fork-server modes")
+    parser.add_argument("-n", "--tests", type=int, default=1000, help="tests per run (default: 1000)")
+    parser.add_argument("-r", "--repeats", type=int, default=3, help="runs per mode (default: 3)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="parallel test jobs (default: CPU count)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="forkserver_bench_") as work_dir:
+        evaluator = os.path.join(work_dir, "enhanced_evaluator")
+        build = subprocess.run(["gcc", "-O2", "-pthread", "-o", evaluator, EVALUATOR_SOURCE, "-ljson-c", "-lm"],
+                               capture_output=True, text=True)
+        if build.returncode != 0:
+            print(f"❌ Could not build the evaluator:\n{build.stderr}")
+            sys.exit(1)
+        source, tests_file = write_inputs(work_dir, args.tests)
+        results_file = os.path.join(work_dir, "results.json")
+
+        print(f"🚀 {args.tests} tests x {args.repeats} runs per mode, {args.jobs} jobs\n")
+        summary = {}
+        for label, fork_server in (("fork+exec", False), ("fork server", True)):
+            # Warm-up run fills the compile cache so both modes time the tests, not gcc
+            run_mode(evaluator, source, tests_file, results_file, args.jobs, fork_server)
+            runs = [run_mode(evaluator, source, tests_file, results_file, args.jobs, fork_server)
+                    for _ in range(args.repeats)]
+            if any(run["passed"] != args.tests for run in runs):
+                print(f"❌ {label}: not every test passed; timings are not comparable")
+                sys.exit(1)
+            summary[label] = {key: statistics.median(run[key] for run in runs)
+                              for key in ("total_ms", "evaluation_ms", "per_test_wall_ms")}
+            stats = summary[label]
+            print(f"⏱️  {label:12s} per test {stats['per_test_wall_ms']:.3f} ms median, "
+                  f"evaluation {stats['evaluation_ms']:.0f} ms, total {stats['total_ms']:.0f} ms")
+
+    speedup = summary["fork+exec"]["per_test_wall_ms"] / max(summary["fork server"]["per_test_wall_ms"], 1e-9)
+    print(f"\n📊 Fork server cuts per-test wall time {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
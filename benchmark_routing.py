@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark routed against fixed analysis. Re-analyzes the submissions of a
+finished batch (an output directory of batch_judge.py) twice with the LLM
+cache off: once with the fixed four-stage, 4096-token, 13B treatment and once
+through a routing table, then compares throughput and tokens generated.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Dict, Any, List, Tuple
+
+from async_judge import AsyncCodeAnalyzer
+from llm_cache import LLMResponseCache
+from routing import RoutingTable
+
+
+def load_batch(batch_dir: str, limit: int) -> List[Tuple[str, str]]:
+    """(source_file, results_file) pairs of the batch's successfully evaluated submissions"""
+    with open(os.path.join(batch_dir, "batch_summary.json"), 'r') as f:
+        summary = json.load(f)
+    pairs = []
+    for record in summary["submissions"]:
+        results_file = os.path.join(batch_dir, record["name"], "evaluation_metrics.json")
+        if os.path.exists(results_file) and os.path.exists(record["source_file"]):
+            pairs.append((record["source_file"], results_file))
+    return pairs[:limit] if limit else pairs
+
+
+async def run_mode(analyzer: AsyncCodeAnalyzer, submissions: List[Tuple[str, str]],
+                   concurrency: int) -> Dict[str, Any]:
+    start = time.perf_counter()
+    analyses = await analyzer.analyze_many(submissions, max_concurrent_submissions=concurrency)
+    wall_s = time.perf_counter() - start
+
+    calls = [entry["call_stats"] for analysis in analyses for entry in analysis.get("conversation_history", [])]
+    return {
+        "wall_s": wall_s,
+        "submissions_per_min": len(submissions) / wall_s * 60,
+        "llm_calls": len(calls),
+        "completion_tokens": sum(stats.get("completion_tokens") or 0 for stats in calls),
+        "errors": sum(1 for analysis in analyses if "error" in analysis)
+    }
+
+
+async def warm_up(analyzer: AsyncCodeAnalyzer, models: List[str]):
+    """Load every model once so neither mode pays the load time"""
+    for model in models:
+        await analyzer.client.generate(model=model, prompt="")
+
+
+async def benchmark(args) -> Dict[str, Dict[str, Any]]:
+    submissions = load_batch(args.batch_dir, args.limit)
+    if not submissions:
+        print(f"❌ No evaluated submissions found in {args.batch_dir}")
+        sys.exit(1)
+    table = RoutingTable.load(args.route)
+    cache = LLMResponseCache(enabled=False)  # Both modes must really generate
+
+    fixed = AsyncCodeAnalyzer(cache=cache, max_parallel_requests=args.model_slots)
+    routed = AsyncCodeAnalyzer(cache=cache, max_parallel_requests=args.model_slots, routing=table)
+    await warm_up(fixed, sorted({fixed.model_name} | {route.model for route in table.routes}))
+
+    print(f"🚀 {len(submissions)} submissions, {args.concurrency} concurrent, {args.model_slots} model slots\n")
+    results = {}
+    for label, analyzer in (("fixed", fixed), ("routed", routed)):
+        stats = await run_mode(analyzer, submissions, args.concurrency)
+        results[label] = stats
+        print(f"⏱️  {label:6s} {stats['submissions_per_min']:.2f} submissions/min, {stats['wall_s']:.0f}s, "
+              f"{stats['llm_calls']} LLM calls, {stats['completion_tokens']} tokens generated"
+              + (f", {stats['errors']} errors" if stats["errors"] else ""))
+    results["routes"] = table.counts
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare routed and fixed analysis throughput over a finished batch")
+    parser.add_argument("batch_dir", help="output directory of a batch_judge.py run")
+    parser.add_argument("--route", default="default", metavar="TABLE",
+                        help="routing table JSON file (default: the built-in table)")
+    parser.add_argument("-n", "--limit", type=int, default=0, help="use only the first N submissions")
+    parser.add_argument("-c", "--concurrency", type=int, default=4,
+                        help="submissions analyzed concurrently (default: 4)")
+    parser.add_argument("--model-slots", type=int, default=2,
+                        help="max in-flight requests to the model server (default: 2)")
+    args = parser.parse_args()
+
+    results = asyncio.run(benchmark(args))
+    speedup = results["routed"]["submissions_per_min"] / max(results["fixed"]["submissions_per_min"], 1e-9)
+    saved = 1 - results["routed"]["completion_tokens"] / max(results["fixed"]["completion_tokens"], 1)
+    print(f"\n🧭 Routes taken: {results['routes']}")
+    print(f"📊 Routing gives {speedup:.2f}x throughput and generates {saved:.0%} fewer tokens")
+
+
+if __name__ == "__main__":
+    main()
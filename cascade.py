@@ -0,0 +1,67 @@
+"""
+Model cascade bookkeeping shared by the test generator and the analyzers.
+Each LLM stage is tried on a cheap model first and escalated to the full
+model only when a quality gate fails; this module holds the gates that do
+not depend on the stage and the per-stage escalation and latency counters.
+"""
+
+import threading
+from typing import Dict, Any, List, Optional
+
+# Submissions at these difficulty levels skip the cheap model entirely
+ESCALATION_DIFFICULTIES = ("advanced",)
+
+
+def output_gate(data: Optional[Dict[str, Any]], errors: List[str]) -> List[str]:
+    """Escalation reasons for a structurally unusable answer (empty when it parsed and validated)"""
+    if data is None:
+        return ["invalid_json"]
+    if any("missing required key" in e for e in errors):
+        return ["missing_keys"]
+    if errors:
+        return ["schema_violation"]
+    return []
+
+
+def difficulty_gate(difficulty_level: Optional[str]) -> List[str]:
+    return ["difficulty_advanced"] if str(difficulty_level).lower() in ESCALATION_DIFFICULTIES else []
+
+
+class CascadeStats:
+    """Per-stage escalation counts, reasons and latency of each model tier"""
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()  # The test generator records from worker threads
+
+    def record(self, stage: str, reasons: List[str], first_tier_s: float, escalated_s: float = 0.0):
+        with self.lock:
+            self._record(stage, reasons, first_tier_s, escalated_s)
+
+    def _record(self, stage: str, reasons: List[str], first_tier_s: float, escalated_s: float):
+        entry = self.stages.setdefault(stage, {"calls": 0, "escalated": 0, "reasons": {},
+                                               "first_tier_s": 0.0, "escalated_s": 0.0})
+        entry["calls"] += 1
+        entry["first_tier_s"] += first_tier_s
+        if reasons:
+            entry["escalated"] += 1
+            entry["escalated_s"] += escalated_s
+            for reason in reasons:
+                entry["reasons"][reason] = entry["reasons"].get(reason, 0) + 1
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        with self.lock:
+            stages = {stage: dict(entry, reasons=dict(entry["reasons"])) for stage, entry in self.stages.items()}
+        report = {}
+        for stage, entry in stages.items():
+            calls, escalated = entry["calls"], entry["escalated"]
+            report[stage] = {
+                "calls": calls,
+                "escalated": escalated,
+                "escalation_rate": round(escalated / calls, 3),
+                "reasons": entry["reasons"],
+                "mean_first_tier_s": round(entry["first_tier_s"] / calls, 3),
+                "mean_escalated_s": round(entry["escalated_s"] / escalated, 3) if escalated else None,
+                "mean_total_s": round((entry["first_tier_s"] + entry["escalated_s"]) / calls, 3)
+            }
+        return report
@@ -1,3 +1,4 @@
+#define _GNU_SOURCE // For pipe2
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
@@ -12,41 +13,114 @@
 #include <ctype.h>
 #include <json-c/json.h> // For JSON parsing
 #include <sys/time.h>    // For gettimeofday
+#include <pthread.h>
+#include <poll.h>
+#include <sys/timerfd.h>
+#include <sys/syscall.h>
+#include <sys/mman.h>
+#include <stdint.h>
+#include <dirent.h>
+#include <math.h>
+#include <getopt.h>
+#include <sys/socket.h>
+#include <ftw.h>
+
+#ifndef SYS_pidfd_open
+#define SYS_pidfd_open 434
+#endif
 
 // --- Configuration & Constants ---
-#define MAX_TESTS 20
+#define MAX_FAILED_DETAILS 20 // Failure descriptions kept for the results JSON
 #define TIMEOUT_SECONDS 5
-#define MAX_OUTPUT_SIZE 4096
+#define MAX_OUTPUT_SIZE 4096          // Default bytes of output kept per test
+#define OUTPUT_LIMIT_BYTES (16 * 1024 * 1024) // Children writing more than this are killed
 #define MEMORY_LIMIT_MB 64
 #define CPU_TIME_LIMIT_S 2
-#define MAX_INPUT_SIZE 1024
-#define MAX_EXPECTED_OUTPUT_SIZE 1024
-#define MAX_DESCRIPTION_SIZE 256
-
-#define RESULTS_JSON_PATH "/tmp/eval_results.json"
-#define VALGRIND_LOG_PATH "/tmp/valgrind_log.txt"
+#define PREVIEW_SIZE 200 // Bytes of input/output echoed to the console per test
+#define INPUT_CHUNK_SIZE 65536 // Bytes offered to a child's stdin per write
+
+#define COMPILE_FLAGS "-lm"
+#define SANITIZER_FLAGS "-fsanitize=address,undefined -fno-omit-frame-pointer -g -O1 -lm"
+#define SANITIZER_SLOWDOWN 3   // Time limits are scaled by this for instrumented runs
+#define VALGRIND_SLOWDOWN 20   // ...and by this under memcheck
+#define MAX_MEMORY_DETAILS 20  // Memory findings kept verbatim for the results JSON
+#define COMPILE_CACHE_MAX_MB 256
+
+#define COMPLEXITY_MIN_N 256
+#define COMPLEXITY_MAX_N (1L << 20)   // Keeps generated inputs to a few MB
+#define COMPLEXITY_MAX_POINTS 16
+#define COMPLEXITY_REPEATS 3          // Runs per size; the fastest is kept
+#define COMPLEXITY_TARGET_MS 500.0    // Stop growing n once a run takes this much CPU
+#define COMPLEXITY_BUDGET_MS 10000.0  // Total CPU the whole estimate may spend
+#define COMPLEXITY_MIN_GROWTH_MS 2.0  // Less CPU growth than this over all sizes is noise: O(1)
+#define COMPLEXITY_MIN_GROWTH_KB 1024.0
+
+#define RESULTS_JSON_PATH "/tmp/eval_results.json" // Only when no -o/--results is given
+#define RESULTS_FILE_NAME "eval_results.json"      // Written inside -o output_dir
+#define BATCH_OUTPUT_DIR "batch_results"           // Batch mode default for -o
+#define BATCH_RECORDS_FILE_NAME "batch_results.jsonl"
 #define EXEC_FAILURE_EXIT_CODE 127
+#define FORK_SERVER_FD 198          // Control socket descriptor inside the fork server
+#define FORK_SERVER_HELLO_MS 2000   // How long a starting fork server has to report in
+#define MAX_TOKEN_SIZE 256 // Longest output token kept for numeric comparison
 #define ROBUSTNESS_SIGINT_WAIT_US 200000 // 200ms
 
 // --- Enhanced Structs ---
 typedef struct {
-    char input[MAX_INPUT_SIZE];
-    char expected_output[MAX_EXPECTED_OUTPUT_SIZE];
-    char description[MAX_DESCRIPTION_SIZE];
+    size_t len;  // Authoritative length; data may contain NUL bytes
+    char *data;  // Heap copy sized to the data and NUL-terminated, or a read-only file mapping
+    int mapped;  // data is an mmap of a test data file (not NUL-terminated)
+} ByteString;
+
+typedef struct {
+    ByteString input;
+    ByteString expected_output;
+    char *description;
     char category[32]; // normal, edge, error, corner
     float weight;      // Test importance weight
 } DynamicTestCase;
 
 typedef struct {
-    DynamicTestCase tests[MAX_TESTS];
+    // A valid input of any size n: header once, item n times, footer once.
+    // Placeholders: {n} size, {i} item index, {r} pseudo-random number.
+    char header[128];
+    char item[128];
+    char footer[128];
+    long min_n;
+    long max_n;
+} ScalingSpec;
+
+typedef struct {
+    DynamicTestCase *tests; // Heap array of num_tests entries
     int num_tests;
     char program_description[512];
     char program_type[64];
     char difficulty_level[32];
-    char potential_edge_cases[MAX_TESTS][256];
+    char **potential_edge_cases;
     int num_edge_cases;
+    ScalingSpec scaling;    // Input model for complexity estimation
 } TestSuite;
 
+typedef struct {
+    double wall_time_ms;          // Fork to exit, measured on the monotonic clock
+    double user_cpu_ms;
+    double sys_cpu_ms;
+    long max_rss_kb;              // Peak resident set size (wait4 ru_maxrss)
+    int exit_code;                // -1 if the child did not exit normally
+    int signal;                   // Terminating signal, 0 if none
+} ChildUsage;
+
+typedef struct {
+    int passed;
+    ChildUsage usage;
+} TestOutcome;
+
+typedef struct {
+    double min;
+    double median;
+    double max;
+} ResourceSummary;
+
 typedef struct {
     float passrate;
     float memory_score;
@@ -55,28 +129,295 @@ typedef struct {
     long execution_time_ms;
     int tests_passed;
     int tests_failed;
-    char failed_tests[MAX_TESTS][512]; // Details of failed tests
+    char failed_tests[MAX_FAILED_DETAILS][512]; // Details of failed tests
     int num_failed_details;
+    int output_limit_kills;       // Tests killed for exceeding output_limit_bytes
+    long output_bytes_discarded;  // Output counted but not kept, summed over all tests
+    TestOutcome *test_outcomes;   // Per correctness test, in suite order
+    int num_test_outcomes;
+    // Distributions over the correctness tests
+    ResourceSummary wall_time_summary;
+    ResourceSummary user_cpu_summary;
+    ResourceSummary sys_cpu_summary;
+    ResourceSummary max_rss_summary;
 } EnhancedEvalMetrics;
 
+typedef enum {
+    COMPARE_EXACT = 0, // Byte-for-byte, ignoring trailing whitespace
+    COMPARE_TOKENS     // Whitespace-separated tokens, numbers within float_tolerance
+} CompareMode;
+
+typedef struct {
+    const char *expected;
+    size_t expected_len;          // Trailing whitespace excluded
+    size_t matched;               // Expected bytes accounted for so far
+    size_t offset;                // Output bytes consumed so far
+    // Token mode: the output token being read and the expected token it is checked against
+    char token[MAX_TOKEN_SIZE + 1];
+    size_t token_len;
+    size_t token_start;
+    size_t want_start;
+    size_t want_len;
+    int token_exact;              // Token still equals the expected token byte for byte
+    int mismatch;                 // A definitive difference has been seen
+    size_t mismatch_offset;       // Output byte offset of the first difference
+} StreamComparator;
+
+typedef struct {
+    char *data;                   // NUL-terminated prefix of what the child wrote
+    size_t capacity;              // Bytes that may be kept, excluding the NUL
+    size_t used;
+    size_t total;                 // Everything the child wrote, kept or not
+    int limit_exceeded;           // Child was killed for passing output_limit_bytes
+    StreamComparator *comparator; // Checks output as it streams in; NULL = capture only
+} OutputCapture;
+
+typedef struct {
+    int status;                   // 0 = ran to completion, -1 = timeout or execution error
+    ChildUsage usage;
+    OutputCapture output;
+    StreamComparator comparator;
+} TestResult;
+
+typedef struct {
+    int count;
+    int next;
+    void (*job)(int index, void *arg);
+    void *arg;
+    pthread_mutex_t lock;
+} WorkQueue;
+
+typedef struct {
+    const char *exe_path;
+    char **envp;                  // NULL = inherit the evaluator's environment
+    int limit_address_space;      // ASan reserves terabytes of shadow memory, so it runs without RLIMIT_AS
+    int cpu_limit_s;
+    int timeout_ms;
+    char *const *argv;            // NULL: { exe_path, NULL }
+    const char *stdin_path;       // NULL: input is fed through a pipe
+    const char *stderr_path;      // NULL: stderr joins the stdout pipe
+} ChildSpec;
+
+typedef enum {
+    MEMORY_BACKEND_SANITIZER = 0, // ASan + LSan + UBSan instrumented build
+    MEMORY_BACKEND_VALGRIND       // memcheck on the normal build
+} MemoryBackend;
+
+typedef struct {
+    long leaked_bytes;            // Direct leaks (valgrind: definitely lost)
+    long indirect_leaked_bytes;
+    int overflows;                // Buffer over/underflows, stack overflow
+    int use_after_free;           // Use-after-free/return/scope, double free
+    int undefined_behavior;       // UBSan runtime errors
+    int other_errors;             // SEGV, bad free and other sanitizer aborts
+} MemoryFindings;
+
+typedef struct {
+    int test_index;
+    int analyzed;                 // Whether the checker produced a usable report
+    MemoryFindings findings;
+} MemoryTestReport;
+
+typedef struct {
+    MemoryBackend backend;
+    MemoryTestReport *reports;    // One per sampled test, in suite order
+    int num_reports;
+    int tests_analyzed;
+    MemoryFindings totals;
+    char details[MAX_MEMORY_DETAILS][256];
+    int num_details;
+    pthread_mutex_t lock;
+} MemoryAnalysis;
+
+typedef struct {
+    uint32_t state[8];
+    uint64_t total_bytes;
+    unsigned char buffer[64];
+    size_t buffered;
+} Sha256;
+
+typedef struct {
+    int enabled;
+    char dir[512];
+    long long max_bytes;
+    int hits;
+    int misses;
+    int evictions;
+    int last_hit;                 // Whether the most recent compile came from the cache
+    char last_key[65];
+} CompileCache;
+
+typedef struct {
+    char key[65];
+    time_t mtime;
+    long long size;               // .bin + .log
+} CompileCacheEntry;
+
+typedef struct {
+    long n;
+    size_t input_bytes;
+    double cpu_ms;                // user + sys, fastest of COMPLEXITY_REPEATS runs
+    long max_rss_kb;
+} ComplexityPoint;
+
+typedef struct {
+    int enabled;
+    ComplexityPoint points[COMPLEXITY_MAX_POINTS];
+    int num_points;
+    char stopped_reason[96];
+    const char *time_class;       // e.g. "O(n log n)"; "unknown" with too few points
+    double time_r2;
+    double time_loglog_slope;     // Growth exponent of CPU time above the smallest run
+    const char *space_class;
+    double space_r2;
+} ComplexityEstimate;
+
+typedef struct {
+    const char *name;
+    double (*f)(double n);
+} GrowthModel;
+
+typedef struct ForkServer {
+    pid_t pid;
+    int sock;                 // Our end of the SOCK_SEQPACKET control socket
+    int broken;               // Protocol failed; restarted before the next test
+    struct ForkServer *next;  // All servers, for shutdown
+} ForkServer;
+
+typedef struct {
+    int status;               // Wait status and rusage of one pre-initialised copy
+    struct rusage usage;
+} ForkServerResult;
+
 // --- Global State ---
 char executable_path[256];
 char temp_dir_path[256];
+char temp_root_path[256]; // Removed at exit; batch mode gives each submission a temp_dir_path inside it
+char results_json_path[512] = RESULTS_JSON_PATH;
+int parallel_jobs = 0; // 0 = one job per online core
+MemoryBackend memory_backend = MEMORY_BACKEND_SANITIZER;
+char sanitizer_exe_path[512];
+pthread_t memory_thread;
+int memory_thread_started = 0;
+int memory_jobs = 0;   // 0 = half of parallel_jobs
+int memory_sample = 0; // 0 = every test
+MemoryAnalysis memory_analysis = { .lock = PTHREAD_MUTEX_INITIALIZER };
+size_t output_capture_bytes = MAX_OUTPUT_SIZE;
+size_t output_limit_bytes = OUTPUT_LIMIT_BYTES;
+CompareMode compare_mode = COMPARE_EXACT;
+double float_tolerance = 0.0; // Relative to max(1, |expected|) in token mode
 TestSuite test_suite;
+CompileCache compile_cache;
+ComplexityEstimate complexity = { .enabled = 0, .time_class = "unknown", .space_class = "unknown" };
+int fork_server_enabled = 0;
+int fork_server_disabled = 0; // Set once a server fails to start; tests fall back to fork+exec
+char fork_server_stub_path[512];
+ForkServer *fork_servers = NULL;
+pthread_mutex_t fork_servers_lock = PTHREAD_MUTEX_INITIALIZER;
+__thread ForkServer *thread_fork_server = NULL; // One server per correctness worker
 
 // --- Function Prototypes ---
 void cleanup(void);
+void print_usage(const char *program);
+void remove_tree(const char *path);
+int remove_tree_entry(const char *path, const struct stat *st, int type, struct FTW *ftw);
+int run_command(char *const argv[], const char *stderr_path);
+int evaluate_submission(const char *source_path, EnhancedEvalMetrics *metrics);
+void reset_submission_state(void);
+int run_batch(const char *manifest, const char *output_dir, const char *records_path);
+int load_batch_manifest(const char *manifest, char ***sources);
+void batch_submission_name(char *const *sources, int index, char *name, size_t size);
+void write_batch_record(FILE *f, const char *name, const char *source, int compiled,
+                        const EnhancedEvalMetrics *metrics);
 void handle_signal(int sig);
 long current_time_ms(void);
-void set_child_resource_limits(void);
+double monotonic_ms(void);
+void set_child_resource_limits(int limit_address_space, int cpu_limit_s);
 int compile_source(const char *source_filename);
-int run_test_process(const char *input, char *output_buffer, size_t buffer_size);
+int compile_with_cache(const char *source_filename, const char *flags, const char *exe_path,
+                       const char *log_path, int *cache_hit, char key[65]);
+void compile_cache_init(void);
+int compile_cache_key(const char *source_filename, const char *flags, char key[65]);
+void compile_cache_entry_path(const char *key, const char *suffix, char *path, size_t size);
+int compile_cache_lookup(const char *key, const char *exe_path, const char *log_path);
+void compile_cache_store(const char *key, const char *exe_path, const char *log_path);
+void compile_cache_evict(void);
+void sha256_init(Sha256 *ctx);
+void sha256_update(Sha256 *ctx, const void *data, size_t len);
+void sha256_final_hex(Sha256 *ctx, char hex[65]);
+int sha256_command_output(Sha256 *ctx, char *const argv[]);
+int sha256_file(Sha256 *ctx, const char *path);
+int make_dirs(const char *path);
+int copy_file(const char *src, const char *dst, mode_t mode);
+void print_file(const char *path, FILE *out);
+void fprint_json_string(FILE *f, const char *str);
+const char *memory_backend_name(MemoryBackend backend);
+int run_test_process(const ByteString *input, OutputCapture *capture, ChildUsage *usage);
+int run_child_process(const ChildSpec *spec, const ByteString *input, OutputCapture *capture, ChildUsage *usage);
+int supervise_child(pid_t pid, int in_fd, const ByteString *input, int out_fd, OutputCapture *capture,
+                    ForkServer *server, int timeout_ms, int *status, struct rusage *rusage, double *exit_time_ms);
+void fill_child_usage(ChildUsage *usage, int status, const struct rusage *rusage, double wall_time_ms);
+int build_fork_server_stub(void);
+ForkServer *fork_server_start(void);
+ForkServer *fork_server_for_thread(void);
+void fork_servers_shutdown(void);
+int run_fork_server_process(const ByteString *input, OutputCapture *capture, ChildUsage *usage);
+int send_fds(int sock, int in_fd, int out_fd);
+int reap_child(pid_t pid, ForkServer *server, int *status, struct rusage *rusage, int blocking);
+void summarize_test_usage(EnhancedEvalMetrics *metrics);
+ResourceSummary summarize_values(double *values, int count);
+int compare_doubles(const void *a, const void *b);
+void fprint_resource_summary(FILE *f, const char *name, const ResourceSummary *summary, int last);
+ssize_t drain_output(int fd, OutputCapture *capture);
+int feed_input(int fd, const ByteString *input, size_t *sent);
+int pidfd_open_compat(pid_t pid);
+int wait_for_exit(pid_t pid, int timeout_ms, int *status);
 int load_test_cases_from_json(const char *json_file);
+int load_byte_string(json_object *parent, const char *key, ByteString *out);
+int load_test_field(json_object *parent, const char *key, const char *file_key,
+                    const char *base_dir, ByteString *out);
+int map_file(const char *path, ByteString *out);
+void free_byte_string(ByteString *str);
+void free_test_suite(void);
+int preview_len(size_t len);
 float calculate_dynamic_passrate(EnhancedEvalMetrics *metrics);
+void *work_queue_worker(void *arg);
+void run_parallel(int count, int workers, void (*job)(int index, void *arg), void *arg);
+void run_correctness_test(int i, void *arg);
+void run_tests_parallel(TestResult *results);
+void start_memory_analysis(const char *source_filename);
+void *memory_analysis_worker(void *arg);
+void run_memory_test(int k, void *arg);
 float analyze_memory(void);
+void add_memory_findings(MemoryFindings *into, const MemoryFindings *from);
+int run_sanitizer_test(int i, MemoryFindings *findings);
+int run_valgrind_test(int i, MemoryFindings *findings);
+char **build_sanitizer_env(void);
+int parse_sanitizer_log(const char *path, int test_index, MemoryFindings *findings);
+int parse_valgrind_log(const char *path, int test_index, MemoryFindings *findings);
+long valgrind_byte_count(const char *text);
+void record_memory_detail(int test_index, const char *kind, const char *detail);
+float leak_score(long leaked_bytes);
+float score_memory_findings(const MemoryFindings *findings);
 float check_robustness(void);
+void estimate_complexity(void);
+long build_scaling_input(const ScalingSpec *spec, long n, const char *path);
+void write_template(FILE *f, const char *tmpl, long n, long i, uint32_t *rng);
+const char *fit_growth_model(const double *n, const double *y, int count, double min_growth, double *r2);
+double loglog_slope(const double *n, const double *y, int count);
+double growth_constant(double n);
+double growth_log(double n);
+double growth_linear(double n);
+double growth_n_log_n(double n);
+double growth_quadratic(double n);
+double growth_cubic(double n);
 void write_enhanced_results_to_json(const EnhancedEvalMetrics *metrics);
 void trim_trailing_whitespace(char *str);
+void comparator_init(StreamComparator *cmp, const ByteString *expected);
+int comparator_feed(StreamComparator *cmp, const char *data, size_t len);
+int comparator_finish(StreamComparator *cmp);
+void comparator_end_token(StreamComparator *cmp);
+int tokens_equal(const char *got, size_t got_len, const char *want, size_t want_len);
 void print_test_suite_info(void);
 
 // --- JSON Loading Functions ---
@@ -140,27 +481,39 @@ int load_test_cases_from_json(const char *json_file) {
         return -1;
     }
 
+    // input_file / expected_output_file paths are relative to the test JSON
+    char base_dir[512];
+    snprintf(base_dir, sizeof(base_dir), "%s", json_file);
+    char *slash = strrchr(base_dir, '/');
+    if (slash) *slash = '\0';
+    else snprintf(base_dir, sizeof(base_dir), ".");
+
     int array_len = json_object_array_length(tests_obj);
-    test_suite.num_tests = (array_len > MAX_TESTS) ? MAX_TESTS : array_len;
+    test_suite.tests = calloc(array_len > 0 ? array_len : 1, sizeof(DynamicTestCase));
+    if (!test_suite.tests) {
+        perror("calloc for test cases failed");
+        json_object_put(root);
+        free(json_string);
+        return -1;
+    }
+    test_suite.num_tests = array_len;
 
     for (int i = 0; i < test_suite.num_tests; i++) {
         json_object *test_obj = json_object_array_get_idx(tests_obj, i);
-        json_object *input_obj, *output_obj, *desc_obj_tc, *cat_obj, *weight_obj;
-
-        if (json_object_object_get_ex(test_obj, "input", &input_obj)) {
-            strncpy(test_suite.tests[i].input, json_object_get_string(input_obj), 
-                    sizeof(test_suite.tests[i].input) - 1);
-        }
-
-        if (json_object_object_get_ex(test_obj, "expected_output", &output_obj)) {
-            strncpy(test_suite.tests[i].expected_output, json_object_get_string(output_obj), 
-                    sizeof(test_suite.tests[i].expected_output) - 1);
-        }
-
-        if (json_object_object_get_ex(test_obj, "description", &desc_obj_tc)) {
-            strncpy(test_suite.tests[i].description, json_object_get_string(desc_obj_tc), 
-                    sizeof(test_suite.tests[i].description) - 1);
+        json_object *cat_obj, *weight_obj;
+        ByteString description;
+
+        if (load_test_field(test_obj, "input", "input_file", base_dir, &test_suite.tests[i].input) != 0 ||
+            load_test_field(test_obj, "expected_output", "expected_output_file", base_dir,
+                            &test_suite.tests[i].expected_output) != 0 ||
+            load_byte_string(test_obj, "description", &description) != 0) {
+            fprintf(stderr, "❌ Failed to load test case %d\n", i + 1);
+            test_suite.num_tests = i + 1; // Let free_test_suite release what was loaded
+            json_object_put(root);
+            free(json_string);
+            return -1;
         }
+        test_suite.tests[i].description = description.data;
 
         if (json_object_object_get_ex(test_obj, "category", &cat_obj)) {
             strncpy(test_suite.tests[i].category, json_object_get_string(cat_obj), 
@@ -174,16 +527,38 @@ int load_test_cases_from_json(const char *json_file) {
         }
     }
 
+    // Input model for complexity estimation; defaults to "n, then n numbers"
+    ScalingSpec *scaling = &test_suite.scaling;
+    snprintf(scaling->header, sizeof(scaling->header), "{n}\n");
+    snprintf(scaling->item, sizeof(scaling->item), "{r} ");
+    snprintf(scaling->footer, sizeof(scaling->footer), "\n");
+    scaling->min_n = COMPLEXITY_MIN_N;
+    scaling->max_n = COMPLEXITY_MAX_N;
+    json_object *scaling_obj, *field_obj;
+    if (json_object_object_get_ex(root, "scaling_input", &scaling_obj)) {
+        if (json_object_object_get_ex(scaling_obj, "header", &field_obj))
+            snprintf(scaling->header, sizeof(scaling->header), "%s", json_object_get_string(field_obj));
+        if (json_object_object_get_ex(scaling_obj, "item", &field_obj))
+            snprintf(scaling->item, sizeof(scaling->item), "%s", json_object_get_string(field_obj));
+        if (json_object_object_get_ex(scaling_obj, "footer", &field_obj))
+            snprintf(scaling->footer, sizeof(scaling->footer), "%s", json_object_get_string(field_obj));
+        if (json_object_object_get_ex(scaling_obj, "min_n", &field_obj) && json_object_get_int64(field_obj) > 0)
+            scaling->min_n = json_object_get_int64(field_obj);
+        if (json_object_object_get_ex(scaling_obj, "max_n", &field_obj) && json_object_get_int64(field_obj) > 0)
+            scaling->max_n = json_object_get_int64(field_obj);
+    }
+
     // Extract potential edge cases
     json_object *edge_cases_obj;
     if (json_object_object_get_ex(root, "potential_edge_cases", &edge_cases_obj)) {
         int edge_array_len = json_object_array_length(edge_cases_obj);
-        test_suite.num_edge_cases = (edge_array_len > MAX_TESTS) ? MAX_TESTS : edge_array_len;
+        test_suite.potential_edge_cases = calloc(edge_array_len > 0 ? edge_array_len : 1, sizeof(char *));
         
-        for (int i = 0; i < test_suite.num_edge_cases; i++) {
-            json_object *edge_obj = json_object_array_get_idx(edge_cases_obj, i);
-            strncpy(test_suite.potential_edge_cases[i], json_object_get_string(edge_obj), 
-                    sizeof(test_suite.potential_edge_cases[i]) - 1);
+        for (int i = 0; test_suite.potential_edge_cases && i < edge_array_len; i++) {
+            const char *edge = json_object_get_string(json_object_array_get_idx(edge_cases_obj, i));
+            test_suite.potential_edge_cases[i] = strdup(edge ? edge : "");
+            if (!test_suite.potential_edge_cases[i]) break;
+            test_suite.num_edge_cases = i + 1;
         }
     }
 
@@ -192,6 +567,212 @@ int load_test_cases_from_json(const char *json_file) {
     return 0;
 }
 
+/**
+ * @brief Copies parent[key] (or "" if absent) into a heap ByteString sized to the data.
+ * @return 0 on success, -1 if allocation failed.
+ */
+int load_byte_string(json_object *parent, const char *key, ByteString *out) {
+    json_object *obj;
+    const char *src = "";
+    size_t len = 0;
+
+    if (json_object_object_get_ex(parent, key, &obj) && json_object_get_string(obj)) {
+        src = json_object_get_string(obj);
+        // Strings carry their own length (and may embed NULs); other types use their text form
+        len = json_object_is_type(obj, json_type_string) ? (size_t)json_object_get_string_len(obj) : strlen(src);
+    }
+
+    out->mapped = 0;
+    out->data = malloc(len + 1);
+    if (!out->data) {
+        out->len = 0;
+        return -1;
+    }
+    memcpy(out->data, src, len);
+    out->data[len] = '\0';
+    out->len = len;
+    return 0;
+}
+
+/**
+ * @brief Loads parent[key], or maps the file named by parent[file_key] when that is given.
+ * Large stress inputs live in files so they are neither embedded in JSON nor copied.
+ */
+int load_test_field(json_object *parent, const char *key, const char *file_key,
+                    const char *base_dir, ByteString *out) {
+    json_object *file_obj;
+    if (!json_object_object_get_ex(parent, file_key, &file_obj) || !json_object_get_string(file_obj)) {
+        return load_byte_string(parent, key, out);
+    }
+
+    const char *file = json_object_get_string(file_obj);
+    char path[1024];
+    if (file[0] == '/') {
+        snprintf(path, sizeof(path), "%s", file);
+    } else {
+        snprintf(path, sizeof(path), "%s/%s", base_dir, file);
+    }
+    return map_file(path, out);
+}
+
+/**
+ * @brief Maps a test data file read-only; the mapping is written to children directly.
+ * @return 0 on success, -1 on error.
+ */
+int map_file(const char *path, ByteString *out) {
+    out->data = NULL;
+    out->len = 0;
+    out->mapped = 0;
+
+    int fd = open(path, O_RDONLY | O_CLOEXEC);
+    if (fd < 0) {
+        fprintf(stderr, "❌ Cannot open test data file: %s\n", path);
+        return -1;
+    }
+    struct stat st;
+    if (fstat(fd, &st) != 0) {
+        perror("fstat (test data file)");
+        close(fd);
+        return -1;
+    }
+
+    if (st.st_size == 0) { // mmap rejects empty files
+        close(fd);
+        out->data = calloc(1, 1);
+        return out->data ? 0 : -1;
+    }
+
+    void *map = mmap(NULL, (size_t)st.st_size, PROT_READ, MAP_PRIVATE, fd, 0);
+    close(fd);
+    if (map == MAP_FAILED) {
+        perror("mmap (test data file)");
+        return -1;
+    }
+    madvise(map, (size_t)st.st_size, MADV_SEQUENTIAL);
+    out->data = map;
+    out->len = (size_t)st.st_size;
+    out->mapped = 1;
+    return 0;
+}
+
+/**
+ * @brief Releases a ByteString whether it was copied or mapped.
+ */
+void free_byte_string(ByteString *str) {
+    if (str->mapped) {
+        munmap(str->data, str->len);
+    } else {
+        free(str->data);
+    }
+    str->data = NULL;
+    str->len = 0;
+    str->mapped = 0;
+}
+
+/**
+ * @brief Releases everything load_test_cases_from_json allocated.
+ */
+void free_test_suite(void) {
+    for (int i = 0; test_suite.tests && i < test_suite.num_tests; i++) {
+        free_byte_string(&test_suite.tests[i].input);
+        free_byte_string(&test_suite.tests[i].expected_output);
+        free(test_suite.tests[i].description);
+    }
+    free(test_suite.tests);
+    for (int i = 0; i < test_suite.num_edge_cases; i++) {
+        free(test_suite.potential_edge_cases[i]);
+    }
+    free(test_suite.potential_edge_cases);
+    test_suite.tests = NULL;
+    test_suite.potential_edge_cases = NULL;
+    test_suite.num_tests = 0;
+    test_suite.num_edge_cases = 0;
+}
+
+/**
+ * @brief Number of bytes of a len-byte string to echo in console output.
+ */
+int preview_len(size_t len) {
+    return (int)(len < PREVIEW_SIZE ? len : PREVIEW_SIZE);
+}
+
+/**
+ * @brief Worker thread: claims the next unclaimed index until the queue is exhausted
+ */
+void *work_queue_worker(void *arg) {
+    WorkQueue *queue = (WorkQueue *)arg;
+
+    for (;;) {
+        pthread_mutex_lock(&queue->lock);
+        int i = queue->next++;
+        pthread_mutex_unlock(&queue->lock);
+        if (i >= queue->count) break;
+
+        queue->job(i, queue->arg);
+    }
+    return NULL;
+}
+
+/**
+ * @brief Calls job(i, arg) for every i in [0, count) on up to workers threads.
+ */
+void run_parallel(int count, int workers, void (*job)(int index, void *arg), void *arg) {
+    WorkQueue queue = { .count = count, .next = 0, .job = job, .arg = arg };
+    pthread_mutex_init(&queue.lock, NULL);
+
+    int jobs = workers;
+    if (jobs > count) jobs = count;
+
+    // The calling thread is the last of the `jobs` workers, so only jobs - 1 threads are created
+    pthread_t *threads = (jobs > 1) ? malloc(sizeof(pthread_t) * (jobs - 1)) : NULL;
+    int started = 0;
+    if (threads) {
+        for (; started < jobs - 1; started++) {
+            if (pthread_create(&threads[started], NULL, work_queue_worker, &queue) != 0) {
+                perror("pthread_create failed");
+                break;
+            }
+        }
+    }
+
+    // The calling thread always helps, and finishes the queue alone if no threads started
+    work_queue_worker(&queue);
+
+    for (int t = 0; t < started; t++) {
+        pthread_join(threads[t], NULL);
+    }
+    free(threads);
+    pthread_mutex_destroy(&queue.lock);
+}
+
+/**
+ * @brief Runs test i against the normal build and stores the outcome in results[i].
+ */
+void run_correctness_test(int i, void *arg) {
+    TestResult *result = &((TestResult *)arg)[i];
+    OutputCapture *capture = &result->output;
+    capture->data = malloc(capture->capacity + 1);
+    if (!capture->data) {
+        perror("malloc for test output failed");
+        result->status = -1;
+        return;
+    }
+    result->status = run_test_process(&test_suite.tests[i].input, capture, &result->usage);
+
+    // Keep only what was captured so thousands of finished results stay small
+    char *shrunk = realloc(capture->data, capture->used + 1);
+    if (shrunk) capture->data = shrunk;
+}
+
+/**
+ * @brief Runs every test with up to parallel_jobs sandboxed children at once.
+ * Results land in results[i] for test i, so reporting order is unaffected.
+ */
+void run_tests_parallel(TestResult *results) {
+    run_parallel(test_suite.num_tests, parallel_jobs, run_correctness_test, results);
+    if (fork_server_enabled) fork_servers_shutdown();
+}
+
 /**
  * @brief Enhanced passrate calculation with weighted scoring
  */
@@ -203,41 +784,81 @@ float calculate_dynamic_passrate(EnhancedEvalMetrics *metrics) {
     float total_weight = 0.0f;
     float passed_weight = 0.0f;
     
-    printf("    Running %d LLM-generated test cases:\n", test_suite.num_tests);
+    printf("    Running %d LLM-generated test cases (%d parallel jobs):\n",
+           test_suite.num_tests, parallel_jobs);
+
+    TestResult *results = calloc(test_suite.num_tests > 0 ? test_suite.num_tests : 1, sizeof(TestResult));
+    if (!results) {
+        perror("calloc for test results failed");
+        return 0.0f;
+    }
+    metrics->test_outcomes = calloc(test_suite.num_tests > 0 ? test_suite.num_tests : 1, sizeof(TestOutcome));
+    if (metrics->test_outcomes) metrics->num_test_outcomes = test_suite.num_tests;
+    for (int i = 0; i < test_suite.num_tests; i++) {
+        // Capture buffers are allocated by the worker that runs the test
+        results[i].output.capacity = output_capture_bytes;
+        results[i].output.comparator = &results[i].comparator;
+        comparator_init(&results[i].comparator, &test_suite.tests[i].expected_output);
+    }
+    run_tests_parallel(results);
     
+    // Score in test order so output and weighted scoring stay deterministic
     for (int i = 0; i < test_suite.num_tests; i++) {
-        char output_buf[MAX_OUTPUT_SIZE] = {0};
+        OutputCapture *capture = &results[i].output;
+        StreamComparator *cmp = &results[i].comparator;
+        char *output_buf = capture->data;
         total_weight += test_suite.tests[i].weight;
+        metrics->output_bytes_discarded += (long)(capture->total - capture->used);
         
         printf("    Test %d [%s]: %s\n", i + 1, test_suite.tests[i].category, 
                test_suite.tests[i].description);
         
-        if (run_test_process(test_suite.tests[i].input, output_buf, sizeof(output_buf)) == 0) {
+        if (capture->limit_exceeded) {
+            printf("      ❌ FAIL - Output limit exceeded (%zu bytes, limit %zu) (%.2f ms)\n",
+                   capture->total, output_limit_bytes, results[i].usage.wall_time_ms);
+            metrics->tests_failed++;
+            metrics->output_limit_kills++;
+            
+            if (metrics->num_failed_details < MAX_FAILED_DETAILS) {
+                snprintf(metrics->failed_tests[metrics->num_failed_details], 512,
+                         "Test %d (%s): Output limit exceeded (%zu bytes)", 
+                         i + 1, test_suite.tests[i].description, capture->total);
+                metrics->num_failed_details++;
+            }
+        } else if (cmp->mismatch || (results[i].status == 0 && !comparator_finish(cmp))) {
+            // A mid-run mismatch killed the child; an end-of-output one means it printed too little
+            const ByteString *expected = &test_suite.tests[i].expected_output;
             trim_trailing_whitespace(output_buf);
+            printf("      ❌ FAIL - Expected: '%.*s', Got: '%.*s' (%.2f ms)\n", 
+                   preview_len(expected->len), expected->data,
+                   preview_len(strlen(output_buf)), output_buf, results[i].usage.wall_time_ms);
+            printf("      🔎 First difference at output byte %zu%s\n", cmp->mismatch_offset,
+                   results[i].status == 0 ? "" : " (child stopped at first difference)");
+            if (capture->total > capture->used) {
+                printf("      ✂️  Output truncated: %zu of %zu bytes discarded\n",
+                       capture->total - capture->used, capture->total);
+            }
+            metrics->tests_failed++;
             
-            if (strcmp(output_buf, test_suite.tests[i].expected_output) == 0) {
-                printf("      ✅ PASS\n");
-                metrics->tests_passed++;
-                passed_weight += test_suite.tests[i].weight;
-            } else {
-                printf("      ❌ FAIL - Expected: '%s', Got: '%s'\n", 
-                       test_suite.tests[i].expected_output, output_buf);
-                metrics->tests_failed++;
-                
-                // Record failure details
-                if (metrics->num_failed_details < MAX_TESTS) {
-                    snprintf(metrics->failed_tests[metrics->num_failed_details], 512,
-                             "Test %d (%s): Expected '%s', Got '%s'", 
-                             i + 1, test_suite.tests[i].description,
-                             test_suite.tests[i].expected_output, output_buf);
-                    metrics->num_failed_details++;
-                }
+            // Record failure details
+            if (metrics->num_failed_details < MAX_FAILED_DETAILS) {
+                snprintf(metrics->failed_tests[metrics->num_failed_details], 512,
+                         "Test %d (%s): Expected '%.*s', Got '%.*s' (first difference at byte %zu)", 
+                         i + 1, test_suite.tests[i].description,
+                         preview_len(expected->len), expected->data,
+                         preview_len(strlen(output_buf)), output_buf, cmp->mismatch_offset);
+                metrics->num_failed_details++;
             }
+        } else if (results[i].status == 0) {
+            printf("      ✅ PASS (%.2f ms)\n", results[i].usage.wall_time_ms);
+            metrics->tests_passed++;
+            passed_weight += test_suite.tests[i].weight;
+            if (metrics->test_outcomes) metrics->test_outcomes[i].passed = 1;
         } else {
-            printf("      ❌ FAIL - Timeout or execution error\n");
+            printf("      ❌ FAIL - Timeout or execution error (%.2f ms)\n", results[i].usage.wall_time_ms);
             metrics->tests_failed++;
             
-            if (metrics->num_failed_details < MAX_TESTS) {
+            if (metrics->num_failed_details < MAX_FAILED_DETAILS) {
                 snprintf(metrics->failed_tests[metrics->num_failed_details], 512,
                          "Test %d (%s): Execution timeout or error", 
                          i + 1, test_suite.tests[i].description);
@@ -246,6 +867,13 @@ float calculate_dynamic_passrate(EnhancedEvalMetrics *metrics) {
         }
     }
     
+    for (int i = 0; i < test_suite.num_tests; i++) {
+        if (metrics->test_outcomes) metrics->test_outcomes[i].usage = results[i].usage;
+        free(results[i].output.data);
+    }
+    free(results);
+    summarize_test_usage(metrics);
+
     // Calculate both simple and weighted scores
     float simple_passrate = (test_suite.num_tests > 0) ? (float)metrics->tests_passed / test_suite.num_tests * 100.0f : 0.0f;
     metrics->weighted_score = (total_weight > 0) ? (passed_weight / total_weight * 100.0f) : 0.0f;
@@ -253,6 +881,43 @@ float calculate_dynamic_passrate(EnhancedEvalMetrics *metrics) {
     return simple_passrate;
 }
 
+/**
+ * @brief Fills the min/median/max resource summaries from the per-test outcomes.
+ */
+void summarize_test_usage(EnhancedEvalMetrics *metrics) {
+    int n = metrics->num_test_outcomes;
+    double *values = malloc(sizeof(double) * (n > 0 ? n : 1));
+    if (!values) return;
+
+    for (int i = 0; i < n; i++) values[i] = metrics->test_outcomes[i].usage.wall_time_ms;
+    metrics->wall_time_summary = summarize_values(values, n);
+    for (int i = 0; i < n; i++) values[i] = metrics->test_outcomes[i].usage.user_cpu_ms;
+    metrics->user_cpu_summary = summarize_values(values, n);
+    for (int i = 0; i < n; i++) values[i] = metrics->test_outcomes[i].usage.sys_cpu_ms;
+    metrics->sys_cpu_summary = summarize_values(values, n);
+    for (int i = 0; i < n; i++) values[i] = (double)metrics->test_outcomes[i].usage.max_rss_kb;
+    metrics->max_rss_summary = summarize_values(values, n);
+    free(values);
+}
+
+/**
+ * @brief Min, median and max of values (sorted in place).
+ */
+ResourceSummary summarize_values(double *values, int count) {
+    ResourceSummary summary = {0};
+    if (count <= 0) return summary;
+    qsort(values, count, sizeof(double), compare_doubles);
+    summary.min = values[0];
+    summary.max = values[count - 1];
+    summary.median = (count % 2) ? values[count / 2] : (values[count / 2 - 1] + values[count / 2]) / 2.0;
+    return summary;
+}
+
+int compare_doubles(const void *a, const void *b) {
+    double x = *(const double *)a, y = *(const double *)b;
+    return (x > y) - (x < y);
+}
+
 /**
  * @brief Prints information about the loaded test suite
  */
@@ -276,16 +941,24 @@ void print_test_suite_info(void) {
  * @brief Enhanced results output with detailed failure information
  */
 void write_enhanced_results_to_json(const EnhancedEvalMetrics *metrics) {
-    FILE *f = fopen(RESULTS_JSON_PATH, "w");
+    // Write-then-rename: a reader (or a concurrent run on the same path) never sees a partial file
+    char tmp_path[600];
+    snprintf(tmp_path, sizeof(tmp_path), "%s.tmp.%d", results_json_path, (int)getpid());
+    FILE *f = fopen(tmp_path, "w");
     if (!f) {
         perror("fopen (results.json)");
         return;
     }
     
+    // The test-suite strings come from the LLM and may hold quotes or newlines
     fprintf(f, "{\n");
-    fprintf(f, "  \"program_description\": \"%s\",\n", test_suite.program_description);
-    fprintf(f, "  \"program_type\": \"%s\",\n", test_suite.program_type);
-    fprintf(f, "  \"difficulty_level\": \"%s\",\n", test_suite.difficulty_level);
+    fprintf(f, "  \"program_description\": ");
+    fprint_json_string(f, test_suite.program_description);
+    fprintf(f, ",\n  \"program_type\": ");
+    fprint_json_string(f, test_suite.program_type);
+    fprintf(f, ",\n  \"difficulty_level\": ");
+    fprint_json_string(f, test_suite.difficulty_level);
+    fprintf(f, ",\n");
     fprintf(f, "  \"passrate\": %.1f,\n", metrics->passrate);
     fprintf(f, "  \"weighted_score\": %.1f,\n", metrics->weighted_score);
     fprintf(f, "  \"memory_score\": %.1f,\n", metrics->memory_score);
@@ -294,11 +967,78 @@ void write_enhanced_results_to_json(const EnhancedEvalMetrics *metrics) {
     fprintf(f, "  \"tests_failed\": %d,\n", metrics->tests_failed);
     fprintf(f, "  \"total_tests\": %d,\n", test_suite.num_tests);
     fprintf(f, "  \"execution_time_ms\": %ld,\n", metrics->execution_time_ms);
+    fprintf(f, "  \"output_limit_kills\": %d,\n", metrics->output_limit_kills);
+    fprintf(f, "  \"output_bytes_discarded\": %ld,\n", metrics->output_bytes_discarded);
+    fprintf(f, "  \"memory_analysis\": {\"backend\": \"%s\", \"tests_sampled\": %d, \"tests_analyzed\": %d, "
+               "\"leaked_bytes\": %ld, \"indirect_leaked_bytes\": %ld, \"overflows\": %d, "
+               "\"use_after_free\": %d, \"undefined_behavior\": %d, \"other_errors\": %d, \"findings\": [",
+            memory_backend_name(memory_analysis.backend), memory_analysis.num_reports, memory_analysis.tests_analyzed,
+            memory_analysis.totals.leaked_bytes, memory_analysis.totals.indirect_leaked_bytes,
+            memory_analysis.totals.overflows, memory_analysis.totals.use_after_free,
+            memory_analysis.totals.undefined_behavior, memory_analysis.totals.other_errors);
+    for (int i = 0; i < memory_analysis.num_details; i++) {
+        if (i > 0) fprintf(f, ", ");
+        fprint_json_string(f, memory_analysis.details[i]);
+    }
+    fprintf(f, "],\n    \"per_test\": [");
+    for (int k = 0; k < memory_analysis.num_reports; k++) {
+        const MemoryTestReport *report = &memory_analysis.reports[k];
+        fprintf(f, "%s\n      {\"test\": %d, \"analyzed\": %s, \"leaked_bytes\": %ld, \"indirect_leaked_bytes\": %ld, "
+                   "\"overflows\": %d, \"use_after_free\": %d, \"undefined_behavior\": %d, \"other_errors\": %d}",
+                k > 0 ? "," : "", report->test_index + 1, report->analyzed ? "true" : "false",
+                report->findings.leaked_bytes, report->findings.indirect_leaked_bytes,
+                report->findings.overflows, report->findings.use_after_free,
+                report->findings.undefined_behavior, report->findings.other_errors);
+    }
+    fprintf(f, "]},\n");
+    fprintf(f, "  \"resource_summary\": {\n");
+    fprint_resource_summary(f, "wall_time_ms", &metrics->wall_time_summary, 0);
+    fprint_resource_summary(f, "user_cpu_ms", &metrics->user_cpu_summary, 0);
+    fprint_resource_summary(f, "sys_cpu_ms", &metrics->sys_cpu_summary, 0);
+    fprint_resource_summary(f, "max_rss_kb", &metrics->max_rss_summary, 1);
+    fprintf(f, "  },\n");
+    fprintf(f, "  \"test_results\": [");
+    for (int i = 0; i < metrics->num_test_outcomes; i++) {
+        const TestOutcome *outcome = &metrics->test_outcomes[i];
+        fprintf(f, "%s\n    {\"test\": %d, \"passed\": %s, \"wall_time_ms\": %.3f, \"user_cpu_ms\": %.3f, "
+                   "\"sys_cpu_ms\": %.3f, \"max_rss_kb\": %ld, \"exit_code\": %d, \"signal\": %d}",
+                i > 0 ? "," : "", i + 1, outcome->passed ? "true" : "false",
+                outcome->usage.wall_time_ms, outcome->usage.user_cpu_ms, outcome->usage.sys_cpu_ms,
+                outcome->usage.max_rss_kb, outcome->usage.exit_code, outcome->usage.signal);
+    }
+    fprintf(f, "%s],\n", metrics->num_test_outcomes > 0 ? "\n  " : "");
+    fprintf(f, "  \"empirical_complexity\": {\"enabled\": %s", complexity.enabled ? "true" : "false");
+    if (complexity.enabled) {
+        fprintf(f, ", \"input_model\": {\"header\": ");
+        fprint_json_string(f, test_suite.scaling.header);
+        fprintf(f, ", \"item\": ");
+        fprint_json_string(f, test_suite.scaling.item);
+        fprintf(f, ", \"footer\": ");
+        fprint_json_string(f, test_suite.scaling.footer);
+        fprintf(f, "},\n    \"time_complexity\": \"%s\", \"time_fit_r2\": %.4f, \"time_loglog_slope\": %.3f, "
+                   "\"space_complexity\": \"%s\", \"space_fit_r2\": %.4f, \"stopped_reason\": ",
+                complexity.time_class, complexity.time_r2, complexity.time_loglog_slope,
+                complexity.space_class, complexity.space_r2);
+        fprint_json_string(f, complexity.stopped_reason);
+        fprintf(f, ",\n    \"points\": [");
+        for (int i = 0; i < complexity.num_points; i++) {
+            const ComplexityPoint *point = &complexity.points[i];
+            fprintf(f, "%s{\"n\": %ld, \"input_bytes\": %zu, \"cpu_ms\": %.3f, \"max_rss_kb\": %ld}",
+                    i > 0 ? ", " : "", point->n, point->input_bytes, point->cpu_ms, point->max_rss_kb);
+        }
+        fprintf(f, "]");
+    }
+    fprintf(f, "},\n");
+    fprintf(f, "  \"compile_cache\": {\"enabled\": %s, \"hit\": %s, \"key\": \"%s\", "
+               "\"hits\": %d, \"misses\": %d, \"evictions\": %d},\n",
+            compile_cache.enabled ? "true" : "false", compile_cache.last_hit ? "true" : "false",
+            compile_cache.last_key, compile_cache.hits, compile_cache.misses, compile_cache.evictions);
     
     // Include failed test details
     fprintf(f, "  \"failed_test_details\": [\n");
     for (int i = 0; i < metrics->num_failed_details; i++) {
-        fprintf(f, "    \"%s\"", metrics->failed_tests[i]);
+        fprintf(f, "    ");
+        fprint_json_string(f, metrics->failed_tests[i]);
         if (i < metrics->num_failed_details - 1) fprintf(f, ",");
         fprintf(f, "\n");
     }
@@ -307,257 +1047,1748 @@ void write_enhanced_results_to_json(const EnhancedEvalMetrics *metrics) {
     // Include potential edge cases for further analysis
     fprintf(f, "  \"potential_edge_cases\": [\n");
     for (int i = 0; i < test_suite.num_edge_cases; i++) {
-        fprintf(f, "    \"%s\"", test_suite.potential_edge_cases[i]);
+        fprintf(f, "    ");
+        fprint_json_string(f, test_suite.potential_edge_cases[i]);
         if (i < test_suite.num_edge_cases - 1) fprintf(f, ",");
         fprintf(f, "\n");
     }
     fprintf(f, "  ]\n");
     fprintf(f, "}\n");
-    fclose(f);
+    if (fclose(f) != 0 || rename(tmp_path, results_json_path) != 0) {
+        perror("writing results.json failed");
+        remove(tmp_path);
+    }
 }
 
-// --- Main Logic (Modified) ---
+// --- Streaming Output Comparison ---
 
-int main(int argc, char **argv) {
-    if (argc < 3) {
-        fprintf(stderr, "Usage: %s <source.c> <test_cases.json>\n", argv[0]);
-        return 1;
+/**
+ * @brief Prepares a comparator for one test's expected output.
+ */
+void comparator_init(StreamComparator *cmp, const ByteString *expected) {
+    memset(cmp, 0, sizeof(*cmp));
+    cmp->expected = expected->data;
+    cmp->expected_len = expected->len;
+    while (cmp->expected_len > 0 && isspace((unsigned char)cmp->expected[cmp->expected_len - 1])) {
+        cmp->expected_len--;
     }
+}
 
-    // Set up signal handlers and cleanup routine
-    signal(SIGINT, handle_signal);
-    signal(SIGTERM, handle_signal);
-    atexit(cleanup);
-
-    // Load LLM-generated test cases
-    printf("🔍 Loading LLM-generated test cases...\n");
-    if (load_test_cases_from_json(argv[2]) != 0) {
-        fprintf(stderr, "❌ Failed to load test cases from %s\n", argv[2]);
-        return 1;
-    }
-    
-    print_test_suite_info();
+/**
+ * @brief Checks the next chunk of child output against the expected output.
+ *
+ * Exact mode is equivalent to comparing the trimmed output with strcmp, but
+ * decides on the first differing byte. Token mode decides as each output
+ * token ends, or as soon as an unexpected extra token starts.
+ *
+ * @return 1 once a definitive mismatch has been seen, 0 otherwise.
+ */
+int comparator_feed(StreamComparator *cmp, const char *data, size_t len) {
+    for (size_t k = 0; k < len && !cmp->mismatch; k++, cmp->offset++) {
+        unsigned char c = (unsigned char)data[k];
+
+        if (compare_mode == COMPARE_EXACT) {
+            if (cmp->matched < cmp->expected_len && c == (unsigned char)cmp->expected[cmp->matched]) {
+                cmp->matched++;
+            } else if (cmp->matched < cmp->expected_len || !isspace(c)) {
+                cmp->mismatch = 1;
+                cmp->mismatch_offset = cmp->offset;
+            }
+            continue;
+        }
 
-    // Create secure temporary directory
-    char temp_dir_template[] = "/tmp/safe_eval_XXXXXX";
-    if (mkdtemp(temp_dir_template) == NULL) {
-        perror("mkdtemp failed");
-        return 1;
-    }
-    snprintf(temp_dir_path, sizeof(temp_dir_path), "%s", temp_dir_template);
+        if (isspace(c)) {
+            if (cmp->token_len > 0) comparator_end_token(cmp);
+            continue;
+        }
 
-    long start_time = current_time_ms();
+        if (cmp->token_len == 0) {
+            // Locate the expected token this output token has to match
+            size_t w = cmp->matched;
+            while (w < cmp->expected_len && isspace((unsigned char)cmp->expected[w])) w++;
+            if (w == cmp->expected_len) { // Output has more tokens than expected
+                cmp->mismatch = 1;
+                cmp->mismatch_offset = cmp->offset;
+                break;
+            }
+            size_t end = w;
+            while (end < cmp->expected_len && !isspace((unsigned char)cmp->expected[end])) end++;
+            cmp->want_start = w;
+            cmp->want_len = end - w;
+            cmp->token_start = cmp->offset;
+            cmp->token_exact = 1;
+        }
 
-    printf("1. Compiling source file: %s\n", argv[1]);
-    if (compile_source(argv[1]) != 0) {
-        fprintf(stderr, "❌ Compilation failed.\n");
-        EnhancedEvalMetrics metrics = {0};
-        write_enhanced_results_to_json(&metrics);
-        return 1;
+        if (cmp->token_exact && (cmp->token_len >= cmp->want_len ||
+                                 c != (unsigned char)cmp->expected[cmp->want_start + cmp->token_len])) {
+            cmp->token_exact = 0;
+        }
+        if (cmp->token_len < MAX_TOKEN_SIZE) {
+            cmp->token[cmp->token_len] = (char)c;
+        } else if (!cmp->token_exact) { // Too long to be a number and not the expected text
+            cmp->mismatch = 1;
+            cmp->mismatch_offset = cmp->token_start;
+            break;
+        }
+        cmp->token_len++;
     }
-    printf("    ✅ Compilation successful.\n\n");
-
-    EnhancedEvalMetrics metrics = {0};
-    
-    printf("2. Running LLM-generated correctness tests...\n");
-    metrics.passrate = calculate_dynamic_passrate(&metrics);
-    printf("    ✅ Simple Passrate: %.1f%% (%d/%d tests passed)\n", 
-           metrics.passrate, metrics.tests_passed, test_suite.num_tests);
-    printf("    ✅ Weighted Score: %.1f%%\n\n", metrics.weighted_score);
-
-    printf("3. Analyzing memory usage with Valgrind...\n");
-    metrics.memory_score = analyze_memory();
-    printf("    ✅ Memory Score: %.1f\n\n", metrics.memory_score);
-
-    printf("4. Checking robustness...\n");
-    metrics.robustness_score = check_robustness();
-    printf("    ✅ Robustness Score: %.1f\n\n", metrics.robustness_score);
-
-    metrics.execution_time_ms = current_time_ms() - start_time;
-
-    write_enhanced_results_to_json(&metrics);
-    printf("🎉 Enhanced evaluation complete. Results written to %s\n", RESULTS_JSON_PATH);
-    printf("📊 Ready for Stage 3 analysis...\n");
-
-    return 0;
+    return cmp->mismatch;
 }
 
-// --- Utility Function Implementations ---
-
 /**
- * @brief Cleans up temporary files and directories.
+ * @brief Token mode: judges the output token that just ended.
  */
-void cleanup(void) {
-    if (strlen(temp_dir_path) > 0) {
-        char command[512];
-        snprintf(command, sizeof(command), "rm -rf %s", temp_dir_path);
-        system(command);
+void comparator_end_token(StreamComparator *cmp) {
+    size_t kept = (cmp->token_len < MAX_TOKEN_SIZE) ? cmp->token_len : MAX_TOKEN_SIZE;
+    int equal = (cmp->token_exact && cmp->token_len == cmp->want_len) ||
+                (cmp->token_len <= MAX_TOKEN_SIZE &&
+                 tokens_equal(cmp->token, kept, cmp->expected + cmp->want_start, cmp->want_len));
+    if (equal) {
+        cmp->matched = cmp->want_start + cmp->want_len;
+    } else {
+        cmp->mismatch = 1;
+        cmp->mismatch_offset = cmp->token_start;
     }
-    remove(RESULTS_JSON_PATH);
-    remove(VALGRIND_LOG_PATH);
+    cmp->token_len = 0;
 }
 
 /**
- * @brief Handles termination signals to ensure cleanup is called.
+ * @brief Called at end of output; flushes the last token and checks nothing is missing.
+ * @return 1 if the whole output matched, 0 otherwise (mismatch_offset is set).
  */
-void handle_signal(int sig) {
-    printf("\nCaught signal %d, cleaning up and exiting.\n", sig);
-    exit(1); // atexit will call cleanup
+int comparator_finish(StreamComparator *cmp) {
+    if (compare_mode == COMPARE_TOKENS && cmp->token_len > 0 && !cmp->mismatch) {
+        comparator_end_token(cmp);
+    }
+    if (cmp->mismatch) return 0;
+
+    size_t remaining = cmp->matched;
+    if (compare_mode == COMPARE_TOKENS) {
+        while (remaining < cmp->expected_len && isspace((unsigned char)cmp->expected[remaining])) remaining++;
+    }
+    if (remaining < cmp->expected_len) { // Output ended before the expected output did
+        cmp->mismatch = 1;
+        cmp->mismatch_offset = cmp->offset;
+        return 0;
+    }
+    return 1;
 }
 
 /**
- * @brief Gets the current time in milliseconds.
+ * @brief Token equality: numbers compare within float_tolerance, anything else exactly.
  */
-long current_time_ms(void) {
-    struct timeval tv;
-    gettimeofday(&tv, NULL);
-    return (long)(tv.tv_sec) * 1000 + (long)(tv.tv_usec) / 1000;
+int tokens_equal(const char *got, size_t got_len, const char *want, size_t want_len) {
+    if (got_len == want_len && memcmp(got, want, got_len) == 0) return 1;
+    if (got_len > MAX_TOKEN_SIZE || want_len > MAX_TOKEN_SIZE) return 0;
+
+    char got_str[MAX_TOKEN_SIZE + 1], want_str[MAX_TOKEN_SIZE + 1];
+    memcpy(got_str, got, got_len);
+    got_str[got_len] = '\0';
+    memcpy(want_str, want, want_len);
+    want_str[want_len] = '\0';
+
+    char *got_end, *want_end;
+    double a = strtod(got_str, &got_end);
+    double b = strtod(want_str, &want_end);
+    if (got_end == got_str || *got_end != '\0' || want_end == want_str || *want_end != '\0') return 0;
+
+    double diff = (a > b) ? a - b : b - a;
+    double scale = (b < 0) ? -b : b;
+    if (scale < 1.0) scale = 1.0;
+    return diff <= float_tolerance * scale;
 }
 
-/**
- * @brief Sets resource limits for the child process.
- */
-void set_child_resource_limits(void) {
-    struct rlimit mem_limit;
-    mem_limit.rlim_cur = MEMORY_LIMIT_MB * 1024 * 1024;
-    mem_limit.rlim_max = MEMORY_LIMIT_MB * 1024 * 1024;
-    if (setrlimit(RLIMIT_AS, &mem_limit) != 0) {
-        perror("setrlimit(RLIMIT_AS) failed");
+// --- Compile Cache ---
+
+static const uint32_t SHA256_K[64] = {
+    0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+    0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+    0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+    0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+    0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+    0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+    0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+    0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2
+};
+
+#define ROTR32(x, n) (((x) >> (n)) | ((x) << (32 - (n))))
+
+static void sha256_block(Sha256 *ctx, const unsigned char *block) {
+    uint32_t w[64];
+    for (int t = 0; t < 16; t++) {
+        w[t] = ((uint32_t)block[t * 4] << 24) | ((uint32_t)block[t * 4 + 1] << 16) |
+               ((uint32_t)block[t * 4 + 2] << 8) | (uint32_t)block[t * 4 + 3];
+    }
+    for (int t = 16; t < 64; t++) {
+        uint32_t s0 = ROTR32(w[t - 15], 7) ^ ROTR32(w[t - 15], 18) ^ (w[t - 15] >> 3);
+        uint32_t s1 = ROTR32(w[t - 2], 17) ^ ROTR32(w[t - 2], 19) ^ (w[t - 2] >> 10);
+        w[t] = w[t - 16] + s0 + w[t - 7] + s1;
     }
 
-    struct rlimit cpu_limit;
-    cpu_limit.rlim_cur = CPU_TIME_LIMIT_S;
-    cpu_limit.rlim_max = CPU_TIME_LIMIT_S;
-    if (setrlimit(RLIMIT_CPU, &cpu_limit) != 0) {
-        perror("setrlimit(RLIMIT_CPU) failed");
+    uint32_t a = ctx->state[0], b = ctx->state[1], c = ctx->state[2], d = ctx->state[3];
+    uint32_t e = ctx->state[4], f = ctx->state[5], g = ctx->state[6], h = ctx->state[7];
+    for (int t = 0; t < 64; t++) {
+        uint32_t t1 = h + (ROTR32(e, 6) ^ ROTR32(e, 11) ^ ROTR32(e, 25)) + ((e & f) ^ (~e & g)) + SHA256_K[t] + w[t];
+        uint32_t t2 = (ROTR32(a, 2) ^ ROTR32(a, 13) ^ ROTR32(a, 22)) + ((a & b) ^ (a & c) ^ (b & c));
+        h = g; g = f; f = e; e = d + t1;
+        d = c; c = b; b = a; a = t1 + t2;
+    }
+    ctx->state[0] += a; ctx->state[1] += b; ctx->state[2] += c; ctx->state[3] += d;
+    ctx->state[4] += e; ctx->state[5] += f; ctx->state[6] += g; ctx->state[7] += h;
+}
+
+void sha256_init(Sha256 *ctx) {
+    static const uint32_t initial[8] = {
+        0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19
+    };
+    memcpy(ctx->state, initial, sizeof(initial));
+    ctx->total_bytes = 0;
+    ctx->buffered = 0;
+}
+
+void sha256_update(Sha256 *ctx, const void *data, size_t len) {
+    const unsigned char *p = data;
+    ctx->total_bytes += len;
+    while (len > 0) {
+        size_t take = 64 - ctx->buffered;
+        if (take > len) take = len;
+        memcpy(ctx->buffer + ctx->buffered, p, take);
+        ctx->buffered += take;
+        p += take;
+        len -= take;
+        if (ctx->buffered == 64) {
+            sha256_block(ctx, ctx->buffer);
+            ctx->buffered = 0;
+        }
     }
 }
 
 /**
- * @brief Compiles the given C source file into the temp directory.
- * @return 0 on success, -1 on failure.
+ * @brief Finishes the digest and writes it as 64 lowercase hex characters plus NUL.
  */
-int compile_source(const char *source_filename) {
-    snprintf(executable_path, sizeof(executable_path), "%s/user_program", temp_dir_path);
-    
-    char command[1024];
-    snprintf(command, sizeof(command), "gcc -o %s %s -lm", executable_path, source_filename);
-
-    int ret = system(command);
-    return (WIFEXITED(ret) && WEXITSTATUS(ret) == 0) ? 0 : -1;
+void sha256_final_hex(Sha256 *ctx, char hex[65]) {
+    uint64_t bits = ctx->total_bytes * 8;
+    unsigned char pad = 0x80;
+    sha256_update(ctx, &pad, 1);
+    pad = 0;
+    while (ctx->buffered != 56) sha256_update(ctx, &pad, 1);
+    unsigned char length[8];
+    for (int i = 0; i < 8; i++) length[i] = (unsigned char)(bits >> (56 - 8 * i));
+    sha256_update(ctx, length, 8);
+
+    for (int i = 0; i < 8; i++) {
+        snprintf(hex + i * 8, 9, "%08x", ctx->state[i]);
+    }
 }
 
 /**
- * @brief Runs a single test case in a sandboxed child process.
- * @return 0 on success, -1 on timeout or execution error.
+ * @brief Hashes a command's stdout (with a separator so fields cannot run together).
+ * The command runs from an argv array without a shell, so paths need no quoting.
+ * @return 0 if the command succeeded, -1 otherwise.
  */
-int run_test_process(const char *input, char *output_buffer, size_t buffer_size) {
+int sha256_command_output(Sha256 *ctx, char *const argv[]) {
+    int out_pipe[2];
+    if (pipe2(out_pipe, O_CLOEXEC) == -1) return -1;
+
+    pid_t pid = fork();
+    if (pid == -1) {
+        close(out_pipe[0]);
+        close(out_pipe[1]);
+        return -1;
+    }
+    if (pid == 0) {
+        dup2(out_pipe[1], STDOUT_FILENO);
+        int null_fd = open("/dev/null", O_WRONLY);
+        if (null_fd != -1) dup2(null_fd, STDERR_FILENO);
+        execvp(argv[0], argv);
+        _exit(EXEC_FAILURE_EXIT_CODE); // Not exit(): atexit cleanup would delete the parent's temp dir
+    }
+    close(out_pipe[1]);
+
+    char chunk[65536];
+    ssize_t n;
+    while ((n = read(out_pipe[0], chunk, sizeof(chunk))) != 0) {
+        if (n == -1) {
+            if (errno == EINTR) continue;
+            break;
+        }
+        sha256_update(ctx, chunk, (size_t)n);
+    }
+    sha256_update(ctx, "\0", 1);
+    close(out_pipe[0]);
+
+    int status;
+    while (waitpid(pid, &status, 0) == -1) {
+        if (errno != EINTR) return -1;
+    }
+    return (n == 0 && WIFEXITED(status) && WEXITSTATUS(status) == 0) ? 0 : -1;
+}
+
+/**
+ * @brief Hashes a file's contents (with a separator, like sha256_command_output).
+ * @return 0 on success, -1 if the file cannot be read.
+ */
+int sha256_file(Sha256 *ctx, const char *path) {
+    FILE *f = fopen(path, "rb");
+    if (!f) return -1;
+    char chunk[65536];
+    size_t n;
+    while ((n = fread(chunk, 1, sizeof(chunk), f)) > 0) {
+        sha256_update(ctx, chunk, n);
+    }
+    int failed = ferror(f);
+    fclose(f);
+    sha256_update(ctx, "\0", 1);
+    return failed ? -1 : 0;
+}
+
+/**
+ * @brief Creates a directory and its parents (mkdir -p).
+ */
+int make_dirs(const char *path) {
+    char partial[512];
+    snprintf(partial, sizeof(partial), "%s", path);
+    for (char *p = partial + 1; *p; p++) {
+        if (*p != '/') continue;
+        *p = '\0';
+        if (mkdir(partial, 0755) != 0 && errno != EEXIST) return -1;
+        *p = '/';
+    }
+    return (mkdir(partial, 0755) == 0 || errno == EEXIST) ? 0 : -1;
+}
+
+/**
+ * @brief Copies src to dst (replacing it) with the given mode.
+ */
+int copy_file(const char *src, const char *dst, mode_t mode) {
+    int in = open(src, O_RDONLY | O_CLOEXEC);
+    if (in < 0) return -1;
+    int out = open(dst, O_WRONLY | O_CREAT | O_TRUNC | O_CLOEXEC, mode);
+    if (out < 0) {
+        close(in);
+        return -1;
+    }
+
+    char chunk[65536];
+    ssize_t n;
+    int rc = 0;
+    while ((n = read(in, chunk, sizeof(chunk))) > 0) {
+        if (write(out, chunk, (size_t)n) != n) {
+            rc = -1;
+            break;
+        }
+    }
+    if (n < 0) rc = -1;
+    close(in);
+    if (close(out) != 0) rc = -1;
+    return rc;
+}
+
+/**
+ * @brief Enables the cache unless COMPILE_CACHE_BYPASS is set; COMPILE_CACHE_DIR and
+ * COMPILE_CACHE_MAX_MB override the location and size bound.
+ */
+void compile_cache_init(void) {
+    const char *bypass = getenv("COMPILE_CACHE_BYPASS");
+    if (bypass && (strcmp(bypass, "1") == 0 || strcmp(bypass, "true") == 0 || strcmp(bypass, "yes") == 0)) {
+        return;
+    }
+
+    const char *dir = getenv("COMPILE_CACHE_DIR");
+    if (dir && *dir) {
+        snprintf(compile_cache.dir, sizeof(compile_cache.dir), "%s", dir);
+    } else {
+        const char *home = getenv("HOME");
+        snprintf(compile_cache.dir, sizeof(compile_cache.dir), "%s/.cache/code_eval/compile",
+                 (home && *home) ? home : "/tmp");
+    }
+    const char *max_mb = getenv("COMPILE_CACHE_MAX_MB");
+    compile_cache.max_bytes = (long long)((max_mb ? atof(max_mb) : COMPILE_CACHE_MAX_MB) * 1024 * 1024);
+
+    if (make_dirs(compile_cache.dir) != 0) {
+        fprintf(stderr, "⚠️  Compile cache disabled: cannot create %s\n", compile_cache.dir);
+        return;
+    }
+    compile_cache.enabled = 1;
+}
+
+/**
+ * @brief Cache key: compiler identity, flags, the source and its preprocessed form.
+ *
+ * The preprocessed text covers every header the source pulls in; the raw
+ * source keeps cached diagnostics' line numbers accurate.
+ * @return 0 on success, -1 if the source could not be preprocessed.
+ */
+int compile_cache_key(const char *source_filename, const char *flags, char key[65]) {
+    static char compiler_id[65] = "";
+    Sha256 ctx;
+
+    if (compiler_id[0] == '\0') { // Same compiler for the whole run; ask once
+        sha256_init(&ctx);
+        char *dumpmachine[] = { "gcc", "-dumpmachine", NULL };
+        char *version[] = { "gcc", "--version", NULL };
+        if (sha256_command_output(&ctx, dumpmachine) != 0 || sha256_command_output(&ctx, version) != 0) return -1;
+        sha256_final_hex(&ctx, compiler_id);
+    }
+
+    sha256_init(&ctx);
+    sha256_update(&ctx, compiler_id, sizeof(compiler_id));
+    sha256_update(&ctx, flags, strlen(flags) + 1);
+    if (sha256_file(&ctx, source_filename) != 0) return -1;
+    char *preprocess[] = { "gcc", "-E", "-P", (char *)source_filename, NULL };
+    if (sha256_command_output(&ctx, preprocess) != 0) return -1;
+    sha256_final_hex(&ctx, key);
+    return 0;
+}
+
+/**
+ * @brief Path of a cache entry file: <dir>/<key[:2]>/<key><suffix>.
+ */
+void compile_cache_entry_path(const char *key, const char *suffix, char *path, size_t size) {
+    snprintf(path, size, "%s/%.2s/%s%s", compile_cache.dir, key, key, suffix);
+}
+
+/**
+ * @brief Restores a cached compile into exe_path / log_path.
+ *
+ * The .log file is written last when storing, so its presence marks a
+ * complete entry; an entry without a .bin is a cached compile failure.
+ * @return 1 for a cached success, 0 for a cached failure, -1 on a miss.
+ */
+int compile_cache_lookup(const char *key, const char *exe_path, const char *log_path) {
+    char bin[1024], log[1024];
+    compile_cache_entry_path(key, ".bin", bin, sizeof(bin));
+    compile_cache_entry_path(key, ".log", log, sizeof(log));
+
+    if (access(log, R_OK) != 0) return -1;
+    int has_bin = (access(bin, X_OK) == 0);
+    if (copy_file(log, log_path, 0644) != 0) return -1;
+    if (has_bin && link(bin, exe_path) != 0 && copy_file(bin, exe_path, 0755) != 0) return -1;
+
+    // Refresh recency for eviction
+    utimensat(AT_FDCWD, log, NULL, 0);
+    if (has_bin) utimensat(AT_FDCWD, bin, NULL, 0);
+    return has_bin;
+}
+
+/**
+ * @brief Stores a compile result (exe_path NULL for a failed compile), then evicts.
+ */
+void compile_cache_store(const char *key, const char *exe_path, const char *log_path) {
+    char dir[1024], bin[1024], log[1024], tmp[1100];
+    snprintf(dir, sizeof(dir), "%s/%.2s", compile_cache.dir, key);
+    if (make_dirs(dir) != 0) return;
+    compile_cache_entry_path(key, ".bin", bin, sizeof(bin));
+    compile_cache_entry_path(key, ".log", log, sizeof(log));
+
+    // Write-then-rename so concurrent evaluators never see a partial entry
+    if (exe_path) {
+        snprintf(tmp, sizeof(tmp), "%s.%d.tmp", bin, (int)getpid());
+        if (copy_file(exe_path, tmp, 0755) != 0 || rename(tmp, bin) != 0) {
+            remove(tmp);
+            return;
+        }
+    }
+    snprintf(tmp, sizeof(tmp), "%s.%d.tmp", log, (int)getpid());
+    if (copy_file(log_path, tmp, 0644) != 0 || rename(tmp, log) != 0) {
+        remove(tmp);
+        return;
+    }
+
+    compile_cache_evict();
+}
+
+static int compare_entry_age(const void *a, const void *b) {
+    const CompileCacheEntry *x = a, *y = b;
+    return (x->mtime > y->mtime) - (x->mtime < y->mtime);
+}
+
+/**
+ * @brief Removes least recently used entries until the cache fits in max_bytes.
+ */
+void compile_cache_evict(void) {
+    DIR *top = opendir(compile_cache.dir);
+    if (!top) return;
+
+    CompileCacheEntry *entries = NULL;
+    size_t count = 0, capacity = 0;
+    long long total = 0;
+    struct dirent *shard;
+    while ((shard = readdir(top)) != NULL) {
+        if (shard->d_name[0] == '.') continue;
+        char shard_path[1024];
+        snprintf(shard_path, sizeof(shard_path), "%s/%s", compile_cache.dir, shard->d_name);
+        DIR *sub = opendir(shard_path);
+        if (!sub) continue;
+
+        struct dirent *file;
+        while ((file = readdir(sub)) != NULL) {
+            size_t name_len = strlen(file->d_name);
+            if (name_len != 64 + 4 || strcmp(file->d_name + 64, ".log") != 0) continue;
+
+            CompileCacheEntry entry = {0};
+            memcpy(entry.key, file->d_name, 64);
+            char path[1024];
+            struct stat st;
+            compile_cache_entry_path(entry.key, ".log", path, sizeof(path));
+            if (stat(path, &st) != 0) continue;
+            entry.mtime = st.st_mtime;
+            entry.size = st.st_size;
+            compile_cache_entry_path(entry.key, ".bin", path, sizeof(path));
+            if (stat(path, &st) == 0) entry.size += st.st_size;
+
+            if (count == capacity) {
+                size_t new_capacity = capacity ? capacity * 2 : 64;
+                CompileCacheEntry *grown = realloc(entries, new_capacity * sizeof(CompileCacheEntry));
+                if (!grown) break;
+                entries = grown;
+                capacity = new_capacity;
+            }
+            entries[count++] = entry;
+            total += entry.size;
+        }
+        closedir(sub);
+    }
+    closedir(top);
+
+    if (total > compile_cache.max_bytes && entries) {
+        qsort(entries, count, sizeof(CompileCacheEntry), compare_entry_age); // Oldest access first
+        for (size_t i = 0; i < count && total > compile_cache.max_bytes; i++) {
+            char path[1024];
+            compile_cache_entry_path(entries[i].key, ".log", path, sizeof(path));
+            remove(path); // Uncommit the entry before dropping its binary
+            compile_cache_entry_path(entries[i].key, ".bin", path, sizeof(path));
+            remove(path);
+            total -= entries[i].size;
+            __atomic_add_fetch(&compile_cache.evictions, 1, __ATOMIC_RELAXED);
+        }
+    }
+    free(entries);
+}
+
+// --- Batch Mode ---
+
+/**
+ * @brief Evaluates every submission in manifest against the already loaded test suite.
+ *
+ * Submissions run one after another, each with the full parallel_jobs worker
+ * pool for its tests, in a scratch directory of its own. Each one gets
+ * <output_dir>/<name>.json in the usual format, and a one-line JSON record is
+ * appended and flushed to records_path (default <output_dir>/batch_results.jsonl)
+ * as soon as it finishes, so consumers can follow the batch as it runs.
+ *
+ * @return 0 once every submission has been evaluated, 1 if the batch could not run.
+ */
+int run_batch(const char *manifest, const char *output_dir, const char *records_path) {
+    char **sources = NULL;
+    int count = load_batch_manifest(manifest, &sources);
+    if (count <= 0) {
+        fprintf(stderr, "❌ No submissions listed in %s\n", manifest);
+        free(sources);
+        return 1;
+    }
+
+    if (!output_dir) output_dir = BATCH_OUTPUT_DIR;
+    if (make_dirs(output_dir) != 0) {
+        fprintf(stderr, "❌ Cannot create output directory %s: %s\n", output_dir, strerror(errno));
+        return 1;
+    }
+    char default_records[512];
+    snprintf(default_records, sizeof(default_records), "%s/%s", output_dir, BATCH_RECORDS_FILE_NAME);
+    if (!records_path) records_path = default_records;
+    FILE *records = fopen(records_path, "w");
+    if (!records) {
+        perror("fopen (batch records)");
+        return 1;
+    }
+
+    int compile_errors = 0, rc = 0;
+    long batch_start = current_time_ms();
+    for (int k = 0; k < count; k++) {
+        char name[256];
+        batch_submission_name(sources, k, name, sizeof(name));
+        snprintf(results_json_path, sizeof(results_json_path), "%s/%s.json", output_dir, name);
+        snprintf(temp_dir_path, sizeof(temp_dir_path), "%s/%d", temp_root_path, k);
+        if (mkdir(temp_dir_path, 0700) != 0) {
+            perror("mkdir (submission scratch dir) failed");
+            rc = 1;
+            break;
+        }
+
+        printf("📦 [%d/%d] %s (%s)\n", k + 1, count, name, sources[k]);
+        long start_time = current_time_ms();
+        EnhancedEvalMetrics metrics = {0};
+        int compiled = (evaluate_submission(sources[k], &metrics) == 0);
+        metrics.execution_time_ms = current_time_ms() - start_time;
+        if (!compiled) compile_errors++;
+
+        write_enhanced_results_to_json(&metrics);
+        write_batch_record(records, name, sources[k], compiled, &metrics);
+        free(metrics.test_outcomes);
+        reset_submission_state();
+        remove_tree(temp_dir_path);
+    }
+    snprintf(temp_dir_path, sizeof(temp_dir_path), "%s", temp_root_path);
+    fclose(records);
+
+    printf("🎉 Batch complete in %ld ms: %d submissions, %d compile errors. Records written to %s\n",
+           current_time_ms() - batch_start, count, compile_errors, records_path);
+    for (int k = 0; k < count; k++) free(sources[k]);
+    free(sources);
+    return rc;
+}
+
+/**
+ * @brief Reads one source path per line; blank lines and # comments are skipped and
+ * relative paths resolve against the manifest's directory.
+ * @return The number of submissions (sources is allocated even when zero), or -1 on error.
+ */
+int load_batch_manifest(const char *manifest, char ***sources) {
+    FILE *f = fopen(manifest, "r");
+    if (!f) {
+        fprintf(stderr, "❌ Cannot open submissions manifest: %s\n", manifest);
+        return -1;
+    }
+    char base_dir[512];
+    snprintf(base_dir, sizeof(base_dir), "%s", manifest);
+    char *slash = strrchr(base_dir, '/');
+    if (slash) *slash = '\0';
+    else snprintf(base_dir, sizeof(base_dir), ".");
+
+    int count = 0, capacity = 16;
+    *sources = malloc(capacity * sizeof(char *));
+    char line[1024];
+    while (*sources && fgets(line, sizeof(line), f)) {
+        char *entry = line;
+        while (isspace((unsigned char)*entry)) entry++;
+        trim_trailing_whitespace(entry);
+        if (*entry == '\0' || *entry == '#') continue;
+
+        if (count == capacity) {
+            char **grown = realloc(*sources, 2 * capacity * sizeof(char *));
+            if (!grown) break;
+            *sources = grown;
+            capacity *= 2;
+        }
+        char path[1024];
+        if (entry[0] == '/') snprintf(path, sizeof(path), "%s", entry);
+        else snprintf(path, sizeof(path), "%s/%s", base_dir, entry);
+        (*sources)[count] = strdup(path);
+        if (!(*sources)[count]) break;
+        count++;
+    }
+    fclose(f);
+    return *sources ? count : -1;
+}
+
+/**
+ * @brief Names submission index after its file, without ".c"; repeated names get _1, _2, ...
+ */
+void batch_submission_name(char *const *sources, int index, char *name, size_t size) {
+    char base[256], other[256];
+    int repeats = 0;
+    for (int k = index; k >= 0; k--) {
+        char *target = (k == index) ? base : other;
+        const char *slash = strrchr(sources[k], '/');
+        snprintf(target, sizeof(base), "%s", slash ? slash + 1 : sources[k]);
+        size_t len = strlen(target);
+        if (len > 2 && strcmp(target + len - 2, ".c") == 0) target[len - 2] = '\0';
+        if (k < index && strcmp(other, base) == 0) repeats++;
+    }
+    if (repeats) snprintf(name, size, "%s_%d", base, repeats);
+    else snprintf(name, size, "%s", base);
+}
+
+/**
+ * @brief Appends one submission's summary as a single JSON line and flushes it.
+ */
+void write_batch_record(FILE *f, const char *name, const char *source, int compiled,
+                        const EnhancedEvalMetrics *metrics) {
+    fprintf(f, "{\"name\": ");
+    fprint_json_string(f, name);
+    fprintf(f, ", \"source_file\": ");
+    fprint_json_string(f, source);
+    fprintf(f, ", \"status\": \"%s\", \"results_file\": ", compiled ? "ok" : "compile_error");
+    fprint_json_string(f, results_json_path);
+    fprintf(f, ", \"passrate\": %.1f, \"weighted_score\": %.1f, \"memory_score\": %.1f, \"robustness_score\": %.1f",
+            metrics->passrate, metrics->weighted_score, metrics->memory_score, metrics->robustness_score);
+    fprintf(f, ", \"tests_passed\": %d, \"total_tests\": %d", metrics->tests_passed, test_suite.num_tests);
+    if (complexity.enabled && compiled) {
+        fprintf(f, ", \"time_complexity\": \"%s\", \"space_complexity\": \"%s\"",
+                complexity.time_class, complexity.space_class);
+    }
+    fprintf(f, ", \"execution_time_ms\": %ld}\n", metrics->execution_time_ms);
+    fflush(f);
+}
+
+/**
+ * @brief Clears the per-submission results left in globals so the next submission starts fresh.
+ */
+void reset_submission_state(void) {
+    free(memory_analysis.reports);
+    memory_analysis.reports = NULL;
+    memory_analysis.num_reports = 0;
+    memory_analysis.tests_analyzed = 0;
+    memset(&memory_analysis.totals, 0, sizeof(memory_analysis.totals));
+    memory_analysis.num_details = 0;
+
+    int enabled = complexity.enabled;
+    memset(&complexity, 0, sizeof(complexity));
+    complexity.enabled = enabled;
+    complexity.time_class = "unknown";
+    complexity.space_class = "unknown";
+
+    fork_server_disabled = 0; // A static binary only rules the fork server out for itself
+}
+
+// --- Main Logic (Modified) ---
+
+int main(int argc, char **argv) {
+    static const struct option long_options[] = {
+        { "results", required_argument, NULL, 'r' },
+        { "output-dir", required_argument, NULL, 'o' },
+        { "batch", required_argument, NULL, 'b' },
+        { NULL, 0, NULL, 0 }
+    };
+    const char *output_dir = NULL;
+    const char *results_arg = NULL;
+    const char *batch_manifest = NULL;
+    int opt;
+    while ((opt = getopt_long(argc, argv, "j:c:L:te:m:M:s:CFr:o:b:", long_options, NULL)) != -1) {
+        switch (opt) {
+            case 'b':
+                batch_manifest = optarg;
+                break;
+            case 'r':
+                results_arg = optarg;
+                break;
+            case 'o':
+                output_dir = optarg;
+                break;
+            case 'j':
+                parallel_jobs = atoi(optarg);
+                break;
+            case 'c':
+                output_capture_bytes = strtoul(optarg, NULL, 10);
+                break;
+            case 'L':
+                output_limit_bytes = strtoul(optarg, NULL, 10);
+                break;
+            case 't':
+                compare_mode = COMPARE_TOKENS;
+                break;
+            case 'm':
+                if (strcmp(optarg, "valgrind") == 0) {
+                    memory_backend = MEMORY_BACKEND_VALGRIND;
+                } else if (strcmp(optarg, "sanitizer") == 0) {
+                    memory_backend = MEMORY_BACKEND_SANITIZER;
+                } else {
+                    fprintf(stderr, "❌ Unknown memory backend '%s' (expected sanitizer or valgrind)\n", optarg);
+                    return 1;
+                }
+                break;
+            case 'M':
+                memory_jobs = atoi(optarg);
+                break;
+            case 's':
+                memory_sample = atoi(optarg);
+                break;
+            case 'C':
+                complexity.enabled = 1;
+                break;
+            case 'F':
+                fork_server_enabled = 1;
+                break;
+            case 'e':
+                compare_mode = COMPARE_TOKENS;
+                float_tolerance = strtod(optarg, NULL);
+                break;
+            default:
+                print_usage(argv[0]);
+                return 1;
+        }
+    }
+
+    // Batch mode takes the submissions from the manifest, so only the test suite is positional
+    int positional = batch_manifest ? 1 : 2;
+    if (argc - optind < positional) {
+        print_usage(argv[0]);
+        return 1;
+    }
+    // Verdicts come from the streaming comparator; the capture only has to be big enough to show
+    if (output_limit_bytes < output_capture_bytes) output_limit_bytes = output_capture_bytes;
+    const char *source_path = batch_manifest ? NULL : argv[optind];
+    const char *tests_path = argv[optind + positional - 1];
+
+    if (parallel_jobs <= 0) {
+        long cores = sysconf(_SC_NPROCESSORS_ONLN);
+        parallel_jobs = (cores > 0) ? (int)cores : 1;
+    }
+    // Memory checking overlaps the correctness tests, so by default it takes half the cores
+    if (memory_jobs <= 0) {
+        memory_jobs = (parallel_jobs > 1) ? parallel_jobs / 2 : 1;
+    }
+
+    // An explicit results path or output directory lets several evaluations run side by side
+    if (!results_arg && argc - optind > positional) results_arg = argv[optind + positional];
+    if (batch_manifest) {
+        // run_batch() picks the per-submission and record paths
+    } else if (results_arg) {
+        snprintf(results_json_path, sizeof(results_json_path), "%s", results_arg);
+    } else if (output_dir) {
+        if (make_dirs(output_dir) != 0) {
+            fprintf(stderr, "❌ Cannot create output directory %s: %s\n", output_dir, strerror(errno));
+            return 1;
+        }
+        snprintf(results_json_path, sizeof(results_json_path), "%s/%s", output_dir, RESULTS_FILE_NAME);
+    }
+
+    // Set up signal handlers and cleanup routine
+    signal(SIGINT, handle_signal);
+    signal(SIGTERM, handle_signal);
+    // A child that stops reading its stdin must not take the evaluator down with it
+    signal(SIGPIPE, SIG_IGN);
+    atexit(cleanup);
+
+    // Load LLM-generated test cases
+    printf("🔍 Loading LLM-generated test cases...\n");
+    if (load_test_cases_from_json(tests_path) != 0) {
+        fprintf(stderr, "❌ Failed to load test cases from %s\n", tests_path);
+        return 1;
+    }
+    
+    print_test_suite_info();
+
+    // Create secure temporary directory; every scratch file of this run lives in it
+    const char *tmp_root = getenv("TMPDIR");
+    char temp_dir_template[256];
+    snprintf(temp_dir_template, sizeof(temp_dir_template), "%s/safe_eval_XXXXXX",
+             (tmp_root && *tmp_root) ? tmp_root : "/tmp");
+    if (mkdtemp(temp_dir_template) == NULL) {
+        perror("mkdtemp failed");
+        return 1;
+    }
+    snprintf(temp_dir_path, sizeof(temp_dir_path), "%s", temp_dir_template);
+    snprintf(temp_root_path, sizeof(temp_root_path), "%s", temp_dir_template);
+
+    compile_cache_init();
+    if (batch_manifest) return run_batch(batch_manifest, output_dir, results_arg);
+
+    long start_time = current_time_ms();
+    EnhancedEvalMetrics metrics = {0};
+    if (evaluate_submission(source_path, &metrics) != 0) {
+        write_enhanced_results_to_json(&metrics);
+        return 1;
+    }
+    metrics.execution_time_ms = current_time_ms() - start_time;
+
+    write_enhanced_results_to_json(&metrics);
+    free(metrics.test_outcomes);
+    printf("🎉 Enhanced evaluation complete. Results written to %s\n", results_json_path);
+    printf("📊 Ready for Stage 3 analysis...\n");
+
+    return 0;
+}
+
+/**
+ * @brief Runs every evaluation step on one submission against the loaded test suite.
+ * @return 0 on success, -1 if the submission does not compile (metrics are then left zeroed).
+ */
+int evaluate_submission(const char *source_path, EnhancedEvalMetrics *metrics) {
+    printf("1. Compiling source file: %s\n", source_path);
+    if (compile_source(source_path) != 0) {
+        fprintf(stderr, "❌ Compilation failed.\n");
+        return -1;
+    }
+    printf("    ✅ Compilation successful.\n\n");
+    start_memory_analysis(source_path); // Runs alongside the correctness tests
+    if (fork_server_enabled && build_fork_server_stub() != 0) {
+        fprintf(stderr, "⚠️  Could not build the fork-server stub; using fork+exec per test\n");
+        fork_server_enabled = 0;
+    }
+
+    printf("2. Running LLM-generated correctness tests...\n");
+    metrics->passrate = calculate_dynamic_passrate(metrics);
+    printf("    ✅ Simple Passrate: %.1f%% (%d/%d tests passed)\n", 
+           metrics->passrate, metrics->tests_passed, test_suite.num_tests);
+    printf("    ✅ Weighted Score: %.1f%%\n", metrics->weighted_score);
+    printf("    ⏱️  Per test: CPU %.1f ms median / %.1f ms max, peak RSS %.0f KB median / %.0f KB max\n\n",
+           metrics->user_cpu_summary.median + metrics->sys_cpu_summary.median,
+           metrics->user_cpu_summary.max + metrics->sys_cpu_summary.max,
+           metrics->max_rss_summary.median, metrics->max_rss_summary.max);
+
+    printf("3. Collecting memory analysis...\n");
+    metrics->memory_score = analyze_memory();
+    printf("    ✅ Memory Score: %.1f (%s, %d/%d tests analyzed)\n\n", metrics->memory_score,
+           memory_backend_name(memory_analysis.backend), memory_analysis.tests_analyzed, test_suite.num_tests);
+
+    printf("4. Checking robustness...\n");
+    metrics->robustness_score = check_robustness();
+    printf("    ✅ Robustness Score: %.1f\n\n", metrics->robustness_score);
+
+    if (complexity.enabled) {
+        printf("5. Estimating empirical complexity...\n");
+        estimate_complexity();
+        printf("    ✅ Time: %s (R² %.3f, log-log slope %.2f), Space: %s (R² %.3f)\n",
+               complexity.time_class, complexity.time_r2, complexity.time_loglog_slope,
+               complexity.space_class, complexity.space_r2);
+        printf("    ℹ️  %d sizes measured; stopped: %s\n\n", complexity.num_points, complexity.stopped_reason);
+    }
+    return 0;
+}
+
+// --- Utility Function Implementations ---
+
+/**
+ * @brief Prints the command-line synopsis.
+ */
+void print_usage(const char *program) {
+    fprintf(stderr, "Usage: %s [options] <source.c> <test_cases.json> [results.json]\n"
+                    "       %s [options] -b|--batch submissions.txt <test_cases.json> [records.jsonl]\n"
+                    "Options: [-j jobs] [-c capture_bytes] [-L output_limit_bytes] [-t] [-e tolerance] [-m sanitizer|valgrind] "
+                    "[-M memory_jobs] [-s memory_sample] [-C] [-F] [-o|--output-dir dir] [-r|--results path]\n",
+            program, program);
+}
+
+/**
+ * @brief nftw callback for remove_tree: children come first (FTW_DEPTH), so directories are empty.
+ */
+int remove_tree_entry(const char *path, const struct stat *st, int type, struct FTW *ftw) {
+    (void)st; (void)type; (void)ftw;
+    remove(path); // Keep going on failure, like rm -rf
+    return 0;
+}
+
+/**
+ * @brief Removes a directory tree (rm -rf) without a shell; symlinks are removed, not followed.
+ */
+void remove_tree(const char *path) {
+    nftw(path, remove_tree_entry, 16, FTW_DEPTH | FTW_PHYS);
+}
+
+/**
+ * @brief Runs argv[0] (looked up in PATH) without a shell, stderr going to stderr_path if given.
+ * @return 0 if the command exited with status 0, -1 otherwise.
+ */
+int run_command(char *const argv[], const char *stderr_path) {
+    pid_t pid = fork();
+    if (pid == -1) return -1;
+    if (pid == 0) {
+        if (stderr_path) {
+            int log_fd = open(stderr_path, O_WRONLY | O_CREAT | O_TRUNC, 0644);
+            if (log_fd == -1) _exit(EXEC_FAILURE_EXIT_CODE);
+            dup2(log_fd, STDERR_FILENO);
+            close(log_fd);
+        }
+        execvp(argv[0], argv);
+        _exit(EXEC_FAILURE_EXIT_CODE); // Not exit(): atexit cleanup would delete the parent's temp dir
+    }
+
+    int status;
+    while (waitpid(pid, &status, 0) == -1) {
+        if (errno != EINTR) return -1;
+    }
+    return (WIFEXITED(status) && WEXITSTATUS(status) == 0) ? 0 : -1;
+}
+
+/**
+ * @brief Cleans up temporary files and directories. The results file is kept.
+ */
+void cleanup(void) {
+    if (strlen(temp_root_path) > 0) remove_tree(temp_root_path);
+    free_test_suite();
+    if (!memory_thread_started) free(memory_analysis.reports); // A still-running worker may use it
+}
+
+/**
+ * @brief Handles termination signals to ensure cleanup is called.
+ */
+void handle_signal(int sig) {
+    printf("\nCaught signal %d, cleaning up and exiting.\n", sig);
+    exit(1); // atexit will call cleanup
+}
+
+/**
+ * @brief Gets the current time in milliseconds.
+ */
+long current_time_ms(void) {
+    struct timeval tv;
+    gettimeofday(&tv, NULL);
+    return (long)(tv.tv_sec) * 1000 + (long)(tv.tv_usec) / 1000;
+}
+
+/**
+ * @brief Monotonic clock in fractional milliseconds, for per-test timing.
+ */
+double monotonic_ms(void) {
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return (double)ts.tv_sec * 1000.0 + (double)ts.tv_nsec / 1e6;
+}
+
+/**
+ * @brief Sets resource limits for the child process. A cpu_limit_s of 0 leaves CPU time unlimited.
+ */
+void set_child_resource_limits(int limit_address_space, int cpu_limit_s) {
+    if (limit_address_space) {
+        struct rlimit mem_limit;
+        mem_limit.rlim_cur = MEMORY_LIMIT_MB * 1024 * 1024;
+        mem_limit.rlim_max = MEMORY_LIMIT_MB * 1024 * 1024;
+        if (setrlimit(RLIMIT_AS, &mem_limit) != 0) {
+            perror("setrlimit(RLIMIT_AS) failed");
+        }
+    }
+
+    if (cpu_limit_s <= 0) return;
+    struct rlimit cpu_limit;
+    cpu_limit.rlim_cur = cpu_limit_s;
+    cpu_limit.rlim_max = cpu_limit_s;
+    if (setrlimit(RLIMIT_CPU, &cpu_limit) != 0) {
+        perror("setrlimit(RLIMIT_CPU) failed");
+    }
+}
+
+/**
+ * @brief Compiles the given C source file into the temp directory.
+ * @return 0 on success, -1 on failure.
+ */
+int compile_source(const char *source_filename) {
+    snprintf(executable_path, sizeof(executable_path), "%s/user_program", temp_dir_path);
+    char log_path[512];
+    snprintf(log_path, sizeof(log_path), "%s/compile.log", temp_dir_path);
+
+    int rc = compile_with_cache(source_filename, COMPILE_FLAGS, executable_path, log_path,
+                                &compile_cache.last_hit, compile_cache.last_key);
+    if (compile_cache.last_hit) printf("    ⚡ Compile cache hit (%.12s)\n", compile_cache.last_key);
+    print_file(log_path, stderr); // Diagnostics are captured for the cache, so echo them here
+    return rc;
+}
+
+/**
+ * @brief Builds source_filename with flags into exe_path, going through the compile cache.
+ * Diagnostics land in log_path either way.
+ * @return 0 if the build succeeded, -1 otherwise.
+ */
+int compile_with_cache(const char *source_filename, const char *flags, const char *exe_path,
+                       const char *log_path, int *cache_hit, char key[65]) {
+    *cache_hit = 0;
+    key[0] = '\0';
+    if (compile_cache.enabled && compile_cache_key(source_filename, flags, key) == 0) {
+        int cached = compile_cache_lookup(key, exe_path, log_path);
+        if (cached >= 0) {
+            __atomic_add_fetch(&compile_cache.hits, 1, __ATOMIC_RELAXED);
+            *cache_hit = 1;
+            return cached ? 0 : -1;
+        }
+        __atomic_add_fetch(&compile_cache.misses, 1, __ATOMIC_RELAXED);
+    }
+
+    // gcc -o exe source <flags...>; flags is a space-separated constant, split into its own argv entries
+    char flag_words[256];
+    snprintf(flag_words, sizeof(flag_words), "%s", flags);
+    char *argv[32] = { "gcc", "-o", (char *)exe_path, (char *)source_filename };
+    int argc = 4;
+    char *save = NULL;
+    for (char *word = strtok_r(flag_words, " ", &save); word && argc < 31; word = strtok_r(NULL, " ", &save)) {
+        argv[argc++] = word;
+    }
+    argv[argc] = NULL;
+
+    int ok = (run_command(argv, log_path) == 0);
+    if (key[0]) compile_cache_store(key, ok ? exe_path : NULL, log_path);
+    return ok ? 0 : -1;
+}
+
+void fprint_resource_summary(FILE *f, const char *name, const ResourceSummary *summary, int last) {
+    fprintf(f, "    \"%s\": {\"min\": %.3f, \"median\": %.3f, \"max\": %.3f}%s\n",
+            name, summary->min, summary->median, summary->max, last ? "" : ",");
+}
+
+/**
+ * @brief Writes str as a quoted, escaped JSON string.
+ */
+void fprint_json_string(FILE *f, const char *str) {
+    fputc('"', f);
+    for (const unsigned char *c = (const unsigned char *)str; *c; c++) {
+        if (*c == '"' || *c == '\\') {
+            fprintf(f, "\\%c", *c);
+        } else if (*c == '\n') {
+            fputs("\\n", f);
+        } else if (*c < 0x20) {
+            fprintf(f, "\\u%04x", *c);
+        } else {
+            fputc(*c, f);
+        }
+    }
+    fputc('"', f);
+}
+
+const char *memory_backend_name(MemoryBackend backend) {
+    return (backend == MEMORY_BACKEND_VALGRIND) ? "valgrind" : "sanitizer";
+}
+
+/**
+ * @brief Copies a file's contents to out (used to echo compiler diagnostics).
+ */
+void print_file(const char *path, FILE *out) {
+    FILE *f = fopen(path, "r");
+    if (!f) return;
+    char chunk[4096];
+    size_t n;
+    while ((n = fread(chunk, 1, sizeof(chunk), f)) > 0) {
+        fwrite(chunk, 1, n, out);
+    }
+    fclose(f);
+}
+
+/**
+ * @brief Runs a single test case against the normal build in a sandboxed child process.
+ * With -F the child is a pre-initialised copy from a fork server, falling back to fork+exec.
+ * @return 0 on success, -1 on timeout or execution error.
+ */
+int run_test_process(const ByteString *input, OutputCapture *capture, ChildUsage *usage) {
+    if (fork_server_enabled) {
+        int rc = run_fork_server_process(input, capture, usage);
+        if (rc != -2) return rc;
+    }
+    ChildSpec spec = {
+        .exe_path = executable_path,
+        .argv = NULL,
+        .envp = NULL,
+        .limit_address_space = 1,
+        .cpu_limit_s = CPU_TIME_LIMIT_S,
+        .timeout_ms = TIMEOUT_SECONDS * 1000,
+        .stdin_path = NULL,
+        .stderr_path = NULL
+    };
+    return run_child_process(&spec, input, capture, usage);
+}
+
+/**
+ * @brief Runs spec->exe_path on input in a sandboxed child process.
+ * Fills usage (if not NULL) with the child's wall time, CPU time, peak RSS and exit status.
+ * @return 0 on success, -1 on timeout or execution error.
+ */
+int run_child_process(const ChildSpec *spec, const ByteString *input, OutputCapture *capture, ChildUsage *usage) {
     int stdin_pipe[2], stdout_pipe[2];
     pid_t pid;
 
-    if (pipe(stdin_pipe) == -1 || pipe(stdout_pipe) == -1) {
-        perror("pipe failed");
-        return -1;
+    // O_CLOEXEC keeps concurrently spawned children from inheriting each other's pipes
+    if (pipe2(stdin_pipe, O_CLOEXEC) == -1) {
+        perror("pipe failed");
+        return -1;
+    }
+    if (pipe2(stdout_pipe, O_CLOEXEC) == -1) {
+        perror("pipe failed");
+        close(stdin_pipe[0]);
+        close(stdin_pipe[1]);
+        return -1;
+    }
+
+    double start = monotonic_ms();
+    pid = fork();
+    if (pid == -1) {
+        perror("fork failed");
+        close(stdin_pipe[0]);
+        close(stdin_pipe[1]);
+        close(stdout_pipe[0]);
+        close(stdout_pipe[1]);
+        return -1;
+    }
+
+    if (pid == 0) { // Child process
+        close(stdin_pipe[1]);
+        close(stdout_pipe[0]);
+        int in_fd = spec->stdin_path ? open(spec->stdin_path, O_RDONLY) : -1;
+        dup2(in_fd != -1 ? in_fd : stdin_pipe[0], STDIN_FILENO);
+        if (in_fd != -1) close(in_fd);
+        dup2(stdout_pipe[1], STDOUT_FILENO);
+        if (spec->stderr_path) {
+            int err_fd = open(spec->stderr_path, O_WRONLY | O_CREAT | O_TRUNC, 0600);
+            if (err_fd != -1) {
+                dup2(err_fd, STDERR_FILENO);
+                close(err_fd);
+            }
+        } else {
+            dup2(stdout_pipe[1], STDERR_FILENO); // Redirect stderr to stdout pipe
+        }
+        close(stdin_pipe[0]);
+        close(stdout_pipe[1]);
+
+        set_child_resource_limits(spec->limit_address_space, spec->cpu_limit_s);
+        signal(SIGPIPE, SIG_DFL); // Ignored signals survive exec; restore the default for the program
+        
+        char *default_argv[] = { (char *)spec->exe_path, NULL };
+        // execvpe so checkers like valgrind resolve through PATH; program paths contain a '/'
+        execvpe(spec->exe_path, spec->argv ? spec->argv : default_argv, spec->envp ? spec->envp : environ);
+        // If execvpe returns, it must have failed
+        perror("execvpe failed");
+        _exit(EXEC_FAILURE_EXIT_CODE); // Not exit(): atexit cleanup would delete the parent's temp dir
+    } else { // Parent process
+        close(stdin_pipe[0]);
+        close(stdout_pipe[1]);
+
+        // Input is fed from the poll loop, interleaved with draining output
+        fcntl(stdin_pipe[1], F_SETFL, fcntl(stdin_pipe[1], F_GETFL) | O_NONBLOCK);
+
+        int status = 0;
+        struct rusage rusage = {0};
+        double exit_time = 0.0;
+        static const ByteString no_input = { .len = 0, .data = "", .mapped = 0 };
+        if (spec->stdin_path) input = &no_input; // The child reads the file itself
+        int rc = supervise_child(pid, stdin_pipe[1], input, stdout_pipe[0], capture, NULL,
+                                 spec->timeout_ms, &status, &rusage, &exit_time);
+        close(stdout_pipe[0]);
+        fill_child_usage(usage, status, &rusage, exit_time - start);
+
+        if (rc != 0) return -1; // Timeout or output limit
+        if (WIFEXITED(status) && WEXITSTATUS(status) == 0) return 0;
+        return -1; // Child crashed or exited with error
+    }
+}
+
+/**
+ * @brief Fills usage (if not NULL) from a reaped child's wait status and rusage.
+ */
+void fill_child_usage(ChildUsage *usage, int status, const struct rusage *rusage, double wall_time_ms) {
+    if (!usage) return;
+    usage->wall_time_ms = wall_time_ms;
+    usage->user_cpu_ms = rusage->ru_utime.tv_sec * 1000.0 + rusage->ru_utime.tv_usec / 1000.0;
+    usage->sys_cpu_ms = rusage->ru_stime.tv_sec * 1000.0 + rusage->ru_stime.tv_usec / 1000.0;
+    usage->max_rss_kb = rusage->ru_maxrss;
+    usage->exit_code = WIFEXITED(status) ? WEXITSTATUS(status) : -1;
+    usage->signal = WIFSIGNALED(status) ? WTERMSIG(status) : 0;
+}
+
+/**
+ * @brief Event-driven supervision of a running child.
+ *
+ * Sleeps in poll() on the child's pidfd, its stdin and stdout pipes and a
+ * timerfd deadline, so the parent wakes only when something happens.
+ * Input is written in chunks as the pipe has room and in_fd is closed once
+ * it is all sent (or the child stops reading); output is drained into the
+ * capture meanwhile, so neither side can deadlock on a full pipe. A child
+ * that writes more than output_limit_bytes is killed. Falls back to 10ms
+ * waitpid polling on kernels without pidfd support.
+ *
+ * Takes ownership of in_fd, which must be non-blocking.
+ *
+ * The child is reaped with wait4() so rusage receives its resource usage.
+ * A fork-server copy is not our child: with a server, its exit is signalled
+ * by the server's report on the control socket, which carries the same data.
+ *
+ * @return 0 once the child has exited (status filled in), -1 if the
+ *         deadline passed or the output limit was hit and the child was killed.
+ */
+int supervise_child(pid_t pid, int in_fd, const ByteString *input, int out_fd, OutputCapture *capture,
+                    ForkServer *server, int timeout_ms, int *status, struct rusage *rusage, double *exit_time_ms) {
+    int pid_fd = server ? server->sock : pidfd_open_compat(pid);
+    int timer_fd = timerfd_create(CLOCK_MONOTONIC, TFD_CLOEXEC);
+    if (timer_fd >= 0) {
+        struct itimerspec deadline = {0};
+        deadline.it_value.tv_sec = timeout_ms / 1000;
+        deadline.it_value.tv_nsec = (long)(timeout_ms % 1000) * 1000000L;
+        timerfd_settime(timer_fd, 0, &deadline, NULL);
+    }
+    double deadline_ms = monotonic_ms() + timeout_ms;
+
+    size_t sent = 0;
+    int in_open = 1;
+    if (input->len == 0) { // Immediate EOF
+        close(in_fd);
+        in_open = 0;
+    }
+    int out_open = 1;
+    int rc = -1;
+    capture->used = 0;
+    capture->total = 0;
+    capture->limit_exceeded = 0;
+    capture->data[0] = '\0';
+    *exit_time_ms = 0.0;
+
+    for (;;) {
+        struct pollfd fds[4];
+        int nfds = 0, pid_idx = -1, in_idx = -1, out_idx = -1, timer_idx = -1;
+        if (pid_fd >= 0) { pid_idx = nfds; fds[nfds++] = (struct pollfd){ .fd = pid_fd, .events = POLLIN }; }
+        if (in_open) { in_idx = nfds; fds[nfds++] = (struct pollfd){ .fd = in_fd, .events = POLLOUT }; }
+        if (out_open) { out_idx = nfds; fds[nfds++] = (struct pollfd){ .fd = out_fd, .events = POLLIN }; }
+        if (timer_fd >= 0) { timer_idx = nfds; fds[nfds++] = (struct pollfd){ .fd = timer_fd, .events = POLLIN }; }
+
+        // Without pidfd the child's exit is not pollable, so wake every 10ms to check
+        int ready = poll(fds, nfds, (pid_fd >= 0 && timer_fd >= 0) ? -1 : 10);
+        if (ready < 0 && errno != EINTR) {
+            perror("poll failed");
+            break;
+        }
+
+        if (in_idx >= 0 && ready > 0 && (fds[in_idx].revents & (POLLOUT | POLLERR | POLLHUP))) {
+            if (!feed_input(in_fd, input, &sent)) {
+                close(in_fd); // EOF for the child
+                in_open = 0;
+            }
+        }
+
+        if (out_idx >= 0 && ready > 0 && (fds[out_idx].revents & (POLLIN | POLLHUP))) {
+            if (drain_output(out_fd, capture) == 0) out_open = 0;
+            // Stop as soon as the verdict is known: too much output, or output already wrong
+            int wrong_answer = capture->comparator && capture->comparator->mismatch;
+            if (capture->total > output_limit_bytes || wrong_answer) {
+                capture->limit_exceeded = !wrong_answer;
+                kill(pid, SIGKILL);
+                reap_child(pid, server, status, rusage, 1);
+                *exit_time_ms = monotonic_ms();
+                break;
+            }
+        }
+
+        int exited = 0;
+        if (pid_fd < 0 || (ready > 0 && (fds[pid_idx].revents & (POLLIN | POLLHUP)))) {
+            exited = reap_child(pid, server, status, rusage, 0);
+        }
+        if (exited) {
+            *exit_time_ms = monotonic_ms();
+            // Everything the child wrote is already in the pipe; grandchildren may hold it open
+            fcntl(out_fd, F_SETFL, fcntl(out_fd, F_GETFL) | O_NONBLOCK);
+            while (out_open && capture->total <= output_limit_bytes &&
+                   !(capture->comparator && capture->comparator->mismatch) &&
+                   drain_output(out_fd, capture) > 0) {}
+            capture->limit_exceeded = (capture->total > output_limit_bytes);
+            rc = 0;
+            break;
+        }
+
+        int deadline_hit = (timer_fd >= 0)
+            ? (ready > 0 && (fds[timer_idx].revents & POLLIN))
+            : (monotonic_ms() >= deadline_ms);
+        if (deadline_hit) {
+            kill(pid, SIGKILL);
+            reap_child(pid, server, status, rusage, 1);
+            *exit_time_ms = monotonic_ms();
+            break;
+        }
     }
 
-    pid = fork();
-    if (pid == -1) {
-        perror("fork failed");
+    if (rc != 0 && *exit_time_ms == 0.0) {
+        // poll() failed: make sure the child does not outlive us
+        kill(pid, SIGKILL);
+        reap_child(pid, server, status, rusage, 1);
+        *exit_time_ms = monotonic_ms();
+    }
+    if (in_open) close(in_fd);
+    if (pid_fd >= 0 && !server) close(pid_fd);
+    if (timer_fd >= 0) close(timer_fd);
+    return rc;
+}
+
+/**
+ * @brief Writes the next chunk of input the pipe has room for.
+ * @return 1 while input remains, 0 once it is all sent or the child closed its stdin.
+ */
+int feed_input(int fd, const ByteString *input, size_t *sent) {
+    size_t chunk = input->len - *sent;
+    if (chunk > INPUT_CHUNK_SIZE) chunk = INPUT_CHUNK_SIZE;
+
+    ssize_t n = write(fd, input->data + *sent, chunk);
+    if (n > 0) {
+        *sent += (size_t)n;
+        return *sent < input->len;
+    }
+    if (n < 0 && (errno == EAGAIN || errno == EINTR)) return 1;
+    return 0; // EPIPE: the program is entitled to stop reading early
+}
+
+/**
+ * @brief Reads whatever is available on fd into the capture.
+ * Every byte is fed to the capture's comparator; bytes past the capture's
+ * capacity are counted in total but not kept.
+ * @return bytes read, 0 at EOF, -1 if nothing was available.
+ */
+ssize_t drain_output(int fd, OutputCapture *capture) {
+    char chunk[65536];
+    ssize_t n = read(fd, chunk, sizeof(chunk));
+    if (n <= 0) return n;
+
+    if (capture->used < capture->capacity) {
+        size_t keep = (size_t)n;
+        if (keep > capture->capacity - capture->used) keep = capture->capacity - capture->used;
+        memcpy(capture->data + capture->used, chunk, keep);
+        capture->used += keep;
+        capture->data[capture->used] = '\0';
+    }
+    if (capture->comparator) comparator_feed(capture->comparator, chunk, (size_t)n);
+    capture->total += (size_t)n;
+    return n;
+}
+
+/**
+ * @brief pidfd_open(2) via syscall(); returns -1 where the kernel lacks it.
+ */
+int pidfd_open_compat(pid_t pid) {
+    return (int)syscall(SYS_pidfd_open, pid, 0);
+}
+
+/**
+ * @brief Waits up to timeout_ms for the child to exit, sleeping on its pidfd.
+ * @return 0 if it exited (status filled in), -1 on timeout.
+ */
+int wait_for_exit(pid_t pid, int timeout_ms, int *status) {
+    int pid_fd = pidfd_open_compat(pid);
+    if (pid_fd >= 0) {
+        struct pollfd pfd = { .fd = pid_fd, .events = POLLIN };
+        double deadline = monotonic_ms() + timeout_ms;
+        int ready;
+        do {
+            int remaining = (int)(deadline - monotonic_ms());
+            ready = poll(&pfd, 1, remaining > 0 ? remaining : 0);
+        } while (ready < 0 && errno == EINTR);
+        close(pid_fd);
+        if (ready > 0) {
+            waitpid(pid, status, 0);
+            return 0;
+        }
         return -1;
     }
 
-    if (pid == 0) { // Child process
-        close(stdin_pipe[1]);
-        close(stdout_pipe[0]);
-        dup2(stdin_pipe[0], STDIN_FILENO);
-        dup2(stdout_pipe[1], STDOUT_FILENO);
-        dup2(stdout_pipe[1], STDERR_FILENO); // Redirect stderr to stdout pipe
-        close(stdin_pipe[0]);
-        close(stdout_pipe[1]);
+    long start = current_time_ms();
+    while (current_time_ms() - start < timeout_ms) {
+        if (waitpid(pid, status, WNOHANG) == pid) return 0;
+        usleep(10000);
+    }
+    return -1;
+}
 
-        set_child_resource_limits();
-        
-        execl(executable_path, executable_path, (char *)NULL);
-        // If execl returns, it must have failed
-        perror("execl failed");
-        exit(EXEC_FAILURE_EXIT_CODE);
-    } else { // Parent process
-        close(stdin_pipe[0]);
-        close(stdout_pipe[1]);
+/**
+ * @brief Starts memory analysis on a background thread so it overlaps the correctness tests.
+ * Analyzes every test, or memory_sample tests spread evenly over the suite.
+ */
+void start_memory_analysis(const char *source_filename) {
+    memory_analysis.backend = memory_backend;
+    int count = test_suite.num_tests;
+    if (memory_sample > 0 && memory_sample < count) count = memory_sample;
+
+    memory_analysis.reports = calloc(count > 0 ? count : 1, sizeof(MemoryTestReport));
+    if (!memory_analysis.reports) {
+        perror("calloc for memory reports failed");
+        return;
+    }
+    for (int k = 0; k < count; k++) {
+        memory_analysis.reports[k].test_index = (int)((long long)k * test_suite.num_tests / count);
+    }
+    memory_analysis.num_reports = count;
 
-        // Write input to child's stdin
-        write(stdin_pipe[1], input, strlen(input));
-        close(stdin_pipe[1]);
+    if (pthread_create(&memory_thread, NULL, memory_analysis_worker, (void *)source_filename) == 0) {
+        memory_thread_started = 1;
+    } else {
+        perror("pthread_create (memory analysis) failed");
+    }
+}
 
-        long start = current_time_ms();
-        int status;
-        ssize_t bytes_read = 0;
-
-        // Non-blocking wait with timeout
-        while (current_time_ms() - start < TIMEOUT_SECONDS * 1000) {
-            if (waitpid(pid, &status, WNOHANG) == pid) {
-                // Child terminated
-                if (WIFEXITED(status) && WEXITSTATUS(status) == 0) {
-                    bytes_read = read(stdout_pipe[0], output_buffer, buffer_size - 1);
-                    if(bytes_read >= 0) output_buffer[bytes_read] = '\0';
-                    close(stdout_pipe[0]);
-                    return 0;
-                }
-                close(stdout_pipe[0]);
-                return -1; // Child crashed or exited with error
-            }
-            usleep(10000); // Sleep for 10ms
+void *memory_analysis_worker(void *arg) {
+    const char *source_filename = (const char *)arg;
+
+    if (memory_analysis.backend == MEMORY_BACKEND_SANITIZER) {
+        char log_path[512], key[65];
+        int hit;
+        snprintf(sanitizer_exe_path, sizeof(sanitizer_exe_path), "%s/user_program_sanitized", temp_dir_path);
+        snprintf(log_path, sizeof(log_path), "%s/compile_sanitized.log", temp_dir_path);
+        if (compile_with_cache(source_filename, SANITIZER_FLAGS, sanitizer_exe_path, log_path, &hit, key) != 0) {
+            fprintf(stderr, "⚠️  Sanitizer build failed (see compile_sanitized.log); falling back to Valgrind\n");
+            memory_analysis.backend = MEMORY_BACKEND_VALGRIND;
         }
+    }
 
-        // Timeout occurred
-        kill(pid, SIGKILL);
-        waitpid(pid, &status, 0);
-        close(stdout_pipe[0]);
-        return -1;
+    char log_dir[512];
+    snprintf(log_dir, sizeof(log_dir), "%s/memory_logs", temp_dir_path);
+    if (mkdir(log_dir, 0700) != 0 && errno != EEXIST) {
+        perror("mkdir (memory logs)");
+        return NULL;
     }
+
+    run_parallel(memory_analysis.num_reports, memory_jobs, run_memory_test, NULL);
+    return NULL;
+}
+
+/**
+ * @brief Runs the k-th sampled test under the selected checker.
+ */
+void run_memory_test(int k, void *arg) {
+    (void)arg;
+    MemoryTestReport *report = &memory_analysis.reports[k];
+    int rc = (memory_analysis.backend == MEMORY_BACKEND_SANITIZER)
+        ? run_sanitizer_test(report->test_index, &report->findings)
+        : run_valgrind_test(report->test_index, &report->findings);
+    report->analyzed = (rc == 0);
 }
 
 /**
- * @brief Analyzes memory usage by running the program with Valgrind.
+ * @brief Waits for the background memory analysis and scores its findings.
  * @return A score from 0 to 100.
  */
 float analyze_memory(void) {
-    if (test_suite.num_tests == 0) return 100.0f;
+    if (memory_thread_started) {
+        pthread_join(memory_thread, NULL);
+        memory_thread_started = 0;
+    }
 
-    char command[1024];
-    // Use the first test case for memory analysis
-    snprintf(command, sizeof(command), "echo \"%s\" | valgrind --tool=memcheck --leak-check=full --log-file=%s %s",
-             test_suite.tests[0].input, VALGRIND_LOG_PATH, executable_path);
-    
-    system(command);
+    for (int k = 0; k < memory_analysis.num_reports; k++) {
+        const MemoryTestReport *report = &memory_analysis.reports[k];
+        if (!report->analyzed) continue;
+        memory_analysis.tests_analyzed++;
+        add_memory_findings(&memory_analysis.totals, &report->findings);
+    }
 
-    FILE *log_file = fopen(VALGRIND_LOG_PATH, "r");
-    if (!log_file) {
-        fprintf(stderr, "Could not open valgrind log file.\n");
-        return 0.0f;
+    if (memory_analysis.num_reports == 0) return 100.0f;
+    // No report at all (e.g. valgrind missing) is no evidence of clean memory
+    if (memory_analysis.tests_analyzed == 0) return 0.0f;
+    return score_memory_findings(&memory_analysis.totals);
+}
+
+void add_memory_findings(MemoryFindings *into, const MemoryFindings *from) {
+    into->leaked_bytes += from->leaked_bytes;
+    into->indirect_leaked_bytes += from->indirect_leaked_bytes;
+    into->overflows += from->overflows;
+    into->use_after_free += from->use_after_free;
+    into->undefined_behavior += from->undefined_behavior;
+    into->other_errors += from->other_errors;
+}
+
+/**
+ * @brief Runs test i under the sanitizers and parses its report.
+ * @return 0 if a report was produced, -1 otherwise.
+ */
+int run_sanitizer_test(int i, MemoryFindings *findings) {
+    char log_path[600];
+    snprintf(log_path, sizeof(log_path), "%s/memory_logs/test_%d.log", temp_dir_path, i);
+
+    char **envp = build_sanitizer_env();
+    if (!envp) {
+        perror("malloc for sanitizer environment failed");
+        return -1;
     }
 
-    char line[512];
-    int definitely_lost = 0;
-    while (fgets(line, sizeof(line), log_file)) {
-        if (strstr(line, "definitely lost:")) {
-            sscanf(line, "==%*d== definitely lost: %d bytes in %*d blocks", &definitely_lost);
-            break;
+    // Output is not judged here; a small buffer is enough for the supervisor
+    char discard[256];
+    OutputCapture capture = { .data = discard, .capacity = sizeof(discard) - 1 };
+    // Reports go to the child's stderr: UBSan ignores log_path when linked with ASan
+    ChildSpec spec = {
+        .exe_path = sanitizer_exe_path,
+        .argv = NULL,
+        .envp = envp,
+        .limit_address_space = 0, // ASan reserves terabytes of shadow memory
+        .cpu_limit_s = CPU_TIME_LIMIT_S * SANITIZER_SLOWDOWN,
+        .timeout_ms = TIMEOUT_SECONDS * 1000 * SANITIZER_SLOWDOWN,
+        .stdin_path = NULL,
+        .stderr_path = log_path
+    };
+    run_child_process(&spec, &test_suite.tests[i].input, &capture, NULL);
+    free(envp);
+
+    return parse_sanitizer_log(log_path, i, findings);
+}
+
+/**
+ * @brief Runs test i under valgrind memcheck and parses its report.
+ * @return 0 if valgrind produced a complete report, -1 otherwise.
+ */
+int run_valgrind_test(int i, MemoryFindings *findings) {
+    char log_path[600], log_arg[640];
+    snprintf(log_path, sizeof(log_path), "%s/memory_logs/test_%d.log", temp_dir_path, i);
+    snprintf(log_arg, sizeof(log_arg), "--log-file=%s", log_path);
+    char *argv[] = { "valgrind", "--tool=memcheck", "--leak-check=full", log_arg, executable_path, NULL };
+
+    char discard[256];
+    OutputCapture capture = { .data = discard, .capacity = sizeof(discard) - 1 };
+    ChildSpec spec = {
+        .exe_path = "valgrind",
+        .argv = argv,
+        .envp = NULL,
+        .limit_address_space = 0, // Valgrind maps its own large arena
+        .cpu_limit_s = CPU_TIME_LIMIT_S * VALGRIND_SLOWDOWN,
+        .timeout_ms = TIMEOUT_SECONDS * 1000 * VALGRIND_SLOWDOWN,
+        .stdin_path = NULL,
+        .stderr_path = "/dev/null"
+    };
+    run_child_process(&spec, &test_suite.tests[i].input, &capture, NULL);
+
+    return parse_valgrind_log(log_path, i, findings);
+}
+
+/**
+ * @brief Copy of the environment with our sanitizer options in place of any inherited ones.
+ * Only the array is allocated; the strings are borrowed.
+ */
+char **build_sanitizer_env(void) {
+    size_t count = 0;
+    while (environ[count]) count++;
+
+    char **envp = calloc(count + 3, sizeof(char *));
+    if (!envp) return NULL;
+    // symbolize=0: the report kinds are what gets scored, and symbolizing is slow
+    envp[0] = "ASAN_OPTIONS=detect_leaks=1:symbolize=0";
+    envp[1] = "UBSAN_OPTIONS=print_stacktrace=0";
+
+    size_t k = 2;
+    for (size_t j = 0; j < count; j++) {
+        if (strncmp(environ[j], "ASAN_OPTIONS=", 13) == 0 || strncmp(environ[j], "UBSAN_OPTIONS=", 14) == 0) continue;
+        envp[k++] = environ[j];
+    }
+    return envp;
+}
+
+/**
+ * @brief Parses one ASan/LSan/UBSan report file into findings.
+ * @return 0 if the report could be read, -1 otherwise.
+ */
+int parse_sanitizer_log(const char *path, int test_index, MemoryFindings *findings) {
+    FILE *f = fopen(path, "r");
+    if (!f) return -1;
+
+    char line[1024];
+    long leaked_before = findings->leaked_bytes;
+    while (fgets(line, sizeof(line), f)) {
+        line[strcspn(line, "\n")] = '\0';
+        const char *asan = strstr(line, "ERROR: AddressSanitizer: ");
+        const char *ub = strstr(line, "runtime error: ");
+        long bytes;
+
+        if (asan) {
+            char kind[64] = "";
+            sscanf(asan + strlen("ERROR: AddressSanitizer: "), "%63s", kind);
+            if (strstr(kind, "overflow") || strstr(kind, "underflow")) {
+                findings->overflows++;
+            } else if (strstr(kind, "use-after") || strstr(kind, "double-free")) {
+                findings->use_after_free++;
+            } else {
+                findings->other_errors++;
+            }
+            record_memory_detail(test_index, kind, "");
+        } else if (sscanf(line, "Direct leak of %ld byte", &bytes) == 1) {
+            findings->leaked_bytes += bytes;
+        } else if (sscanf(line, "Indirect leak of %ld byte", &bytes) == 1) {
+            findings->indirect_leaked_bytes += bytes;
+        } else if (ub) {
+            findings->undefined_behavior++;
+            record_memory_detail(test_index, "undefined-behavior", line);
         }
     }
-    fclose(log_file);
-    remove(VALGRIND_LOG_PATH);
+    fclose(f);
+
+    if (findings->leaked_bytes > leaked_before) {
+        char detail[64];
+        snprintf(detail, sizeof(detail), "%ld bytes directly leaked", findings->leaked_bytes - leaked_before);
+        record_memory_detail(test_index, "memory-leak", detail);
+    }
+    return 0;
+}
+
+/**
+ * @brief Keeps the first MAX_MEMORY_DETAILS findings verbatim for the results JSON.
+ */
+void record_memory_detail(int test_index, const char *kind, const char *detail) {
+    pthread_mutex_lock(&memory_analysis.lock);
+    if (memory_analysis.num_details < MAX_MEMORY_DETAILS) {
+        snprintf(memory_analysis.details[memory_analysis.num_details], sizeof(memory_analysis.details[0]),
+                 "Test %d: %s%s%s", test_index + 1, kind, detail[0] ? ": " : "", detail);
+        memory_analysis.num_details++;
+    }
+    pthread_mutex_unlock(&memory_analysis.lock);
+}
 
-    if (definitely_lost == 0) {
+/**
+ * @brief Maps leaked bytes onto the memory score.
+ */
+float leak_score(long leaked_bytes) {
+    if (leaked_bytes == 0) {
         return 100.0f;
-    } else if (definitely_lost < 100) {
+    } else if (leaked_bytes < 100) {
         return 75.0f;
-    } else if (definitely_lost < 1024) {
+    } else if (leaked_bytes < 1024) {
         return 25.0f;
     }
     return 0.0f;
 }
 
+/**
+ * @brief Memory score from findings: leaks set the base, UB caps it, corruption zeroes it.
+ */
+float score_memory_findings(const MemoryFindings *findings) {
+    if (findings->overflows > 0 || findings->use_after_free > 0 || findings->other_errors > 0) {
+        return 0.0f;
+    }
+    float score = leak_score(findings->leaked_bytes);
+    if (findings->undefined_behavior > 0 && score > 50.0f) score = 50.0f;
+    return score;
+}
+
+/**
+ * @brief Parses one valgrind memcheck log into findings.
+ * @return 0 if the log is complete (has its ERROR SUMMARY), -1 otherwise.
+ */
+int parse_valgrind_log(const char *path, int test_index, MemoryFindings *findings) {
+    FILE *f = fopen(path, "r");
+    if (!f) return -1;
+
+    char line[1024];
+    int complete = 0, pending_access = 0;
+    while (fgets(line, sizeof(line), f)) {
+        line[strcspn(line, "\n")] = '\0';
+        // Strip the "==pid==" prefix and indentation
+        const char *body = strstr(line, "== ");
+        body = body ? body + 3 : line;
+        while (*body == ' ') body++;
+        const char *summary;
+
+        if ((summary = strstr(body, "definitely lost:")) != NULL) {
+            findings->leaked_bytes += valgrind_byte_count(summary + strlen("definitely lost:"));
+        } else if ((summary = strstr(body, "indirectly lost:")) != NULL) {
+            findings->indirect_leaked_bytes += valgrind_byte_count(summary + strlen("indirectly lost:"));
+        } else if (strncmp(body, "Invalid read", 12) == 0 || strncmp(body, "Invalid write", 13) == 0) {
+            pending_access = 1; // Classified by the "Address ..." line that follows
+        } else if (pending_access && strncmp(body, "Address 0x", 10) == 0) {
+            pending_access = 0;
+            if (strstr(body, "free'd") && strstr(body, "inside a block")) {
+                findings->use_after_free++;
+                record_memory_detail(test_index, "use-after-free", "");
+            } else if (strstr(body, "not stack'd")) {
+                findings->other_errors++;
+                record_memory_detail(test_index, "invalid-access", "");
+            } else {
+                findings->overflows++;
+                record_memory_detail(test_index, "buffer-overflow", "");
+            }
+        } else if (strncmp(body, "Invalid free", 12) == 0 || strncmp(body, "Mismatched free", 15) == 0) {
+            findings->use_after_free++;
+            record_memory_detail(test_index, "invalid-free", "");
+        } else if (strstr(body, "depends on uninitialised") || strncmp(body, "Use of uninitialised", 20) == 0) {
+            findings->undefined_behavior++;
+            record_memory_detail(test_index, "uninitialised-value", "");
+        } else if (strncmp(body, "ERROR SUMMARY:", 14) == 0) {
+            complete = 1;
+        }
+    }
+    fclose(f);
+
+    if (findings->leaked_bytes > 0) {
+        char detail[64];
+        snprintf(detail, sizeof(detail), "%ld bytes definitely lost", findings->leaked_bytes);
+        record_memory_detail(test_index, "memory-leak", detail);
+    }
+    return complete ? 0 : -1;
+}
+
+/**
+ * @brief Parses a valgrind byte count, which groups thousands with commas ("1,024 bytes").
+ */
+long valgrind_byte_count(const char *text) {
+    char digits[64];
+    size_t n = 0;
+    for (const char *c = text; *c && *c != 'b' && n < sizeof(digits) - 1; c++) {
+        if (isdigit((unsigned char)*c)) digits[n++] = *c;
+    }
+    digits[n] = '\0';
+    return atol(digits);
+}
+
 /**
  * @brief Checks if the program handles signals gracefully.
  * @return A score from 0 to 100.
@@ -571,8 +2802,9 @@ float check_robustness(void) {
 
     if (pid == 0) { // Child process
         // Run the program with no input, it should just wait or exit
+        signal(SIGPIPE, SIG_DFL);
         execl(executable_path, executable_path, (char *)NULL);
-        exit(EXEC_FAILURE_EXIT_CODE);
+        _exit(EXEC_FAILURE_EXIT_CODE); // Not exit(): atexit cleanup would delete the parent's temp dir
     } else { // Parent process
         int status;
         usleep(ROBUSTNESS_SIGINT_WAIT_US); // Wait a bit before sending signal
@@ -580,12 +2812,8 @@ float check_robustness(void) {
         kill(pid, SIGINT); // Send interrupt signal
 
         // Check if the process terminates quickly after the signal
-        long start = current_time_ms();
-        while (current_time_ms() - start < 1000) { // 1 second timeout for graceful exit
-            if (waitpid(pid, &status, WNOHANG) == pid) {
-                return 100.0f; // Terminated gracefully
-            }
-            usleep(10000);
+        if (wait_for_exit(pid, 1000, &status) == 0) { // 1 second timeout for graceful exit
+            return 100.0f; // Terminated gracefully
         }
 
         // If it's still running, it didn't handle the signal well
@@ -606,3 +2834,540 @@ void trim_trailing_whitespace(char *str) {
     }
     str[len] = '\0';
 }
+
+// --- Fork Server ---
+
+/*
+ * Preloaded into the user program when -F is given. Its constructor runs
+ * after the dynamic loader and libc have initialised, says hello on the
+ * control socket, then forks one pre-initialised copy per request. Each
+ * request carries the test's stdin/stdout pipe ends (SCM_RIGHTS); the
+ * copy installs them, applies the CPU limit and returns into main().
+ * The server replies with the copy's pid, then its wait status and rusage.
+ */
+static const char forkserver_stub_source[] =
+    "#define _GNU_SOURCE\n"
+    "#include <stdlib.h>\n"
+    "#include <string.h>\n"
+    "#include <unistd.h>\n"
+    "#include <signal.h>\n"
+    "#include <sys/socket.h>\n"
+    "#include <sys/wait.h>\n"
+    "#include <sys/resource.h>\n"
+    "struct result { int status; struct rusage usage; };\n"
+    "static int recv_fds(int sock, int fds[2]) {\n"
+    "    char byte;\n"
+    "    struct iovec iov = { &byte, 1 };\n"
+    "    union { char buf[CMSG_SPACE(2 * sizeof(int))]; struct cmsghdr align; } control;\n"
+    "    struct msghdr msg = { .msg_iov = &iov, .msg_iovlen = 1,\n"
+    "                          .msg_control = control.buf, .msg_controllen = sizeof(control.buf) };\n"
+    "    if (recvmsg(sock, &msg, 0) <= 0) return -1;\n"
+    "    struct cmsghdr *c = CMSG_FIRSTHDR(&msg);\n"
+    "    if (!c || c->cmsg_type != SCM_RIGHTS || c->cmsg_len != CMSG_LEN(2 * sizeof(int))) return -1;\n"
+    "    memcpy(fds, CMSG_DATA(c), 2 * sizeof(int));\n"
+    "    return 0;\n"
+    "}\n"
+    "__attribute__((constructor)) static void eval_forkserver(void) {\n"
+    "    const char *fd_env = getenv(\"EVAL_FORKSERVER_FD\");\n"
+    "    const char *cpu_env = getenv(\"EVAL_FORKSERVER_CPU\");\n"
+    "    if (!fd_env || !cpu_env) return;\n"
+    "    int sock = atoi(fd_env);\n"
+    "    rlim_t cpu = (rlim_t)atol(cpu_env);\n"
+    "    unsetenv(\"EVAL_FORKSERVER_FD\");\n"
+    "    unsetenv(\"EVAL_FORKSERVER_CPU\");\n"
+    "    unsetenv(\"LD_PRELOAD\");\n"
+    "    pid_t self = getpid();\n"
+    "    if (write(sock, &self, sizeof(self)) != sizeof(self)) _exit(1);\n"
+    "    for (;;) {\n"
+    "        int fds[2];\n"
+    "        if (recv_fds(sock, fds) != 0) _exit(0);\n"
+    "        pid_t pid = fork();\n"
+    "        if (pid == 0) {\n"
+    "            close(sock);\n"
+    "            dup2(fds[0], 0);\n"
+    "            dup2(fds[1], 1);\n"
+    "            dup2(fds[1], 2);\n"
+    "            close(fds[0]);\n"
+    "            close(fds[1]);\n"
+    "            struct rlimit limit = { cpu, cpu };\n"
+    "            setrlimit(RLIMIT_CPU, &limit);\n"
+    "            return;\n"
+    "        }\n"
+    "        close(fds[0]);\n"
+    "        close(fds[1]);\n"
+    "        if (write(sock, &pid, sizeof(pid)) != sizeof(pid)) _exit(1);\n"
+    "        if (pid < 0) continue;\n"
+    "        struct result result;\n"
+    "        memset(&result, 0, sizeof(result));\n"
+    "        while (wait4(pid, &result.status, 0, &result.usage) < 0) {}\n"
+    "        if (write(sock, &result, sizeof(result)) != sizeof(result)) _exit(1);\n"
+    "    }\n"
+    "}\n";
+
+/**
+ * @brief Builds the fork-server stub as a shared object for LD_PRELOAD.
+ * The stub never changes, so after the first run it comes from the compile cache.
+ * @return 0 on success, -1 if the stub cannot be built (fork-server mode is then disabled).
+ */
+int build_fork_server_stub(void) {
+    char source_path[512], log_path[512], key[65];
+    int hit;
+    snprintf(source_path, sizeof(source_path), "%s/forkserver_stub.c", temp_dir_path);
+    snprintf(fork_server_stub_path, sizeof(fork_server_stub_path), "%s/forkserver_stub.so", temp_dir_path);
+    snprintf(log_path, sizeof(log_path), "%s/forkserver_stub.log", temp_dir_path);
+
+    FILE *f = fopen(source_path, "w");
+    if (!f) {
+        perror("fopen (fork-server stub)");
+        return -1;
+    }
+    fputs(forkserver_stub_source, f);
+    fclose(f);
+
+    if (compile_with_cache(source_path, "-shared -fPIC -O2", fork_server_stub_path, log_path, &hit, key) != 0) {
+        print_file(log_path, stderr);
+        return -1;
+    }
+    return 0;
+}
+
+/**
+ * @brief Starts a fork server: the user program with the stub preloaded, under the usual limits.
+ * @return The server, or NULL if it could not be started or never said hello.
+ */
+ForkServer *fork_server_start(void) {
+    int sv[2];
+    if (socketpair(AF_UNIX, SOCK_SEQPACKET | SOCK_CLOEXEC, 0, sv) != 0) {
+        perror("socketpair (fork server) failed");
+        return NULL;
+    }
+
+    // Built before fork(): other worker threads may hold the malloc lock
+    char preload[600], fd_var[64], cpu_var[64];
+    snprintf(preload, sizeof(preload), "LD_PRELOAD=%s", fork_server_stub_path);
+    snprintf(fd_var, sizeof(fd_var), "EVAL_FORKSERVER_FD=%d", FORK_SERVER_FD);
+    snprintf(cpu_var, sizeof(cpu_var), "EVAL_FORKSERVER_CPU=%d", CPU_TIME_LIMIT_S);
+    size_t count = 0;
+    while (environ[count]) count++;
+    char **envp = calloc(count + 4, sizeof(char *));
+    if (!envp) {
+        close(sv[0]);
+        close(sv[1]);
+        return NULL;
+    }
+    envp[0] = preload;
+    envp[1] = fd_var;
+    envp[2] = cpu_var;
+    size_t k = 3;
+    for (size_t j = 0; j < count; j++) {
+        if (strncmp(environ[j], "LD_PRELOAD=", 11) == 0) continue;
+        envp[k++] = environ[j];
+    }
+
+    pid_t pid = fork();
+    if (pid == -1) {
+        perror("fork (fork server) failed");
+        free(envp);
+        close(sv[0]);
+        close(sv[1]);
+        return NULL;
+    }
+
+    if (pid == 0) { // Server process
+        dup2(sv[1], FORK_SERVER_FD); // dup2 clears close-on-exec
+        int null_fd = open("/dev/null", O_RDWR);
+        dup2(null_fd, STDIN_FILENO);
+        dup2(null_fd, STDOUT_FILENO);
+        if (null_fd > STDERR_FILENO) close(null_fd);
+
+        // The address-space limit is inherited by every copy; the CPU limit is
+        // applied per copy by the stub, since the server itself keeps running
+        set_child_resource_limits(1, 0);
+        signal(SIGPIPE, SIG_DFL);
+
+        char *argv[] = { executable_path, NULL };
+        execve(executable_path, argv, envp);
+        _exit(EXEC_FAILURE_EXIT_CODE); // Not exit(): atexit cleanup would delete the parent's temp dir
+    }
+
+    free(envp);
+    close(sv[1]);
+    ForkServer *server = calloc(1, sizeof(ForkServer));
+    pid_t hello = 0;
+    struct pollfd ready = { .fd = sv[0], .events = POLLIN };
+    // A static binary ignores LD_PRELOAD and just runs main(): no hello, so no fork server
+    if (!server || poll(&ready, 1, FORK_SERVER_HELLO_MS) != 1 ||
+        recv(sv[0], &hello, sizeof(hello), 0) != sizeof(hello) || hello != pid) {
+        free(server);
+        close(sv[0]);
+        kill(pid, SIGKILL);
+        waitpid(pid, NULL, 0);
+        return NULL;
+    }
+    server->pid = pid;
+    server->sock = sv[0];
+
+    pthread_mutex_lock(&fork_servers_lock);
+    server->next = fork_servers;
+    fork_servers = server;
+    pthread_mutex_unlock(&fork_servers_lock);
+    return server;
+}
+
+/**
+ * @brief The calling thread's fork server, started (or restarted after a failure) on demand.
+ * @return NULL once fork-server mode has been given up.
+ */
+ForkServer *fork_server_for_thread(void) {
+    if (fork_server_disabled) return NULL;
+    if (thread_fork_server && !thread_fork_server->broken) return thread_fork_server;
+
+    if (thread_fork_server) { // Broken: retire it; fork_servers_shutdown() frees it
+        kill(thread_fork_server->pid, SIGKILL);
+        thread_fork_server = NULL;
+    }
+    thread_fork_server = fork_server_start();
+    if (!thread_fork_server && !__atomic_exchange_n(&fork_server_disabled, 1, __ATOMIC_RELAXED)) {
+        fprintf(stderr, "⚠️  Fork server did not start (static binary?); using fork+exec per test\n");
+    }
+    return thread_fork_server;
+}
+
+/**
+ * @brief Closes every fork server's control socket (the stub exits on EOF) and reaps it.
+ */
+void fork_servers_shutdown(void) {
+    pthread_mutex_lock(&fork_servers_lock);
+    ForkServer *server = fork_servers;
+    fork_servers = NULL;
+    pthread_mutex_unlock(&fork_servers_lock);
+
+    while (server) {
+        ForkServer *next = server->next;
+        close(server->sock);
+        if (server->broken) kill(server->pid, SIGKILL);
+        waitpid(server->pid, NULL, 0);
+        free(server);
+        server = next;
+    }
+    thread_fork_server = NULL;
+}
+
+/**
+ * @brief Runs one test as a pre-initialised copy from this thread's fork server.
+ * Limits, pipes, output handling and timeouts are the same as run_child_process().
+ * @return 0 on success, -1 on timeout or execution error, -2 if the fork server
+ *         failed before the test started (the caller should fall back to exec).
+ */
+int run_fork_server_process(const ByteString *input, OutputCapture *capture, ChildUsage *usage) {
+    ForkServer *server = fork_server_for_thread();
+    if (!server) return -2;
+
+    int stdin_pipe[2], stdout_pipe[2];
+    if (pipe2(stdin_pipe, O_CLOEXEC) == -1) return -2;
+    if (pipe2(stdout_pipe, O_CLOEXEC) == -1) {
+        close(stdin_pipe[0]);
+        close(stdin_pipe[1]);
+        return -2;
+    }
+
+    double start = monotonic_ms();
+    int sent = send_fds(server->sock, stdin_pipe[0], stdout_pipe[1]);
+    close(stdin_pipe[0]);
+    close(stdout_pipe[1]);
+    pid_t pid = -1;
+    if (sent != 0 || recv(server->sock, &pid, sizeof(pid), 0) != sizeof(pid) || pid <= 0) {
+        server->broken = 1;
+        close(stdin_pipe[1]);
+        close(stdout_pipe[0]);
+        return -2;
+    }
+
+    fcntl(stdin_pipe[1], F_SETFL, fcntl(stdin_pipe[1], F_GETFL) | O_NONBLOCK);
+    int status = 0;
+    struct rusage rusage = {0};
+    double exit_time = 0.0;
+    int rc = supervise_child(pid, stdin_pipe[1], input, stdout_pipe[0], capture, server,
+                             TIMEOUT_SECONDS * 1000, &status, &rusage, &exit_time);
+    close(stdout_pipe[0]);
+    fill_child_usage(usage, status, &rusage, exit_time - start);
+
+    if (rc != 0) return -1; // Timeout or output limit
+    if (WIFEXITED(status) && WEXITSTATUS(status) == 0) return 0;
+    return -1; // Child crashed or exited with error
+}
+
+/**
+ * @brief Sends the two pipe ends a fork-server copy will use as stdin and stdout.
+ */
+int send_fds(int sock, int in_fd, int out_fd) {
+    char byte = 'R';
+    struct iovec iov = { &byte, 1 };
+    union {
+        char buf[CMSG_SPACE(2 * sizeof(int))];
+        struct cmsghdr align;
+    } control;
+    memset(&control, 0, sizeof(control));
+    struct msghdr msg = { .msg_iov = &iov, .msg_iovlen = 1,
+                          .msg_control = control.buf, .msg_controllen = sizeof(control.buf) };
+    struct cmsghdr *cmsg = CMSG_FIRSTHDR(&msg);
+    cmsg->cmsg_level = SOL_SOCKET;
+    cmsg->cmsg_type = SCM_RIGHTS;
+    cmsg->cmsg_len = CMSG_LEN(2 * sizeof(int));
+    int fds[2] = { in_fd, out_fd };
+    memcpy(CMSG_DATA(cmsg), fds, sizeof(fds));
+    return (sendmsg(sock, &msg, MSG_NOSIGNAL) == 1) ? 0 : -1;
+}
+
+/**
+ * @brief Reaps a test child: wait4() for our own children, the server's report for fork-server copies.
+ * @return 1 once reaped, 0 if a non-blocking check found it still running.
+ */
+int reap_child(pid_t pid, ForkServer *server, int *status, struct rusage *rusage, int blocking) {
+    if (!server) return wait4(pid, status, blocking ? 0 : WNOHANG, rusage) == pid;
+
+    if (!blocking) {
+        struct pollfd ready = { .fd = server->sock, .events = POLLIN };
+        if (poll(&ready, 1, 0) != 1) return 0;
+    }
+    ForkServerResult result;
+    if (recv(server->sock, &result, sizeof(result), 0) != sizeof(result)) {
+        // The server died mid-test: make sure the copy does too and report it killed
+        server->broken = 1;
+        kill(pid, SIGKILL);
+        *status = SIGKILL;
+        memset(rusage, 0, sizeof(*rusage));
+        return 1;
+    }
+    *status = result.status;
+    *rusage = result.usage;
+    return 1;
+}
+
+// --- Empirical Complexity ---
+
+/**
+ * @brief Runs the program on inputs of geometrically growing size and fits
+ * growth models to its CPU time and peak memory.
+ *
+ * n doubles from scaling.min_n until a run fails, a run reaches
+ * COMPLEXITY_TARGET_MS of CPU, the total budget is spent or max_n is passed.
+ * Inputs are written to a file the child opens as stdin: the kernel charges a
+ * child's pre-exec address space to its RSS and CPU, so they must not sit in
+ * the evaluator's memory.
+ */
+void estimate_complexity(void) {
+    const ScalingSpec *spec = &test_suite.scaling;
+    double spent_ms = 0.0;
+    char input_path[512];
+    snprintf(input_path, sizeof(input_path), "%s/scaling_input.txt", temp_dir_path);
+    ChildSpec child = {
+        .exe_path = executable_path,
+        .argv = NULL,
+        .envp = NULL,
+        .limit_address_space = 1,
+        .cpu_limit_s = CPU_TIME_LIMIT_S,
+        .timeout_ms = TIMEOUT_SECONDS * 1000,
+        .stdin_path = input_path,
+        .stderr_path = NULL
+    };
+    snprintf(complexity.stopped_reason, sizeof(complexity.stopped_reason), "max_n reached");
+
+    for (long n = spec->min_n; n <= spec->max_n; n *= 2) {
+        if (complexity.num_points == COMPLEXITY_MAX_POINTS) {
+            snprintf(complexity.stopped_reason, sizeof(complexity.stopped_reason), "point limit reached");
+            break;
+        }
+        long input_bytes = build_scaling_input(spec, n, input_path);
+        if (input_bytes < 0) {
+            snprintf(complexity.stopped_reason, sizeof(complexity.stopped_reason), "could not write input at n=%ld", n);
+            break;
+        }
+
+        ComplexityPoint point = { .n = n, .input_bytes = (size_t)input_bytes, .cpu_ms = -1.0, .max_rss_kb = 0 };
+        int failed = 0;
+        for (int rep = 0; rep < COMPLEXITY_REPEATS && !failed; rep++) {
+            char discard[256];
+            OutputCapture capture = { .data = discard, .capacity = sizeof(discard) - 1 };
+            ChildUsage usage = {0};
+            failed = (run_child_process(&child, NULL, &capture, &usage) != 0);
+            double cpu_ms = usage.user_cpu_ms + usage.sys_cpu_ms;
+            spent_ms += cpu_ms;
+            if (point.cpu_ms < 0 || cpu_ms < point.cpu_ms) point.cpu_ms = cpu_ms;
+            if (point.max_rss_kb == 0 || usage.max_rss_kb < point.max_rss_kb) point.max_rss_kb = usage.max_rss_kb;
+            if (cpu_ms >= COMPLEXITY_TARGET_MS) break; // Slow enough that one run is not noise
+        }
+        if (failed) {
+            snprintf(complexity.stopped_reason, sizeof(complexity.stopped_reason),
+                     "run failed, timed out or hit a resource limit at n=%ld", n);
+            break;
+        }
+        complexity.points[complexity.num_points++] = point;
+        if (point.cpu_ms >= COMPLEXITY_TARGET_MS) {
+            snprintf(complexity.stopped_reason, sizeof(complexity.stopped_reason), "time target reached");
+            break;
+        }
+        if (spent_ms >= COMPLEXITY_BUDGET_MS) {
+            snprintf(complexity.stopped_reason, sizeof(complexity.stopped_reason), "CPU budget spent");
+            break;
+        }
+    }
+
+    remove(input_path);
+
+    double n[COMPLEXITY_MAX_POINTS], cpu[COMPLEXITY_MAX_POINTS], rss[COMPLEXITY_MAX_POINTS];
+    for (int i = 0; i < complexity.num_points; i++) {
+        n[i] = (double)complexity.points[i].n;
+        cpu[i] = complexity.points[i].cpu_ms;
+        rss[i] = (double)complexity.points[i].max_rss_kb;
+    }
+    complexity.time_class = fit_growth_model(n, cpu, complexity.num_points, COMPLEXITY_MIN_GROWTH_MS,
+                                             &complexity.time_r2);
+    complexity.space_class = fit_growth_model(n, rss, complexity.num_points, COMPLEXITY_MIN_GROWTH_KB,
+                                              &complexity.space_r2);
+    complexity.time_loglog_slope = loglog_slope(n, cpu, complexity.num_points);
+}
+
+/**
+ * @brief Writes the input of size n described by spec to path.
+ * @return The input size in bytes, or -1 if the file could not be written.
+ */
+long build_scaling_input(const ScalingSpec *spec, long n, const char *path) {
+    FILE *f = fopen(path, "wb");
+    if (!f) return -1;
+
+    uint32_t rng = 12345; // Fixed seed: the same n always gives the same input
+    write_template(f, spec->header, n, 0, &rng);
+    for (long i = 0; i < n; i++) {
+        write_template(f, spec->item, n, i, &rng);
+    }
+    write_template(f, spec->footer, n, n, &rng);
+    long size = ftell(f);
+    if (fclose(f) != 0) return -1;
+    return size;
+}
+
+/**
+ * @brief Writes tmpl with {n}, {i} and {r} expanded.
+ */
+void write_template(FILE *f, const char *tmpl, long n, long i, uint32_t *rng) {
+    for (const char *c = tmpl; *c; c++) {
+        if (c[0] == '{' && c[1] && c[2] == '}' && strchr("nir", c[1])) {
+            long value;
+            if (c[1] == 'n') {
+                value = n;
+            } else if (c[1] == 'i') {
+                value = i;
+            } else {
+                *rng = *rng * 1103515245u + 12345u;
+                value = (*rng >> 8) % 1000000;
+            }
+            fprintf(f, "%ld", value);
+            c += 2;
+        } else {
+            fputc(*c, f);
+        }
+    }
+}
+
+double growth_constant(double n) { (void)n; return 1.0; }
+double growth_log(double n) { return log2(n); }
+double growth_linear(double n) { return n; }
+double growth_n_log_n(double n) { return n * log2(n); }
+double growth_quadratic(double n) { return n * n; }
+double growth_cubic(double n) { return n * n * n; }
+
+/**
+ * @brief Least-squares fit of y = a + b*f(n) for each growth model; returns the best model's name.
+ *
+ * The intercept absorbs process start-up cost. Models needing a negative
+ * slope are rejected. A more complex model must cut the residual by 10%
+ * to win, so noise does not promote O(n) to O(n log n). Less than
+ * min_growth between the smallest and largest y is reported as O(1).
+ */
+const char *fit_growth_model(const double *n, const double *y, int count, double min_growth, double *r2) {
+    static const GrowthModel models[] = {
+        { "O(1)", growth_constant },
+        { "O(log n)", growth_log },
+        { "O(n)", growth_linear },
+        { "O(n log n)", growth_n_log_n },
+        { "O(n^2)", growth_quadratic },
+        { "O(n^3)", growth_cubic }
+    };
+    *r2 = 0.0;
+    if (count < 4) return "unknown";
+    double lowest = y[0], highest = y[0];
+    for (int i = 1; i < count; i++) {
+        if (y[i] < lowest) lowest = y[i];
+        if (y[i] > highest) highest = y[i];
+    }
+    if (highest - lowest < min_growth) return models[0].name;
+
+    double mean_y = 0.0;
+    for (int i = 0; i < count; i++) mean_y += y[i];
+    mean_y /= count;
+    double total_ss = 0.0;
+    for (int i = 0; i < count; i++) total_ss += (y[i] - mean_y) * (y[i] - mean_y);
+
+    const char *best = models[0].name;
+    double best_sse = total_ss; // O(1) fits the mean
+    for (size_t m = 1; m < sizeof(models) / sizeof(models[0]); m++) {
+        double mean_f = 0.0;
+        for (int i = 0; i < count; i++) mean_f += models[m].f(n[i]);
+        mean_f /= count;
+        double sxy = 0.0, sxx = 0.0;
+        for (int i = 0; i < count; i++) {
+            double df = models[m].f(n[i]) - mean_f;
+            sxy += df * (y[i] - mean_y);
+            sxx += df * df;
+        }
+        if (sxx <= 0.0 || sxy <= 0.0) continue;
+        double b = sxy / sxx, a = mean_y - b * mean_f;
+        double sse = 0.0;
+        for (int i = 0; i < count; i++) {
+            double residual = y[i] - (a + b * models[m].f(n[i]));
+            sse += residual * residual;
+        }
+        if (sse < best_sse * 0.9) {
+            best = models[m].name;
+            best_sse = sse;
+        }
+    }
+    *r2 = (total_ss > 0.0) ? 1.0 - best_sse / total_ss : 1.0;
+    return best;
+}
+
+/**
+ * @brief Slope of log(y - y_min) against log(n) over the points above the smallest run.
+ * Near 1 for linear growth, 2 for quadratic; 0 when there is no growth to measure.
+ */
+double loglog_slope(const double *n, const double *y, int count) {
+    if (count < 3) return 0.0;
+    double base = y[0];
+    for (int i = 1; i < count; i++) if (y[i] < base) base = y[i];
+
+    double xs[COMPLEXITY_MAX_POINTS], ys[COMPLEXITY_MAX_POINTS];
+    int used = 0;
+    for (int i = 0; i < count; i++) {
+        double excess = y[i] - base;
+        if (excess <= 0.0) continue;
+        xs[used] = log(n[i]);
+        ys[used] = log(excess);
+        used++;
+    }
+    if (used < 2) return 0.0;
+
+    double mean_x = 0.0, mean_y = 0.0;
+    for (int i = 0; i < used; i++) {
+        mean_x += xs[i];
+        mean_y += ys[i];
+    }
+    mean_x /= used;
+    mean_y /= used;
+    double sxy = 0.0, sxx = 0.0;
+    for (int i = 0; i < used; i++) {
+        sxy += (xs[i] - mean_x) * (ys[i] - mean_y);
+        sxx += (xs[i] - mean_x) * (xs[i] - mean_x);
+    }
+    return (sxx > 0.0) ? sxy / sxx : 0.0;
+}
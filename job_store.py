@@ -0,0 +1,157 @@
+"""
+SQLite-backed job store for resumable runs.
+Each submission's stage outputs (generated tests, evaluation metrics, the
+analysis stages) are committed as they complete, so a run that is killed
+part-way can be restarted and will skip every stage that already finished.
+Fallback and error outputs are never committed, so those stages run again,
+and neither is any later stage computed from them.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    name TEXT PRIMARY KEY,
+    source_file TEXT NOT NULL,
+    source_hash TEXT NOT NULL,       -- source content and run configuration, see job_hash
+    status TEXT NOT NULL,            -- running | ok | incomplete | failed
+    record TEXT,                     -- final record JSON once the job has ended
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stages (
+    job TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    output TEXT NOT NULL,            -- stage result JSON
+    finished_at REAL NOT NULL,
+    PRIMARY KEY (job, stage)
+);
+"""
+
+
+def file_hash(path: str) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def job_hash(source_file: str, config: Optional[Dict[str, Any]] = None) -> str:
+    """Hash of the source and the settings that shape its results (models, fast mode, routing, ...)"""
+    settings = json.dumps(config or {}, sort_keys=True, default=str)
+    return hashlib.sha256((file_hash(source_file) + settings).encode()).hexdigest()
+
+
+def checkpointable(output: Any) -> bool:
+    """Whether a stage output is a real result worth resuming from, not a fallback or an error.
+
+    Lists and tuples (e.g. the fast-mode (stages, savings) pair) qualify only if every item does.
+    """
+    if isinstance(output, dict):
+        return "error" not in output and output.get("generation_method") != "fallback"
+    if isinstance(output, (list, tuple)):
+        return all(checkpointable(item) for item in output)
+    return output is not None
+
+
+class JobStore:
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()  # One connection shared by the event loop and worker threads
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")  # Each commit is durable without blocking readers
+        self.conn.executescript(SCHEMA)
+
+    def open_job(self, name: str, source_file: str,
+                 config: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Register a submission and return its stored record if it already succeeded.
+
+        A changed source file or run configuration invalidates every checkpoint
+        of the job; a failed or interrupted job keeps its finished stages and is
+        run again.
+        """
+        source_hash = job_hash(source_file, config)
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT source_hash, status, record FROM jobs WHERE name = ?",
+                                    (name,)).fetchone()
+            if row and row[0] == source_hash:
+                if row[1] == "ok":
+                    return json.loads(row[2])
+                self.conn.execute("UPDATE jobs SET status = 'running', updated_at = ? WHERE name = ?",
+                                  (now, name))
+                return None
+
+            self.conn.execute("BEGIN")
+            self.conn.execute("DELETE FROM stages WHERE job = ?", (name,))
+            self.conn.execute("INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, 'running', NULL, ?, ?)",
+                              (name, source_file, source_hash, now, now))
+            self.conn.execute("COMMIT")
+        return None
+
+    def stage_output(self, name: str, stage: str) -> Optional[Any]:
+        with self.lock:
+            row = self.conn.execute("SELECT output FROM stages WHERE job = ? AND stage = ?",
+                                    (name, stage)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def finish_stage(self, name: str, stage: str, output: Any):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO stages VALUES (?, ?, ?, ?)",
+                              (name, stage, json.dumps(output), time.time()))
+
+    def finish_job(self, name: str, record: Dict[str, Any]):
+        with self.lock:
+            self.conn.execute("UPDATE jobs SET status = ?, record = ?, updated_at = ? WHERE name = ?",
+                              (record.get("status", "ok"), json.dumps(record), time.time(), name))
+
+    def checkpoint(self, name: str) -> "StageCheckpoint":
+        return StageCheckpoint(self, name)
+
+    def summary(self) -> Dict[str, int]:
+        """Job counts by status"""
+        with self.lock:
+            return dict(self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def __enter__(self) -> "JobStore":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class StageCheckpoint:
+    """One submission's view of the store: get(stage) / put(stage, output), as the analyzers expect"""
+
+    def __init__(self, store: JobStore, name: str):
+        self.store = store
+        self.name = name
+        self.unsaved: List[str] = []  # Stages whose output was a fallback or an error, in order
+
+    @property
+    def complete(self) -> bool:
+        """Whether every stage put so far was a real result"""
+        return not self.unsaved
+
+    def get(self, stage: str) -> Optional[Any]:
+        return self.store.stage_output(self.name, stage)
+
+    def put(self, stage: str, output: Any):
+        """Save a stage output. Stages are put in dependency order, so once one is not
+        checkpointable nothing after it is saved either: it was computed from that output."""
+        if not checkpointable(output):
+            self.unsaved.append(stage)
+        if self.complete:
+            self.store.finish_stage(self.name, stage, output)
+
+
+def default_store_path(output_dir: str) -> str:
+    return os.path.join(output_dir, "job_store.sqlite")
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Long-running judge service. Keeps the test generator, the analyzer, the
+compiled evaluator and both Ollama models resident, queues submissions by
+priority and streams per-stage progress back as newline-delimited JSON.
+
+    POST /submit   {"source": "<C code>" | "source_file": "path", "name": ..., "priority": 0, "stream": true}
+    GET  /jobs/<id>
+    GET  /status
+
+Serves HTTP/1.1 on a TCP port or a Unix socket (--unix), e.g.
+    curl -N --unix-socket /tmp/judge.sock -d '{"source_file": "a.c"}' http://localhost/submit
+"source_file" is only accepted with --submissions-root and must resolve inside it.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import re
+import time
+from typing import Dict, Any, Optional
+
+from batch_judge import BatchJudge
+from pipeline import build_evaluator, CASCADE_MODEL
+from routing import RoutingTable
+
+MAX_REQUEST_BYTES = 1024 * 1024
+FINISHED_JOBS_KEPT = 1000  # Oldest finished jobs are forgotten past this
+
+
+class Job:
+    def __init__(self, job_id: str, name: str, source_file: str, priority: int):
+        self.id = job_id
+        self.name = name
+        self.source_file = source_file
+        self.priority = priority
+        self.state = "queued"
+        self.submitted_at = time.time()
+        self.record: Optional[Dict[str, Any]] = None
+        self.events: list = []
+        self.changed = asyncio.Event()
+
+    def emit(self, event: Dict[str, Any]):
+        """Append an event for every listener; listeners replay from where they are"""
+        self.events.append(dict(event, id=self.id, t=round(time.time() - self.submitted_at, 3)))
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def summary(self) -> Dict[str, Any]:
+        return {"id": self.id, "name": self.name, "state": self.state,
+                "priority": self.priority, "record": self.record}
+
+
+class JudgeService:
+    def __init__(self, output_dir: str, workers: int = 2, model_slots: int = 2, eval_slots: int = None,
+                 generator_model: str = "codellama:7b", analyzer_model: str = "codellama:13b-instruct",
+                 keep_alive=-1, fast_mode: bool = False, complexity: bool = False,
+                 cascade_model: Optional[str] = None, routing: Optional[RoutingTable] = None,
+                 submissions_root: Optional[str] = None):
+        self.output_dir = output_dir
+        self.submissions_root = os.path.realpath(submissions_root) if submissions_root else None
+        self.workers = workers
+        self.keep_alive = keep_alive
+        self.models = [generator_model, analyzer_model]
+        for model in [cascade_model] + [route.model for route in (routing.routes if routing else [])]:
+            if model and model not in self.models:
+                self.models.append(model)  # Every model a submission can be sent to is kept warm
+        self.judge = BatchJudge(output_dir, workers=workers, model_slots=model_slots, eval_slots=eval_slots,
+                                generator_model=generator_model, analyzer_model=analyzer_model,
+                                fast_mode=fast_mode, complexity=complexity, keep_alive=keep_alive,
+                                cascade_model=cascade_model, routing=routing)
+        # Entries are (-priority, sequence, job): higher priority first, then first come first served
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self.sequence = itertools.count(1)
+        self.jobs: Dict[str, Job] = {}
+        self.running = 0
+        self.completed = 0
+        self.started_at = time.time()
+
+    async def start(self):
+        """Compile the evaluator and load the models once, before accepting work"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.judge.evaluator_exe = await asyncio.to_thread(build_evaluator)
+        print(f"✅ Evaluator ready: {self.judge.evaluator_exe}")
+        for model in self.models:
+            try:
+                # An empty prompt only loads the model; keep_alive pins it in memory
+                await self.judge.analyzer.client.generate(model=model, prompt="", keep_alive=self.keep_alive)
+                print(f"✅ Model warm: {model} (keep_alive={self.keep_alive})")
+            except Exception as e:
+                print(f"⚠️  Could not preload {model}: {e}")
+        for _ in range(self.workers):
+            asyncio.create_task(self.worker())
+
+    def submit(self, request: Dict[str, Any]) -> Job:
+        """Queue a submission given as inline source or a path under the submissions root"""
+        # Validate everything before taking a sequence number or touching the disk
+        if not isinstance(request, dict):
+            raise TypeError("request body must be a JSON object")
+        priority = int(request.get("priority", 0))
+        if "source" in request:
+            if not isinstance(request["source"], str):
+                raise TypeError("'source' must be a string")
+        elif "source_file" in request:
+            source_file = self.resolve_source_file(str(request["source_file"]))
+        else:
+            raise ValueError("request needs 'source' or 'source_file'")
+
+        sequence = next(self.sequence)
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", str(request.get("name") or "submission"))
+        job_id = f"{sequence:06d}"
+        job_dir_name = f"{job_id}-{name}"
+
+        if "source" in request:
+            job_dir = os.path.join(self.output_dir, job_dir_name)
+            os.makedirs(job_dir, exist_ok=True)
+            source_file = os.path.join(job_dir, "submission.c")
+            with open(source_file, 'w') as f:
+                f.write(request["source"])
+
+        job = Job(job_id, job_dir_name, source_file, priority)
+        self.jobs[job_id] = job
+        self.queue.put_nowait((-job.priority, sequence, job))
+        job.emit({"event": "queued", "position": self.queue.qsize(), "priority": job.priority})
+        return job
+
+    def resolve_source_file(self, requested: str) -> str:
+        """Resolve a requested path against the submissions root, refusing anything outside it"""
+        if self.submissions_root is None:
+            raise ValueError("source_file is disabled; start the service with --submissions-root")
+        # realpath resolves '..' and symlinks before the prefix check
+        source_file = os.path.realpath(os.path.join(self.submissions_root, requested))
+        if os.path.commonpath([self.submissions_root, source_file]) != self.submissions_root:
+            raise ValueError(f"source_file outside the submissions root: {requested}")
+        if not os.path.isfile(source_file):
+            raise ValueError(f"source_file not found: {requested}")
+        return source_file
+
+    async def worker(self):
+        while True:
+            _, _, job = await self.queue.get()
+            job.state = "running"
+            self.running += 1
+            job.emit({"event": "started", "waited_s": round(time.time() - job.submitted_at, 3)})
+            try:
+                job.record = await self.judge.judge_one(job.name, job.source_file, progress=job.emit)
+            except Exception as e:  # judge_one records stage failures itself; this is a bug guard
+                job.record = {"name": job.name, "status": "failed", "error": str(e)}
+            self.running -= 1
+            self.completed += 1
+            job.state = "done"
+            job.emit({"event": "result", "record": job.record})
+            self.queue.task_done()
+            self.forget_old_jobs()
+
+    def forget_old_jobs(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.state == "done"]
+        for job_id in finished[:max(0, len(finished) - FINISHED_JOBS_KEPT)]:
+            del self.jobs[job_id]
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "queued": self.queue.qsize(),
+            "running": self.running,
+            "completed": self.completed,
+            "workers": self.workers,
+            "models": self.models,
+            "keep_alive": self.keep_alive,
+            "llm_cache": self.judge.analyzer.cache.stats(),
+            "cascade": self.judge.cascade_report(),
+            "routes": self.judge.analyzer.routing.counts if self.judge.analyzer.routing else None
+        }
+
+    # --- HTTP ---
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            method, path, body = await read_request(reader)
+            if method == "POST" and path == "/submit":
+                try:
+                    request = json.loads(body or b"{}")
+                    job = self.submit(request)
+                except (ValueError, TypeError, OSError) as e:
+                    await send_json(writer, 400, {"error": str(e)})
+                    return
+                if request.get("stream", True):
+                    await self.stream_job(job, writer)
+                else:
+                    while job.state != "done":
+                        await job.changed.wait()
+                    await send_json(writer, 200, job.summary())
+            elif method == "GET" and path == "/status":
+                await send_json(writer, 200, self.status())
+            elif method == "GET" and path.startswith("/jobs/") and path[len("/jobs/"):] in self.jobs:
+                await send_json(writer, 200, self.jobs[path[len("/jobs/"):]].summary())
+            else:
+                await send_json(writer, 404, {"error": f"no route for {method} {path}"})
+        except (ValueError, asyncio.IncompleteReadError):
+            await send_json(writer, 400, {"error": "malformed request"})
+        except ConnectionError:
+            pass  # Client went away; its job keeps running and stays visible under /jobs/<id>
+        finally:
+            writer.close()
+
+    async def stream_job(self, job: Job, writer: asyncio.StreamWriter):
+        """Send every event of job as one NDJSON line per chunk until its result"""
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+        sent = 0
+        while True:
+            changed = job.changed
+            while sent < len(job.events):
+                line = (json.dumps(job.events[sent]) + "\n").encode()
+                writer.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                sent += 1
+            await writer.drain()
+            if job.state == "done" and sent == len(job.events):
+                break
+            await changed.wait()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+async def read_request(reader: asyncio.StreamReader):
+    """Minimal HTTP/1.1 request parser: request line, headers and a Content-Length body"""
+    request_line = (await reader.readline()).decode("latin-1").split()
+    if len(request_line) < 2:
+        raise ValueError("bad request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        headers[key.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length > MAX_REQUEST_BYTES:
+        raise ValueError("request too large")
+    body = await reader.readexactly(length) if length else b""
+    return request_line[0].upper(), request_line[1].split("?")[0], body
+
+
+async def send_json(writer: asyncio.StreamWriter, code: int, payload: Dict[str, Any]):
+    reason = {200: "OK", 400: "Bad Request", 404: "Not Found"}[code]
+    body = json.dumps(payload, indent=2).encode()
+    writer.write(f"HTTP/1.1 {code} {reason}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+    await writer.drain()
+
+
+async def serve(args):
+    service = JudgeService(args.output_dir, workers=args.workers, model_slots=args.model_slots,
+                           eval_slots=args.eval_slots, keep_alive=args.keep_alive,
+                           fast_mode=args.fast, complexity=args.complexity, cascade_model=args.cascade,
+                           routing=RoutingTable.load(args.route) if args.route else None,
+                           submissions_root=args.submissions_root)
+    await service.start()
+    if args.unix:
+        if os.path.exists(args.unix):
+            os.remove(args.unix)
+        server = await asyncio.start_unix_server(service.handle_connection, path=args.unix)
+        where = args.unix
+    else:
+        server = await asyncio.start_server(service.handle_connection, host=args.host, port=args.port)
+        where = f"http://{args.host}:{args.port}"
+    print(f"🚀 Judge service listening on {where} ({args.workers} workers)")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the evaluation pipeline with warm models and a priority queue")
+    parser.add_argument("output_dir", help="directory for per-job outputs")
+    parser.add_argument("--host", default="127.0.0.1", help="TCP address to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port (default: 8765)")
+    parser.add_argument("--unix", help="serve on this Unix socket path instead of TCP")
+    parser.add_argument("-j", "--workers", type=int, default=2,
+                        help="submissions judged concurrently (default: 2)")
+    parser.add_argument("--model-slots", type=int, default=2,
+                        help="max in-flight requests to the model server (default: 2)")
+    parser.add_argument("--eval-slots", type=int, default=None,
+                        help="max concurrent evaluator processes (default: CPU count)")
+    parser.add_argument("--keep-alive", default="-1",
+                        help="Ollama keep_alive for both models, e.g. 30m; -1 pins them (default: -1)")
+    parser.add_argument("--submissions-root", metavar="DIR",
+                        help="allow \"source_file\" requests for files under DIR (relative paths resolve "
+                             "against it); without it only inline \"source\" is accepted")
+    parser.add_argument("--fast", action="store_true",
+                        help="answer all four analysis stages with a single LLM call")
+    parser.add_argument("--complexity", action="store_true",
+                        help="measure empirical time/space complexity of each submission")
+    parser.add_argument("--cascade", nargs="?", const=CASCADE_MODEL, metavar="MODEL",
+                        help=f"try every LLM stage on MODEL (default: {CASCADE_MODEL}) first and escalate "
+                             "to the 13B model only when its answer fails the quality gate")
+    parser.add_argument("--route", nargs="?", const="default", metavar="TABLE",
+                        help="pick model, token budget and stages per submission from a routing table "
+                             "(JSON file; default: the built-in table); overrides --fast")
+    args = parser.parse_args()
+    if args.keep_alive.lstrip("-").isdigit():
+        args.keep_alive = int(args.keep_alive)
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        print("\n👋 Judge service stopped")
+
+
+if __name__ == "__main__":
+    main()
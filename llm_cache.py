@@ -0,0 +1,180 @@
+"""
+Persistent, content-addressed cache for LLM responses.
+Responses are keyed by a hash of (model, messages, options) so identical
+requests (re-grades, re-runs after a crash) are answered from disk.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "code_eval", "llm_responses")
+EVICT_EVERY_PUTS = 256  # Full scans for idle entries; the size limit is tracked between scans
+EVICT_LOW_WATER = 0.9  # Size eviction frees down to this fraction so a full cache is not rescanned per put
+
+
+class LLMResponseCache:
+    def __init__(self, cache_dir: Optional[str] = None, max_size_mb: float = 512,
+                 max_age_days: float = 30, enabled: Optional[bool] = None):
+        self.cache_dir = cache_dir or os.environ.get("LLM_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.max_age_seconds = max_age_days * 24 * 3600
+
+        # LLM_CACHE_BYPASS=1 disables the cache without touching code
+        if enabled is None:
+            enabled = os.environ.get("LLM_CACHE_BYPASS", "0") not in ("1", "true", "yes")
+        self.enabled = enabled
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Bytes on disk as of the last scan plus what this process wrote since; None until the first scan
+        self.approx_size: Optional[int] = None
+        self.puts_since_scan = 0
+        self.lock = threading.Lock()  # Guards the counters and size tracking; lookups run in worker threads
+
+        if self.enabled:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(model_name: str, messages: List[Dict], options: Dict[str, Any],
+                 response_format: Optional[Dict[str, Any]] = None) -> str:
+        """Stable content hash of everything that determines the response"""
+        request = {"model": model_name, "messages": messages, "options": options}
+        if response_format is not None:
+            request["format"] = response_format
+        payload = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response text, or None on a miss"""
+        if not self.enabled:
+            return None
+
+        path = self._entry_path(key)
+        try:
+            # Entries expire when idle: mtime is the last write or hit, as in evict()
+            if time.time() - os.stat(path).st_mtime > self.max_age_seconds:
+                self._remove(path)
+                with self.lock:
+                    self.misses += 1
+                return None
+            with open(path, 'r') as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            with self.lock:
+                self.misses += 1
+            return None
+
+        # Bump mtime so eviction treats this entry as recently used
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        with self.lock:
+            self.hits += 1
+        return entry.get("response")
+
+    def put(self, key: str, response: str, model_name: str = ""):
+        """Store a response; evicts when the tracked size passes the limit or every EVICT_EVERY_PUTS puts"""
+        if not self.enabled:
+            return
+
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {
+            "key": key,
+            "model": model_name,
+            "created_at": time.time(),
+            "response": response
+        }
+
+        # Write-then-rename so concurrent graders never see a partial entry; mkstemp gives
+        # every writer (process or thread) its own temporary file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entry, f)
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+
+        with self.lock:
+            self.puts_since_scan += 1
+            if self.approx_size is not None:
+                self.approx_size += size
+            scan = (self.approx_size is None or self.approx_size > self.max_size_bytes
+                    or self.puts_since_scan >= EVICT_EVERY_PUTS)
+        if scan:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under the size limit"""
+        if not self.enabled or not os.path.isdir(self.cache_dir):
+            return
+
+        now = time.time()
+        entries = []
+        total_size = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if now - st.st_mtime > self.max_age_seconds:
+                    self._remove(path)
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total_size += st.st_size
+
+        if total_size > self.max_size_bytes:
+            entries.sort()  # Oldest access first
+            for _, size, path in entries:
+                if total_size <= self.max_size_bytes * EVICT_LOW_WATER:
+                    break
+                self._remove(path)
+                total_size -= size
+
+        with self.lock:
+            self.approx_size = total_size
+            self.puts_since_scan = 0
+
+    def clear(self):
+        """Remove every cached entry"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                self._remove(os.path.join(root, name))
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+            with self.lock:
+                self.evictions += 1
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for reporting"""
+        with self.lock:
+            hits, misses, evictions = self.hits, self.misses, self.evictions
+        lookups = hits + misses
+        return {
+            "enabled": self.enabled,
+            "cache_dir": self.cache_dir,
+            "hits": hits,
+            "misses": misses,
+            "evictions": evictions,
+            "hit_rate": (hits / lookups) if lookups else 0.0
+        }
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+In-process evaluation pipeline for one C submission.
+Test generation and analysis run in this interpreter, only the evaluator is a
+subprocess, and stage results are handed on in memory. The dependency probe and
+the evaluator build are cached, so repeat runs skip straight to the work.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from typing import Dict, Any, List, Optional
+
+import ollama
+
+from Llm_as_judge import AdvancedCodeAnalyzer
+from job_store import JobStore, default_store_path
+from routing import RoutingTable
+from testcase import TestCaseGenerator
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+EVALUATOR_SOURCE = os.path.join(SCRIPT_DIR, "eval.c")
+EVALUATOR_BUILD = ["gcc", "-O2", "-pthread", "-o", "{exe}", EVALUATOR_SOURCE, "-ljson-c", "-lm"]
+CACHE_ROOT = os.path.join(os.path.expanduser("~"), ".cache", "code_eval")
+DEPENDENCY_CACHE = os.path.join(CACHE_ROOT, "dependency_probe.json")
+DEPENDENCY_MAX_AGE_S = 24 * 3600
+REQUIRED_MODELS = ["codellama:7b", "codellama:13b-instruct"]
+CASCADE_MODEL = "codellama:7b"  # First tier of --cascade; already required, so nothing new to pull
+
+
+def tool_fingerprint() -> Dict[str, Any]:
+    """Paths and mtimes of the external tools; any change invalidates the cached probe"""
+    fingerprint = {}
+    for tool in ("gcc", "ollama", "valgrind"):
+        path = shutil.which(tool)
+        fingerprint[tool] = [path, os.path.getmtime(path)] if path else None
+    return fingerprint
+
+
+def probe_dependencies() -> List[str]:
+    """Check everything the pipeline needs; returns a list of problems (empty when ready)"""
+    problems = []
+    if not shutil.which("gcc"):
+        problems.append("GCC compiler not found")
+    elif subprocess.run(["gcc", "-ljson-c", "-x", "c", "-o", os.devnull, "-"],
+                        input="int main(){return 0;}", capture_output=True, text=True).returncode != 0:
+        problems.append("json-c library not found (install libjson-c-dev)")
+    if not shutil.which("valgrind"):
+        print("⚠️  Valgrind not found (only needed for the -m valgrind memory backend)")
+
+    try:
+        models = ollama.list()["models"]
+        available = {str(m.get("model") or m.get("name")) for m in models}
+    except Exception as e:
+        return problems + [f"Ollama server not reachable: {e}"]
+    for model in REQUIRED_MODELS:
+        if not any(name == model or name.startswith(model + ":") for name in available):
+            print(f"ℹ️  Pulling missing model {model}...")
+            try:
+                ollama.pull(model)
+            except Exception as e:
+                problems.append(f"Failed to pull {model}: {e}")
+    return problems
+
+
+def check_dependencies(recheck: bool = False) -> List[str]:
+    """Run the dependency probe unless a recent successful probe with the same tools is cached"""
+    fingerprint = tool_fingerprint()
+    if not recheck:
+        try:
+            with open(DEPENDENCY_CACHE, 'r') as f:
+                cached = json.load(f)
+            if (cached["fingerprint"] == fingerprint
+                    and time.time() - cached["checked_at"] < DEPENDENCY_MAX_AGE_S):
+                return []
+        except (OSError, ValueError, KeyError):
+            pass
+
+    problems = probe_dependencies()
+    if not problems:  # Only success is cached, so a fixed install is noticed on the next run
+        os.makedirs(CACHE_ROOT, exist_ok=True)
+        tmp = f"{DEPENDENCY_CACHE}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({"fingerprint": fingerprint, "checked_at": time.time()}, f)
+        os.replace(tmp, DEPENDENCY_CACHE)
+    return problems
+
+
+def build_evaluator() -> str:
+    """Return the evaluator binary, compiling eval.c only when its content or build command changed"""
+    with open(EVALUATOR_SOURCE, 'rb') as f:
+        digest = hashlib.sha256(f.read() + " ".join(EVALUATOR_BUILD).encode()).hexdigest()
+    exe = os.path.join(CACHE_ROOT, "evaluator", digest[:16], "enhanced_evaluator")
+    if os.path.exists(exe):
+        return exe
+
+    os.makedirs(os.path.dirname(exe), exist_ok=True)
+    tmp = f"{exe}.{os.getpid()}.tmp"
+    build = subprocess.run([arg.replace("{exe}", tmp) for arg in EVALUATOR_BUILD], capture_output=True, text=True)
+    if build.returncode != 0:
+        raise RuntimeError(f"failed to compile the evaluator:\n{build.stderr}")
+    os.replace(tmp, exe)  # Concurrent pipelines never run a half-written binary
+    return exe
+
+
+class Pipeline:
+    def __init__(self, generator_model: str = "codellama:7b", analyzer_model: str = "codellama:13b-instruct",
+                 fast_mode: bool = False, stream: bool = False, complexity: bool = False,
+                 cascade_model: Optional[str] = None, routing: Optional[RoutingTable] = None):
+        # With a cascade the generator's escalation target is the analyzer's larger model
+        self.generator = TestCaseGenerator(model_name=analyzer_model if cascade_model else generator_model,
+                                           cascade_model=cascade_model)
+        self.analyzer = AdvancedCodeAnalyzer(model_name=analyzer_model, fast_mode=fast_mode, stream=stream,
+                                             cascade_model=cascade_model, routing=routing)
+        self.cascade_model = cascade_model
+        self.complexity = complexity
+        self.evaluator_exe: Optional[str] = None
+
+    def evaluate(self, source_file: str, tests_file: str, results_file: str) -> Dict[str, Any]:
+        """Stage 2: run the evaluator binary and return its results"""
+        if self.evaluator_exe is None:
+            self.evaluator_exe = build_evaluator()
+        # A results file left by an earlier run must not pass for this one
+        if os.path.exists(results_file):
+            os.remove(results_file)
+        options = ["-C"] if self.complexity else []
+        proc = subprocess.run([self.evaluator_exe, *options, "--results", results_file, source_file, tests_file])
+        if proc.returncode != 0 or not os.path.exists(results_file):
+            raise RuntimeError(f"evaluator exited with status {proc.returncode}")
+        with open(results_file, 'r') as f:
+            return json.load(f)
+
+    def cascade_report(self) -> Optional[Dict[str, Any]]:
+        """Per-stage escalation rates and latency, or None without a cascade"""
+        if not self.cascade_model:
+            return None
+        return {**self.generator.cascade_stats.report(), **self.analyzer.cascade_stats.report()}
+
+    def run(self, source_file: str, output_dir: str, resume: bool = False) -> Dict[str, Any]:
+        """Run all three stages for one submission, writing every artifact to output_dir.
+
+        With resume, stage outputs are checkpointed in output_dir/job_store.sqlite and
+        stages finished by an earlier, interrupted run are skipped.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        if not resume:
+            return self.run_stages(source_file, output_dir)
+        with JobStore(default_store_path(output_dir)) as store:
+            name = os.path.basename(source_file)
+            # A completed job is re-reported from its checkpoints
+            store.open_job(name, source_file, self.checkpoint_config())
+            return self.run_stages(source_file, output_dir, store.checkpoint(name))
+
+    def checkpoint_config(self) -> Dict[str, Any]:
+        """Run settings that shape the results; changing any of them re-runs every stage on resume"""
+        return dict(self.analyzer.checkpoint_config(), generator_model=self.generator.model_name,
+                    complexity=self.complexity)
+
+    def run_stages(self, source_file: str, output_dir: str, checkpoint=None) -> Dict[str, Any]:
+        """The three stages of run(); stage outputs are saved to and reused from checkpoint if given"""
+        tests_file = os.path.join(output_dir, "generated_test_cases.json")
+        results_file = os.path.join(output_dir, "evaluation_metrics.json")
+        timings = {}
+
+        print("🔍 Stage 1: Generating test cases...")
+        t = time.perf_counter()
+        test_data = checkpoint.get("test_generation") if checkpoint else None
+        if test_data is None:
+            test_data = self.generator.generate_test_cases(source_file)
+            if checkpoint:
+                checkpoint.put("test_generation", test_data)
+        self.generator.save_test_cases(test_data, tests_file)  # The evaluator reads the suite from disk
+        timings["test_generation"] = round(time.perf_counter() - t, 3)
+
+        print("\n⚙️  Stage 2: Executing tests...")
+        t = time.perf_counter()
+        eval_results = checkpoint.get("evaluation") if checkpoint else None
+        if eval_results is None:
+            eval_results = self.evaluate(source_file, tests_file, results_file)
+            if checkpoint:
+                checkpoint.put("evaluation", eval_results)
+        else:
+            with open(results_file, 'w') as f:
+                json.dump(eval_results, f, indent=2)
+        timings["evaluation"] = round(time.perf_counter() - t, 3)
+
+        print("\n🧠 Stage 3: Analyzing results...")
+        t = time.perf_counter()
+        analysis = self.analyzer.perform_comprehensive_analysis(source_file, results_file, eval_results,
+                                                                checkpoint=checkpoint)
+        timings["analysis"] = round(time.perf_counter() - t, 3)
+        if "error" in analysis:
+            raise RuntimeError(analysis["error"])
+        if checkpoint and not checkpoint.complete:
+            # Not finished: a resume runs the fallback/error stages (and those after them) again
+            print(f"⚠️  Stages not checkpointed (fallback or error output): {', '.join(checkpoint.unsaved)}")
+            checkpoint.store.finish_job(checkpoint.name, {"status": "incomplete", "timings_s": timings,
+                                                          "incomplete_stages": checkpoint.unsaved})
+        elif checkpoint:
+            checkpoint.store.finish_job(checkpoint.name, {"status": "ok", "timings_s": timings})
+
+        with open(os.path.join(output_dir, "comprehensive_analysis.json"), 'w') as f:
+            json.dump(analysis, f, indent=2)
+        self.analyzer.generate_executive_report(analysis, os.path.join(output_dir, "feedback_report.txt"))
+        return {"eval_results": eval_results, "analysis": analysis, "timings_s": timings,
+                "cascade": self.cascade_report()}
+
+
+def print_summary(outcome: Dict[str, Any], output_dir: str):
+    metrics = outcome["eval_results"]
+    final = outcome["analysis"].get("final_assessment", {})
+    print("\n📊 EVALUATION METRICS:")
+    print(f"   Pass Rate: {metrics.get('passrate', 0)}% "
+          f"({metrics.get('tests_passed', 0)}/{metrics.get('total_tests', 0)} tests)")
+    print(f"   Memory Score: {metrics.get('memory_score', 0)}")
+    print(f"   Robustness Score: {metrics.get('robustness_score', 0)}")
+    print("🎓 FINAL ASSESSMENT:")
+    print(f"   Grade: {final.get('grade', 'N/A')}")
+    print(f"   Score: {final.get('score', 0)}/100")
+    print(f"⏱️  Stage times (s): {outcome['timings_s']}")
+    routing = outcome["analysis"].get("meta_information", {}).get("routing")
+    if routing:
+        print(f"🧭 Route: {routing['route']} ({routing['model']}, num_predict {routing['num_predict']}, "
+              f"stages {'+'.join(routing['stages'])})")
+    if outcome.get("cascade"):
+        print("⤴️  Model cascade:")
+        for stage, report in outcome["cascade"].items():
+            reasons = f" ({', '.join(report['reasons'])})" if report["reasons"] else ""
+            print(f"   {stage}: {report['escalated']}/{report['calls']} escalated{reasons}, "
+                  f"{report['mean_total_s']}s")
+    print(f"\n📁 All results saved to: {os.path.abspath(output_dir)}")
+    print("  📋 generated_test_cases.json    - LLM-generated test cases")
+    print("  📊 evaluation_metrics.json      - Detailed evaluation metrics")
+    print("  📄 feedback_report.txt          - Human-readable analysis report")
+    print("  📋 comprehensive_analysis.json  - Detailed analysis data")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate tests for, evaluate and analyze one C submission")
+    parser.add_argument("source", help="C source file to evaluate")
+    parser.add_argument("output_dir", nargs="?",
+                        default=f"./evaluation_results_{time.strftime('%Y%m%d_%H%M%S')}",
+                        help="directory to save results (default: ./evaluation_results_<timestamp>)")
+    parser.add_argument("--fast", action="store_true",
+                        help="answer all four analysis stages with a single LLM call")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream LLM responses and stop generation once the JSON object closes")
+    parser.add_argument("--complexity", action=argparse.BooleanOptionalAction, default=False,
+                        help="measure the empirical time/space complexity (off by default)")
+    parser.add_argument("--cascade", nargs="?", const=CASCADE_MODEL, metavar="MODEL",
+                        help=f"try every LLM stage on MODEL (default: {CASCADE_MODEL}) first and escalate "
+                             "to the 13B model only when its answer fails the quality gate")
+    parser.add_argument("--route", nargs="?", const="default", metavar="TABLE",
+                        help="pick model, token budget and stages per submission from a routing table "
+                             "(JSON file; default: the built-in table); overrides --fast")
+    parser.add_argument("--resume", action="store_true",
+                        help="checkpoint each stage in output_dir/job_store.sqlite and skip stages "
+                             "an interrupted run already finished")
+    parser.add_argument("--recheck-deps", action="store_true",
+                        help="probe dependencies even if a recent successful probe is cached")
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.source):
+        print(f"❌ Source file '{args.source}' not found")
+        sys.exit(1)
+
+    problems = check_dependencies(recheck=args.recheck_deps)
+    if problems:
+        for problem in problems:
+            print(f"❌ {problem}")
+        print("❌ Missing dependencies. Please install them before continuing.")
+        sys.exit(1)
+
+    try:
+        routing = RoutingTable.load(args.route) if args.route else None
+    except (OSError, ValueError, TypeError) as e:
+        print(f"❌ Invalid routing table: {e}")
+        sys.exit(1)
+
+    pipeline = Pipeline(fast_mode=args.fast, stream=args.stream, complexity=args.complexity,
+                        cascade_model=args.cascade, routing=routing)
+    try:
+        outcome = pipeline.run(os.path.abspath(args.source), args.output_dir, resume=args.resume)
+    except (RuntimeError, OSError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print_summary(outcome, args.output_dir)
+    print("✅ Evaluation pipeline completed successfully!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Declarative model routing for the analysis stages.
+A routing table maps what is known about a submission before the first LLM
+call (difficulty, program type, line and function counts) to the model, the
+generation budget and the stages to run. Routes are tried in order and the
+first whose conditions all hold wins; the last route must match everything.
+
+A table can be loaded from JSON, a list of routes in the DEFAULT_ROUTES form:
+    [{"name": "trivial", "when": {"max_lines": 40, "difficulty_level": ["basic"]},
+      "model": "codellama:7b", "num_predict": 2048, "temperature": 0.1, "stages": ["combined"]}, ...]
+"""
+
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Tuple
+
+ANALYSIS_STAGES = ["stage_1", "stage_2", "stage_3", "stage_4"]
+
+# Conditions a route may use in "when": list conditions match any listed value,
+# bounds are inclusive
+LIST_CONDITIONS = {"difficulty_level", "program_type"}
+BOUND_CONDITIONS = {"min_lines": ("line_count", 1), "max_lines": ("line_count", -1),
+                    "min_functions": ("function_count", 1), "max_functions": ("function_count", -1)}
+
+DEFAULT_ROUTES = [
+    # Short basic programs: one combined call on the small model with a modest budget
+    {"name": "trivial", "when": {"difficulty_level": ["basic"], "max_lines": 40, "max_functions": 2},
+     "model": "codellama:7b", "num_predict": 2048, "temperature": 0.1, "stages": ["combined"]},
+    # Advanced or data-structure work keeps the full four-stage treatment
+    {"name": "advanced", "when": {"difficulty_level": ["advanced"]},
+     "model": "codellama:13b-instruct", "num_predict": 4096, "temperature": 0.1, "stages": ANALYSIS_STAGES},
+    {"name": "data_structure", "when": {"program_type": ["data_structure"], "min_lines": 150},
+     "model": "codellama:13b-instruct", "num_predict": 4096, "temperature": 0.1, "stages": ANALYSIS_STAGES},
+    # Small to medium programs: skip the edge-case stage and halve the budget
+    {"name": "small", "when": {"max_lines": 150},
+     "model": "codellama:13b-instruct", "num_predict": 2048, "temperature": 0.1,
+     "stages": ["stage_1", "stage_2", "stage_4"]},
+    {"name": "default", "when": {},
+     "model": "codellama:13b-instruct", "num_predict": 4096, "temperature": 0.1, "stages": ANALYSIS_STAGES}
+]
+
+
+@dataclass
+class Route:
+    """One row of the routing table"""
+    name: str
+    model: str
+    num_predict: int
+    temperature: float
+    stages: List[str]
+    when: Dict[str, Any] = field(default_factory=dict)
+
+    def __post_init__(self):
+        unknown = set(self.when) - LIST_CONDITIONS - set(BOUND_CONDITIONS)
+        if unknown:
+            raise ValueError(f"route '{self.name}': unknown conditions {sorted(unknown)}")
+        if self.stages != ["combined"] and ("stage_4" not in self.stages
+                                            or not set(self.stages) <= set(ANALYSIS_STAGES)):
+            # Stage 4 carries the feedback the grade is computed from
+            raise ValueError(f"route '{self.name}': stages must be [\"combined\"] or a subset of "
+                             f"{ANALYSIS_STAGES} that includes stage_4")
+
+    @property
+    def fast(self) -> bool:
+        """Whether the route answers all four stages with one combined call"""
+        return self.stages == ["combined"]
+
+    def runs(self, stage: str) -> bool:
+        return stage in self.stages
+
+    def matches(self, features: Dict[str, Any]) -> bool:
+        for condition, expected in self.when.items():
+            if condition in LIST_CONDITIONS:
+                if features.get(condition) not in expected:
+                    return False
+            else:
+                feature, sign = BOUND_CONDITIONS[condition]
+                if sign * (features[feature] - expected) < 0:
+                    return False
+        return True
+
+    def options(self, base: Dict[str, Any]) -> Dict[str, Any]:
+        """Ollama options: base options with this route's budget and temperature"""
+        return dict(base, num_predict=self.num_predict, temperature=self.temperature)
+
+
+class RoutingTable:
+    def __init__(self, routes: List[Dict[str, Any]]):
+        self.routes = [Route(**route) for route in routes]
+        if not self.routes or self.routes[-1].when:
+            raise ValueError("the last route must have no conditions so every submission is routed")
+        self.counts: Dict[str, int] = {route.name: 0 for route in self.routes}
+
+    @classmethod
+    def from_file(cls, path: str) -> "RoutingTable":
+        with open(path, 'r') as f:
+            return cls(json.load(f))
+
+    @classmethod
+    def default(cls) -> "RoutingTable":
+        return cls(DEFAULT_ROUTES)
+
+    @classmethod
+    def load(cls, spec: str) -> "RoutingTable":
+        """A table from a --route argument: "default" or the path of a JSON table"""
+        return cls.default() if spec == "default" else cls.from_file(spec)
+
+    def select(self, features: Dict[str, Any], source_file: str = "") -> Tuple[Route, Dict[str, Any]]:
+        """Return the first matching route and the decision record, logging the decision"""
+        route = next(route for route in self.routes if route.matches(features))
+        self.counts[route.name] += 1
+        decision = {"route": route.name, "model": route.model, "num_predict": route.num_predict,
+                    "temperature": route.temperature, "stages": route.stages, "features": features}
+        print(f"🧭 {os.path.basename(source_file) or 'submission'}: route '{route.name}' -> {route.model}, "
+              f"num_predict {route.num_predict}, stages {'+'.join(route.stages)} "
+              f"({features['difficulty_level']}, {features['program_type']}, "
+              f"{features['line_count']} lines, {features['function_count']} functions)")
+        return route, decision
@@ -0,0 +1,374 @@
+"""
+JSON schemas for every LLM prompt, plus parsing, validation and repair.
+Schemas are passed to Ollama as the `format` argument so generation is
+grammar-constrained; validation and a targeted repair pass cover models or
+servers that do not honour the constraint.
+"""
+
+import json
+from typing import Dict, Any, List, Optional, Tuple
+
+_STR = {"type": "string"}
+_STR_LIST = {"type": "array", "items": _STR}
+_SEVERITY = {"type": "string", "enum": ["low", "medium", "high", "critical"]}
+
+
+def _object(properties: Dict[str, Any], required: Optional[List[str]] = None) -> Dict[str, Any]:
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties) if required is None else required
+    }
+
+
+def _list_of(properties: Dict[str, Any]) -> Dict[str, Any]:
+    return {"type": "array", "items": _object(properties)}
+
+
+TEST_SUITE_SCHEMA = _object({
+    "program_description": _STR,
+    "program_type": {"type": "string", "enum": ["calculator", "string_processor", "mathematical",
+                                                "io_handler", "data_structure", "other"]},
+    "difficulty_level": {"type": "string", "enum": ["basic", "intermediate", "advanced"]},
+    "test_cases": {
+        "type": "array",
+        "minItems": 1,
+        "items": _object({
+            "input": _STR,
+            "expected_output": _STR,
+            "description": _STR,
+            "category": {"type": "string", "enum": ["normal", "edge", "error", "corner"]},
+            "weight": {"type": "number"}
+        }, required=["input", "expected_output", "description", "category"])
+    },
+    "potential_edge_cases": _STR_LIST,
+    "scaling_input": _object({"header": _STR, "item": _STR, "footer": _STR}, required=["item"])
+}, required=["program_description", "test_cases"])
+
+CODE_ANALYSIS_SCHEMA = _object({
+    "algorithm_analysis": _object({
+        "algorithm_type": _STR,
+        "time_complexity": _STR,
+        "space_complexity": _STR,
+        "optimality": _STR,
+        "alternative_approaches": _STR_LIST
+    }),
+    "code_structure_analysis": _object({
+        "organization_quality": _STR,
+        "readability_score": _STR,
+        "maintainability_issues": _STR_LIST,
+        "style_violations": _STR_LIST
+    }),
+    "logic_flow_analysis": _object({
+        "execution_path": _STR,
+        "branch_coverage": _STR,
+        "potential_infinite_loops": _STR_LIST,
+        "unreachable_code": _STR_LIST
+    }),
+    "implementation_quality": _object({
+        "code_smells": _STR_LIST,
+        "design_patterns": _STR_LIST,
+        "refactoring_suggestions": _STR_LIST
+    }),
+    "potential_hidden_bugs": _list_of({
+        "bug_type": _STR,
+        "location": _STR,
+        "scenario": _STR,
+        "severity": _SEVERITY
+    })
+})
+
+FAILURE_ANALYSIS_SCHEMA = _object({
+    "failure_pattern_analysis": _object({
+        "common_root_causes": _STR_LIST,
+        "severity_assessment": _STR,
+        "fix_priority": _STR_LIST
+    }),
+    "detailed_failure_analysis": _list_of({
+        "test_description": _STR,
+        "failure_reason": _STR,
+        "root_cause": _STR,
+        "fix_complexity": {"type": "string", "enum": ["trivial", "easy", "moderate", "complex", "major_rewrite"]},
+        "fix_suggestion": _STR,
+        "related_risks": _STR_LIST
+    }),
+    "cascading_effects": _object({
+        "issues_that_could_cause_multiple_failures": _STR_LIST,
+        "hidden_dependencies": _STR_LIST
+    })
+})
+
+EDGE_CASE_SCHEMA = _object({
+    "critical_missing_edge_cases": _list_of({
+        "case_description": _STR,
+        "risk_level": _SEVERITY,
+        "failure_probability": _STR,
+        "impact_assessment": _STR,
+        "test_suggestion": _STR,
+        "mitigation_strategy": _STR
+    }),
+    "security_vulnerabilities": _list_of({
+        "vulnerability_type": _STR,
+        "attack_vector": _STR,
+        "severity": _SEVERITY,
+        "affected_code": _STR,
+        "mitigation": _STR
+    }),
+    "production_risks": _list_of({
+        "risk_scenario": _STR,
+        "trigger_conditions": _STR,
+        "business_impact": _STR,
+        "monitoring_needed": _STR,
+        "prevention_strategy": _STR
+    }),
+    "stress_test_scenarios": _list_of({
+        "stress_type": {"type": "string", "enum": ["memory", "cpu", "concurrency", "volume"]},
+        "scenario": _STR,
+        "expected_failure_mode": _STR,
+        "resilience_improvements": _STR
+    })
+})
+
+FEEDBACK_SCHEMA = _object({
+    "executive_summary": _object({
+        "overall_assessment": _STR,
+        "key_strengths": _STR_LIST,
+        "critical_issues": _STR_LIST,
+        "learning_level": _STR
+    }),
+    "prioritized_improvements": _list_of({
+        "priority": {"type": "integer"},
+        "improvement_area": _STR,
+        "why_important": _STR,
+        "learning_concepts": _STR_LIST,
+        "code_example": _STR,
+        "resources": _STR_LIST
+    }),
+    "educational_insights": _object({
+        "concepts_demonstrated": _STR_LIST,
+        "concepts_missing": _STR_LIST,
+        "common_mistakes": _STR_LIST,
+        "advanced_techniques": _STR_LIST
+    }),
+    "mentorship_guidance": _object({
+        "immediate_next_steps": _STR_LIST,
+        "medium_term_goals": _STR_LIST,
+        "long_term_development": _STR_LIST,
+        "confidence_builders": _STR_LIST
+    }),
+    "detailed_explanations": _object({
+        "why_tests_failed": _STR,
+        "algorithmic_thinking": _STR,
+        "coding_maturity": _STR,
+        "industry_readiness": _STR
+    })
+})
+
+FAST_JUDGE_SCHEMA = _object({
+    "code_analysis": CODE_ANALYSIS_SCHEMA,
+    # All-pass submissions are told to return {} here, so it is not constrained
+    "failure_analysis": {"type": "object"},
+    "edge_case_analysis": EDGE_CASE_SCHEMA,
+    "comprehensive_feedback": FEEDBACK_SCHEMA
+})
+
+
+def validate(instance: Any, schema: Dict[str, Any], path: str = "$") -> List[str]:
+    """Validate against the JSON Schema subset used above; returns error messages"""
+    errors = []
+    expected = schema.get("type")
+    type_checks = {
+        "object": lambda v: isinstance(v, dict),
+        "array": lambda v: isinstance(v, list),
+        "string": lambda v: isinstance(v, str),
+        "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+        "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+        "boolean": lambda v: isinstance(v, bool)
+    }
+    if expected and not type_checks[expected](instance):
+        return [f"{path}: expected {expected}, got {type(instance).__name__}"]
+
+    if "enum" in schema and instance not in schema["enum"]:
+        errors.append(f"{path}: {instance!r} is not one of {schema['enum']}")
+
+    if isinstance(instance, dict):
+        for key in schema.get("required", []):
+            if key not in instance:
+                errors.append(f"{path}: missing required key '{key}'")
+        for key, sub_schema in schema.get("properties", {}).items():
+            if key in instance:
+                errors.extend(validate(instance[key], sub_schema, f"{path}.{key}"))
+
+    if isinstance(instance, list):
+        if len(instance) < schema.get("minItems", 0):
+            errors.append(f"{path}: expected at least {schema['minItems']} items")
+        if "items" in schema:
+            for i, item in enumerate(instance):
+                errors.extend(validate(item, schema["items"], f"{path}[{i}]"))
+
+    return errors
+
+
+def _repair_object_text(text: str, start: int) -> str:
+    """Copy the object starting at `start`, dropping trailing commas and closing truncation.
+
+    Tracks string/escape state so braces and commas inside string values are
+    left alone. Stops at the brace that closes the top-level object.
+    """
+    out = []
+    stack = []
+    in_string = False
+    escape = False
+    pending_comma = False
+
+    for ch in text[start:]:
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+
+        if ch.isspace():
+            if not pending_comma:
+                out.append(ch)
+            continue
+
+        if pending_comma:
+            pending_comma = False
+            if ch not in '}]':
+                out.append(',')
+
+        if ch == ',':
+            pending_comma = True
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+            out.append(ch)
+        elif ch in '}]':
+            if stack:
+                stack.pop()
+            out.append(ch)
+            if not stack:
+                return ''.join(out)
+        else:
+            if ch == '"':
+                in_string = True
+            out.append(ch)
+
+    # Truncated output (e.g. num_predict reached): close whatever is still open
+    if in_string:
+        out.append('"')
+    while stack:
+        out.append(stack.pop())
+    return ''.join(out)
+
+
+class JsonObjectScanner:
+    """Incremental, string-aware brace tracker for streamed responses.
+
+    Feed chunks as they arrive; `feed` returns True once the first top-level
+    JSON object has closed. `end` is then the offset just past its closing
+    brace in the concatenated stream, so trailing chatter can be dropped.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.started = False
+        self.complete = False
+        self.consumed = 0
+        self.end = None
+
+    def feed(self, chunk: str) -> bool:
+        if self.complete:
+            return True
+
+        for i, ch in enumerate(chunk):
+            if not self.started:
+                if ch == '{':
+                    self.started = True
+                    self.depth = 1
+                continue
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in '{[':
+                self.depth += 1
+            elif ch in '}]':
+                self.depth -= 1
+                if self.depth == 0:
+                    self.complete = True
+                    self.end = self.consumed + i + 1
+                    break
+
+        self.consumed += len(chunk)
+        return self.complete
+
+
+def parse_json_object(text: str) -> Dict[str, Any]:
+    """Extract the first top-level JSON object from an LLM response.
+
+    Tries the raw text, then the balanced object starting at the first '{'
+    with trailing commas removed and truncated brackets closed.
+    Raises ValueError if nothing parses to an object.
+    """
+    text = text.strip()
+    try:
+        value = json.loads(text)
+        if isinstance(value, dict):
+            return value
+    except json.JSONDecodeError:
+        pass
+
+    start = text.find('{')
+    while start != -1:
+        candidate = _repair_object_text(text, start)
+        try:
+            value = json.loads(candidate)
+            if isinstance(value, dict):
+                return value
+        except json.JSONDecodeError:
+            pass
+        start = text.find('{', start + 1)
+
+    raise ValueError("no parseable JSON object in response")
+
+
+def parse_and_validate(text: str, schema: Optional[Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """Parse a response and validate it; returns (data or None, errors)"""
+    try:
+        data = parse_json_object(text)
+    except ValueError as e:
+        return None, [str(e)]
+    return data, (validate(data, schema) if schema else [])
+
+
+def build_repair_messages(response_text: str, errors: List[str], schema: Dict[str, Any]) -> List[Dict]:
+    """Prompt asking the model to fix only what is wrong with a previous answer"""
+    error_list = "\n".join(f"- {e}" for e in errors[:20])
+    return [
+        {"role": "system", "content": "You repair malformed JSON. Return ONLY the corrected JSON object, "
+                                      "preserving every value from the original that is already valid."},
+        {"role": "user", "content": f"""The following response does not satisfy the required JSON schema.
+
+PROBLEMS FOUND:
+{error_list}
+
+REQUIRED SCHEMA:
+{json.dumps(schema)}
+
+RESPONSE TO REPAIR:
+{response_text}
+"""}
+    ]
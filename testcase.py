@@ -8,12 +8,27 @@ import json
 import subprocess
 import sys
 import re
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Optional, Tuple
 import ollama  # For CodeLlama integration
+from structured_output import TEST_SUITE_SCHEMA, parse_and_validate, build_repair_messages
+from cascade import CascadeStats, output_gate, difficulty_gate
+
+MIN_TEST_CASES = 5  # The system prompt asks for at least this many tests...
+MIN_EDGE_CASES = 2  # ...and edge cases; a cheap-model suite with fewer is escalated
 
 class TestCaseGenerator:
-    def __init__(self, model_name="codellama:7b"):
+    def __init__(self, model_name="codellama:7b", keep_alive=None, cascade_model: Optional[str] = None):
         self.model_name = model_name
+        self.keep_alive = keep_alive  # e.g. -1 keeps the model loaded; None uses the server default
+        # Cheap model tried first; model_name only regenerates suites that fail the quality gate
+        self.cascade_model = cascade_model
+        self.cascade_stats = CascadeStats()
+        self.llm_options = {
+            "temperature": 0.3,  # Lower temperature for more consistent output
+            "top_p": 0.9,
+            "num_predict": 2048
+        }
         self.system_prompt = """You are an expert C code analyzer and test case generator.
 
 Your task is to:
@@ -40,7 +55,8 @@ Return ONLY a valid JSON object in this EXACT format:
   ],
   "potential_edge_cases": [
     "Description of edge cases to watch for"
-  ]
+  ],
+  "scaling_input": {"header": "{n}\\n", "item": "{r} ", "footer": "\\n"}
 }
 
 IMPORTANT:
@@ -49,7 +65,9 @@ IMPORTANT:
 - For mathematical programs, test boundary values (0, negative, large numbers)
 - For string programs, test empty strings, whitespace, special characters
 - For interactive programs, test invalid input scenarios
-- Make inputs realistic and outputs precise"""
+- Make inputs realistic and outputs precise
+- scaling_input describes a valid input of any size n, used to measure complexity: header and footer
+  are written once and item n times; {n} is replaced by n, {i} by the item index, {r} by a random number"""
 
     def analyze_code_structure(self, code: str) -> Dict[str, Any]:
         """Pre-analyze code to give LLM more context"""
@@ -94,32 +112,55 @@ C CODE TO ANALYZE:
 Generate comprehensive test cases for this C program following the JSON format specified in the system prompt.
 """
 
-            # Call CodeLlama via Ollama
-            response = ollama.chat(
-                model=self.model_name,
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": enhanced_prompt}
-                ],
-                options={
-                    "temperature": 0.3,  # Lower temperature for more consistent output
-                    "top_p": 0.9,
-                    "num_predict": 2048
-                }
-            )
+            messages = [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": enhanced_prompt}
+            ]
             
-            # Extract JSON from response
-            response_text = response['message']['content'].strip()
+            start = time.perf_counter()
+            test_data, reasons, model_used = None, [], self.model_name
+            if self.cascade_model:
+                test_data, reasons = self.generate_on_cascade_model(messages, code_analysis)
+                if test_data is not None:
+                    model_used = self.cascade_model
+                else:
+                    print(f"⤴️  Test generation: escalating to {self.model_name} ({', '.join(reasons)})")
+            first_tier_s = time.perf_counter() - start
             
-            # Try to extract JSON if it's wrapped in markdown or other text
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                json_text = json_match.group(0)
-            else:
-                json_text = response_text
+            if test_data is None:
+                # Call CodeLlama via Ollama, constrained to the test suite schema
+                response = ollama.chat(
+                    model=self.model_name,
+                    messages=messages,
+                    options=self.llm_options,
+                    format=TEST_SUITE_SCHEMA,
+                    **self.chat_kwargs()
+                )
+                
+                # Parse and validate JSON
+                response_text = response['message']['content'].strip()
+                test_data, errors = parse_and_validate(response_text, TEST_SUITE_SCHEMA)
+                
+                # Targeted repair pass instead of discarding the whole generation
+                if errors:
+                    print(f"⚠️  Test suite failed validation ({errors[0]}); requesting targeted repair...")
+                    repair = ollama.chat(
+                        model=self.model_name,
+                        messages=build_repair_messages(response_text, errors, TEST_SUITE_SCHEMA),
+                        options=self.llm_options,
+                        format=TEST_SUITE_SCHEMA,
+                        **self.chat_kwargs()
+                    )
+                    repaired, repaired_errors = parse_and_validate(repair['message']['content'], TEST_SUITE_SCHEMA)
+                    if repaired is not None and (test_data is None or not repaired_errors):
+                        test_data, errors = repaired, repaired_errors
+            if self.cascade_model:
+                self.cascade_stats.record("test_generation", reasons, first_tier_s,
+                                          time.perf_counter() - start - first_tier_s)
             
-            # Parse and validate JSON
-            test_data = json.loads(json_text)
+            if test_data is None:
+                print(f"Raw response: {response_text}")
+                raise ValueError(f"Could not parse test cases: {errors[0]}")
             
             # Validate required fields
             required_fields = ["program_description", "test_cases"]
@@ -134,18 +175,49 @@ Generate comprehensive test cases for this C program following the JSON format s
             # Add metadata
             test_data["source_file"] = source_file
             test_data["generation_method"] = "codellama_analysis"
+            test_data["model_used"] = model_used
+            if reasons:
+                test_data["escalation_reasons"] = reasons
             test_data["code_analysis"] = code_analysis
             
             return test_data
             
-        except json.JSONDecodeError as e:
-            print(f"Error parsing JSON response: {e}")
-            print(f"Raw response: {response_text}")
-            return self._generate_fallback_tests(source_file)
         except Exception as e:
             print(f"Error generating test cases: {e}")
             return self._generate_fallback_tests(source_file)
 
+    def generate_on_cascade_model(self, messages: List[Dict],
+                                  code_analysis: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+        """Try the cheap model once; returns (suite, []) or (None, reasons to escalate)"""
+        try:
+            response = ollama.chat(
+                model=self.cascade_model,
+                messages=messages,
+                options=self.llm_options,
+                format=TEST_SUITE_SCHEMA,
+                **self.chat_kwargs()
+            )
+        except Exception as e:
+            print(f"⚠️  Test generation failed on {self.cascade_model}: {e}")
+            return None, ["cascade_model_error"]
+        
+        test_data, errors = parse_and_validate(response['message']['content'].strip(), TEST_SUITE_SCHEMA)
+        reasons = output_gate(test_data, errors) or self.suite_gate(test_data, code_analysis)
+        return (None, reasons) if reasons else (test_data, [])
+
+    @staticmethod
+    def suite_gate(test_data: Dict[str, Any], code_analysis: Dict[str, Any]) -> List[str]:
+        """Checks of a suite against the prompt's requirements and the code's pre-analysis"""
+        reasons = difficulty_gate(test_data.get("difficulty_level"))
+        tests = test_data["test_cases"]
+        if len(tests) < MIN_TEST_CASES:
+            reasons.append("too_few_tests")
+        if sum(1 for t in tests if t.get("category") in ("edge", "corner")) < MIN_EDGE_CASES:
+            reasons.append("too_few_edge_cases")
+        if code_analysis["has_scanf"] and not any(t["input"].strip() for t in tests):
+            reasons.append("inputs_missing")  # The program reads input but no test supplies any
+        return reasons
+
     def _generate_fallback_tests(self, source_file: str) -> Dict[str, Any]:
         """Generate basic fallback tests if LLM fails"""
         return {
@@ -173,6 +245,10 @@ Generate comprehensive test cases for this C program following the JSON format s
             "generation_method": "fallback"
         }
 
+    def chat_kwargs(self) -> Dict[str, Any]:
+        """Model keep-alive for ollama.chat, omitted to use the server default"""
+        return {"keep_alive": self.keep_alive} if self.keep_alive is not None else {}
+
     def save_test_cases(self, test_data: Dict[str, Any], output_file: str):
         """Save generated test cases to JSON file"""
         with open(output_file, 'w') as f: